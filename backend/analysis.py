@@ -0,0 +1,276 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+DANGEROUS_MAGNITUDE = 5.0
+RECURSIVE_LIMIT = 1200  # Batas n untuk rekursi linier (lihat sys.setrecursionlimit di app.py)
+PARALLEL_MIN_SIZE = 2_000_000  # Di bawah ukuran ini satu pass vektor lebih cepat dari process pool
+CHUNK_SIZE = 1_000_000
+
+# Analisis Kompleksitas Algoritma - Implementasi Iteratif dan Rekursif
+
+# Fungsi iteratif - O(n) time, O(1) space
+def analyze_earthquakes_iterative(features):
+    start_time = time.time()
+    total_gempa = 0
+    sum_magnitudo = 0.0
+    jumlah_berbahaya = 0
+    min_mag = float('inf')
+    max_mag = float('-inf')
+    sum_squares = 0.0  # Untuk menghitung variansi
+
+    for feature in features:
+        magnitudo = feature['properties']['mag']
+        total_gempa += 1
+        sum_magnitudo += magnitudo
+        sum_squares += magnitudo ** 2
+        min_mag = min(min_mag, magnitudo)
+        max_mag = max(max_mag, magnitudo)
+        if magnitudo >= 5.0:
+            jumlah_berbahaya += 1
+
+    rata_rata_magnitudo = sum_magnitudo / total_gempa if total_gempa > 0 else 0.0
+    variansi = (sum_squares / total_gempa - rata_rata_magnitudo ** 2) if total_gempa > 1 else 0.0
+    std_dev = variansi ** 0.5 if variansi > 0 else 0.0
+    persentase_berbahaya = (jumlah_berbahaya / total_gempa * 100) if total_gempa > 0 else 0.0
+
+    execution_time = time.time() - start_time
+
+    return {
+        'total_gempa': total_gempa,
+        'rata_rata_magnitudo': round(rata_rata_magnitudo, 3),
+        'min_magnitudo': round(min_mag, 1) if min_mag != float('inf') else 0.0,
+        'max_magnitudo': round(max_mag, 1) if max_mag != float('-inf') else 0.0,
+        'standar_deviasi': round(std_dev, 3),
+        'jumlah_berbahaya': jumlah_berbahaya,
+        'persentase_berbahaya': round(persentase_berbahaya, 2),
+        'waktu_eksekusi': round(execution_time, 6)
+    }
+
+
+# Fungsi rekursif - O(n) time, O(n) space (call stack)
+def analyze_earthquakes_recursive(features, index=0, total_gempa=0, sum_magnitudo=0.0, jumlah_berbahaya=0, sum_squares=0.0, min_mag=float('inf'), max_mag=float('-inf')):
+    if index >= len(features):
+        rata_rata_magnitudo = sum_magnitudo / total_gempa if total_gempa > 0 else 0.0
+        variansi = (sum_squares / total_gempa - rata_rata_magnitudo ** 2) if total_gempa > 1 else 0.0
+        std_dev = variansi ** 0.5 if variansi > 0 else 0.0
+        persentase_berbahaya = (jumlah_berbahaya / total_gempa * 100) if total_gempa > 0 else 0.0
+        return {
+            'total_gempa': total_gempa,
+            'rata_rata_magnitudo': round(rata_rata_magnitudo, 3),
+            'min_magnitudo': round(min_mag, 1) if min_mag != float('inf') else 0.0,
+            'max_magnitudo': round(max_mag, 1) if max_mag != float('-inf') else 0.0,
+            'standar_deviasi': round(std_dev, 3),
+            'jumlah_berbahaya': jumlah_berbahaya,
+            'persentase_berbahaya': round(persentase_berbahaya, 2),
+            'waktu_eksekusi': 0  # akan diukur di luar
+        }
+
+    magnitudo = features[index]['properties']['mag']
+    new_total_gempa = total_gempa + 1
+    new_sum_magnitudo = sum_magnitudo + magnitudo
+    new_sum_squares = sum_squares + magnitudo ** 2
+    new_min_mag = min(min_mag, magnitudo)
+    new_max_mag = max(max_mag, magnitudo)
+    new_jumlah_berbahaya = jumlah_berbahaya + (1 if magnitudo >= 5.0 else 0)
+
+    return analyze_earthquakes_recursive(features, index + 1, new_total_gempa, new_sum_magnitudo, new_jumlah_berbahaya, new_sum_squares, new_min_mag, new_max_mag)
+
+
+# Agregat parsial (count, mean, m2, min, max, berbahaya) - dapat digabung (mergeable)
+EMPTY_AGGREGATE = (0, 0.0, 0.0, float('inf'), float('-inf'), 0)
+
+
+def magnitude_aggregate(mags):
+    """Agregat parsial satu blok magnitudo dalam satu pass vektor (mean dan M2 stabil numerik)"""
+    mags = np.asarray(mags, dtype=np.float64)
+    n = mags.size
+    if n == 0:
+        return EMPTY_AGGREGATE
+    mean = float(mags.mean())
+    deviations = mags - mean
+    m2 = float(np.dot(deviations, deviations))
+    dangerous = int(np.count_nonzero(mags >= DANGEROUS_MAGNITUDE))
+    return (n, mean, m2, float(mags.min()), float(mags.max()), dangerous)
+
+
+def merge_aggregates(left, right):
+    """Gabungkan dua agregat parsial (rumus paralel Welford/Chan untuk variansi)"""
+    n_a, mean_a, m2_a, min_a, max_a, danger_a = left
+    n_b, mean_b, m2_b, min_b, max_b, danger_b = right
+    if n_a == 0:
+        return right
+    if n_b == 0:
+        return left
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    mean = mean_a + delta * n_b / n
+    m2 = m2_a + m2_b + delta * delta * n_a * n_b / n
+    return (n, mean, m2, min(min_a, min_b), max(max_a, max_b), danger_a + danger_b)
+
+
+def format_aggregate(aggregate, execution_time=0.0):
+    """Bentuk hasil yang sama dengan analyze_earthquakes_iterative"""
+    total_gempa, rata_rata_magnitudo, m2, min_mag, max_mag, jumlah_berbahaya = aggregate
+    variansi = m2 / total_gempa if total_gempa > 1 else 0.0
+    std_dev = variansi ** 0.5 if variansi > 0 else 0.0
+    persentase_berbahaya = (jumlah_berbahaya / total_gempa * 100) if total_gempa > 0 else 0.0
+    return {
+        'total_gempa': total_gempa,
+        'rata_rata_magnitudo': round(rata_rata_magnitudo, 3),
+        'min_magnitudo': round(min_mag, 1) if min_mag != float('inf') else 0.0,
+        'max_magnitudo': round(max_mag, 1) if max_mag != float('-inf') else 0.0,
+        'standar_deviasi': round(std_dev, 3),
+        'jumlah_berbahaya': jumlah_berbahaya,
+        'persentase_berbahaya': round(persentase_berbahaya, 2),
+        'waktu_eksekusi': round(execution_time, 6)
+    }
+
+
+# Fungsi vektor - O(n) time dalam satu pass batch; mode chunked membagi data ke process pool
+def analyze_earthquakes_vectorized(mags, workers=None, chunk_size=CHUNK_SIZE):
+    start_time = time.time()
+    mags = np.asarray(mags, dtype=np.float64)
+    if workers is None:
+        workers = 0 if mags.size < PARALLEL_MIN_SIZE else None
+
+    if workers == 0 or mags.size <= chunk_size:
+        aggregate = magnitude_aggregate(mags)
+    else:
+        chunks = [mags[i:i + chunk_size] for i in range(0, mags.size, chunk_size)]
+        aggregate = EMPTY_AGGREGATE
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for partial in executor.map(magnitude_aggregate, chunks):
+                aggregate = merge_aggregates(aggregate, partial)
+
+    return format_aggregate(aggregate, time.time() - start_time)
+
+
+# Fungsi rekursif divide and conquer - O(n) time, O(log n) space (call stack)
+def analyze_earthquakes_divide_conquer(features, low=0, high=None):
+    """Bagi rentang [low, high) menjadi dua, selesaikan tiap setengah, lalu gabungkan agregatnya
+
+    Mengembalikan (agregat, kedalaman_rekursi). Kedalaman stack hanya
+    ceil(log2 n) + 1 sehingga aman untuk n = 20,000+.
+    """
+    if high is None:
+        high = len(features)
+    if high - low <= 0:  # Base case - rentang kosong
+        return EMPTY_AGGREGATE, 1
+    if high - low == 1:  # Base case - satu elemen, O(1)
+        magnitudo = features[low]['properties']['mag']
+        return (1, magnitudo, 0.0, magnitudo, magnitudo, 1 if magnitudo >= DANGEROUS_MAGNITUDE else 0), 1
+
+    mid = (low + high) // 2
+    left, left_depth = analyze_earthquakes_divide_conquer(features, low, mid)  # T(n/2)
+    right, right_depth = analyze_earthquakes_divide_conquer(features, mid, high)  # T(n/2)
+    return merge_aggregates(left, right), max(left_depth, right_depth) + 1  # Combine - O(1)
+
+
+def _divide_conquer_subtree(features):
+    return analyze_earthquakes_divide_conquer(features)
+
+
+def analyze_earthquakes_divide_conquer_parallel(features, workers=None):
+    """Evaluasi subtree tingkat atas di process pool, lalu gabungkan agregatnya secara rekursif"""
+    workers = workers or os.cpu_count() or 1
+    # Pembagian tetap biner: 2^k subtree dengan 2^k >= workers
+    parts = 1
+    while parts < workers and parts < len(features):
+        parts *= 2
+    bounds = [len(features) * i // parts for i in range(parts + 1)]
+    subtrees = [features[bounds[i]:bounds[i + 1]] for i in range(parts)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        partials = list(executor.map(_divide_conquer_subtree, subtrees))
+
+    def combine(items):
+        if len(items) == 1:
+            return items[0]
+        half = len(items) // 2
+        (left, left_depth), (right, right_depth) = combine(items[:half]), combine(items[half:])
+        return merge_aggregates(left, right), max(left_depth, right_depth) + 1
+
+    return combine(partials)
+
+
+def run_divide_conquer(features, workers=0):
+    """Jalankan divide and conquer (paralel jika workers != 0 dan data besar) dan format hasilnya"""
+    start_time = time.time()
+    if workers != 0 and len(features) >= PARALLEL_MIN_SIZE:
+        aggregate, depth = analyze_earthquakes_divide_conquer_parallel(features, workers)
+    else:
+        aggregate, depth = analyze_earthquakes_divide_conquer(features)
+    result = format_aggregate(aggregate, time.time() - start_time)
+    result['kedalaman_rekursi'] = depth
+    return result
+
+
+def run_analysis(features, mags):
+    """Jalankan semua strategi analisis dan susun analysis_data untuk frontend"""
+    # Jalankan analisis iteratif
+    start_time_iterative = time.time()
+    iterative_result = analyze_earthquakes_iterative(features)
+    iterative_result['waktu_eksekusi'] = round(time.time() - start_time_iterative, 6)
+
+    # Jalankan analisis rekursif (dengan batas untuk menghindari stack overflow)
+    recursive_result = None
+    recursive_error = None
+    if len(features) <= RECURSIVE_LIMIT:  # Batasi untuk rekursif - push to maximum limit for true stack overflow demonstration
+        try:
+            start_time_recursive = time.time()
+            recursive_result = analyze_earthquakes_recursive(features)
+            recursive_result['waktu_eksekusi'] = round(time.time() - start_time_recursive, 6)
+        except RecursionError:
+            recursive_error = "Stack overflow - terlalu banyak data untuk algoritma rekursif"
+    else:
+        recursive_error = "Stack overflow - terlalu banyak data untuk algoritma rekursif"
+        # Don't set recursive_result for large datasets to show error in frontend
+
+    # Jalankan analisis rekursif divide and conquer (kedalaman O(log n), tanpa batas ukuran)
+    divide_conquer_result = run_divide_conquer(features)
+
+    # Jalankan analisis vektor (kolom magnitudo kontigu dari store)
+    vectorized_result = analyze_earthquakes_vectorized(mags)
+
+    # Analisis kompleksitas
+    n = len(features)
+    complexity_analysis = {
+        'iterative': {
+            'best_case': f'O(n) - {n} iterasi loop, setiap elemen diproses dalam waktu konstan O(1)',
+            'worst_case': f'O(n) - {n} iterasi loop, kompleksitas tetap linier meskipun data tidak terurut',
+            'average_case': f'O(n) - {n} iterasi loop, rata-rata O(1) per elemen untuk operasi aritmatika',
+            'space_complexity': 'O(1) - menggunakan variabel tetap (total_gempa, sum_magnitudo, dll) tanpa struktur data tambahan',
+            'suitability': 'Optimal untuk dataset seismik skala global (n=20,000+), performa stabil dan efisien memori'
+        },
+        'recursive': {
+            'best_case': f'O(n) - {n} recursive calls, setiap call memproses satu elemen dalam O(1)',
+            'worst_case': f'O(n) - {n} recursive calls, risiko stack overflow ketika n > 1000 akibat batas call stack Python',
+            'average_case': f'O(n) - {n} recursive calls, overhead call stack meningkatkan kompleksitas praktis',
+            'space_complexity': f'O(n) - {n} stack frames, setiap call menyimpan state (index, total, sum_mag, dll)',
+            'suitability': 'Tidak sesuai untuk data seismik besar, risiko crash sistem; cocok hanya untuk n ≤ 1200 (dari maksimal 3000 recursion limit)'
+        },
+        'recursive_divide_conquer': {
+            'best_case': f'O(n) - {n} elemen, T(n) = 2T(n/2) + O(1) menghasilkan sekitar {2 * n - 1 if n else 0} pemanggilan rekursif',
+            'worst_case': f'O(n) - {n} elemen, pembagian selalu seimbang sehingga tidak ada kasus buruk tambahan',
+            'average_case': f'O(n) - {n} elemen, overhead pemanggilan fungsi lebih besar dari iteratif namun tetap linier',
+            'space_complexity': f'O(log n) - kedalaman stack hanya {divide_conquer_result["kedalaman_rekursi"]} frame untuk n={n}',
+            'suitability': 'Sesuai untuk dataset besar (n=20,000+) tanpa risiko stack overflow; subtree dapat dievaluasi paralel'
+        },
+        'vectorized': {
+            'best_case': f'O(n) - {n} elemen diproses dalam satu pass batch NumPy atas array magnitudo kontigu',
+            'worst_case': f'O(n) - {n} elemen, mode chunked membagi array ke process pool lalu menggabungkan agregat parsial',
+            'average_case': f'O(n) - {n} elemen, konstanta jauh lebih kecil karena loop berjalan di kode C, bukan interpreter Python',
+            'space_complexity': 'O(n) - array deviasi sementara untuk variansi stabil; O(chunk) per worker pada mode chunked',
+            'suitability': 'Optimal untuk dataset sangat besar (n > 20,000), variansi stabil numerik dengan penggabungan Welford/Chan'
+        }
+    }
+
+    return {
+        'iterative': iterative_result,
+        'recursive': recursive_result if recursive_result else {'error': recursive_error},
+        'recursive_divide_conquer': divide_conquer_result,
+        'vectorized': vectorized_result,
+        'complexity_analysis': complexity_analysis
+    }
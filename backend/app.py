@@ -1,5 +1,4 @@
-from flask import Flask, request, jsonify, after_this_request
-import requests
+from flask import Flask, request, jsonify, after_this_request, Response, stream_with_context
 from datetime import datetime, timedelta
 import time
 import threading
@@ -11,6 +10,28 @@ from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import logging
+import glob
+import hashlib
+import numpy as np
+
+from store import (open_store, read_current, write_store, write_columns, touch_store, merge_columns,
+                   columns_from_features, columns_digest, StoreView, EarthquakeStore, NUMERIC_COLUMNS)
+from memory_cache import MemoryCache
+from disk_cache import DiskCache
+import ratelimit_storage  # Registers the sqlite:// rate-limit storage
+from singleflight import SingleFlight
+from scheduler import RefreshScheduler
+from metrics import Metrics
+from usgs import USGSClient, UpstreamError
+from live_feed import LiveFeed
+from broadcast import Broadcaster, EventLog
+from analysis import run_analysis, magnitude_aggregate, format_aggregate, EMPTY_AGGREGATE
+from filters import parse_filters, parse_time, filter_rows, filter_key, FilterError
+from spatial import SphereKDTree
+from rollups import build_rollup_indexes, has_rollups, parse_percentiles, summarize, RollupError
+from wire import columnar_columns, columnar_json, columnar_binary, BINARY_MIMETYPE
+from pagination import (query_fingerprint, encode_cursor, decode_cursor, iter_chunks,
+                        CursorError, CursorExpired, MAX_PAGE_SIZE)
 
 # Increase recursion limit to allow deeper recursion for demonstration
 sys.setrecursionlimit(3000)  # Allow up to 3000 recursive calls for maximum stack overflow demonstration
@@ -22,161 +43,482 @@ CORS(app)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Rate limiting
-limiter = Limiter(
-    app=app,
-    key_func=get_remote_address,
-    default_limits=["200 per day", "50 per hour"]
-)
+# all: one process serves and refreshes (development); worker: serve the store another process
+# publishes, never calling USGS; refresher: background jobs only (see refresher.py, gunicorn.conf.py)
+SERVER_ROLE = os.environ.get('SERVER_ROLE', 'all')
+FETCHES_UPSTREAM = SERVER_ROLE != 'worker'
 
 # High-performance real-time data with optimized cache
 CACHE_DIR = "cache"
 CACHE_DURATION = 7200  # 2 hours cache for better performance (increased from 1 hour)
 DATA_VERSION = "v10"  # Force cache invalidation for latest optimizations
+MEMORY_CACHE_BYTES = 64 * 1024 * 1024  # In-process tier budget (decoded JSON bytes)
+DISK_CACHE_BYTES = 256 * 1024 * 1024  # Budget for the gzip files in cache/, enforced by the janitor
+JANITOR_INTERVAL = 600
+RESPONSE_CACHE_BYTES = 32 * 1024 * 1024  # Encoded /earthquakes bodies, gzip-compressed
+RESPONSE_GZIP_LEVEL = 6
+
+# Canonical columnar store shared by every size (replaces the per-size all_* copies)
+STORE_DIR = os.path.join(CACHE_DIR, f"store_{DATA_VERSION}")
+STORE_SIZE = 20000  # Largest size served; smaller sizes are prefixes of this set
+STALE_GRACE = CACHE_DURATION  # Serve an expired store for this long while it is refreshed
+MIN_MAGNITUDE = 2.5
+DELTA_OVERLAP_MS = 5 * 60 * 1000  # Re-read a little before the watermark to cover upstream indexing lag
+DELTA_MAX_AGE = 30 * 24 * 3600  # Older watermarks fall back to a full rebuild
+# Demand-driven refresh scheduler: refresh sooner under load, never exceed the upstream budget
+UPSTREAM_BUDGET_PER_HOUR = int(os.environ.get('USGS_REQUEST_BUDGET', '60'))
+MIN_REFRESH_INTERVAL = 300
+MAX_REFRESH_INTERVAL = CACHE_DURATION // 2
+SCHEDULER_TICK = 30
+LIVE_FEED_INTERVAL = 300  # Conditional summary-feed polls; unchanged feeds answer with an empty 304
+STORE_POLL_INTERVAL = 1.0  # How often a worker checks CURRENT for a newly published generation
+STALE_WARNING_INTERVAL = 600  # Workers log at most this often while the published store is past its grace
+EVENT_LOG_FILE = os.path.join(STORE_DIR, 'events.jsonl')  # SSE events from the refresher to workers
+# Each SSE stream holds a server thread; leave at least half of a worker's threads for requests
+SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', max(1, int(os.environ.get('WORKER_THREADS', '16')) // 2)))
+SSE_RETRY_AFTER = 30
+MAX_DIFF_EVENTS = 1000  # A rebuild that changes more events is announced as a reset; dashboards reload
+# Sizes offered by the frontend get their own metric label; anything else is reported as 'other'
+METRIC_SIZES = (1, 10, 25, 50, 100, 500, 1000, 2000, 5000, 10000, 20000)
 
 # Ensure cache directory exists
 if not os.path.exists(CACHE_DIR):
     os.makedirs(CACHE_DIR)
 
-# Global cache dictionary and statistics
-earthquake_cache = {}
-cache_stats = {
-    'hits': 0,
-    'misses': 0,
-    'total_loads': 0,
-    'compression_ratio': 0.0
-}
+# Rate limiting. Worker processes share their counters through a SQLite file next to the
+# cache; RATELIMIT_STORAGE_URI overrides it (e.g. redis://localhost:6379 across hosts)
+RATELIMIT_STORAGE_URI = os.environ.get(
+    'RATELIMIT_STORAGE_URI',
+    'memory://' if SERVER_ROLE == 'all' else f"sqlite:///{os.path.join(CACHE_DIR, 'ratelimit.sqlite')}"
+)
+limiter = Limiter(
+    app=app,
+    key_func=get_remote_address,
+    default_limits=["200 per day", "50 per hour"],
+    storage_uri=RATELIMIT_STORAGE_URI
+)
+
+# In-memory tier in front of the gzip files
+earthquake_cache = MemoryCache(max_bytes=MEMORY_CACHE_BYTES, ttl=CACHE_DURATION)
 cache_lock = threading.Lock()
+# Fully encoded responses keyed by store generation and query, with their ETags
+response_cache = MemoryCache(max_bytes=RESPONSE_CACHE_BYTES, ttl=CACHE_DURATION)
+current_store = None
+store_checked_at = 0.0
+stale_warned_at = 0.0
+# Coalesces concurrent refreshes of the same dataset into one upstream fetch
+refresh_flight = SingleFlight()
+# Spatial index over the current store generation, rebuilt when the version changes
+spatial_index = {'version': None, 'tree': None}
+spatial_lock = threading.Lock()
+# Rollups for generations written before rollup indexes existed, built once per version
+rollup_fallback = {'version': None, 'indexes': None}
+rollup_lock = threading.Lock()
+# Counters and latency histograms served at /metrics
+metrics = Metrics()
+metrics.counter('cache_lookups_total', 'Cache lookups by tier (store, disk) and result')
+metrics.counter('cache_write_bytes_total', 'Bytes written to the gzip disk tier, before and after compression')
+metrics.counter('earthquakes_requests_total', 'Requests to /earthquakes by size and how they were served')
+metrics.histogram('background_refresh_seconds', 'Duration of scheduled store refreshes')
+# Shared, connection-pooled client for every USGS request (base URL from USGS_BASE_URL)
+usgs_client = USGSClient(max_workers=4, metrics=metrics)
+# Parsed summary-feed events, polled in the background (see live_feed_updater)
+live_feed = LiveFeed(usgs_client, MIN_MAGNITUDE, metrics=metrics)
+# Pushes ingested changes to /earthquakes/events subscribers
+broadcaster = Broadcaster(max_subscribers=SSE_MAX_STREAMS, metrics=metrics)
+# Separate processes hand events over through a file; a single process publishes directly
+event_log = EventLog(EVENT_LOG_FILE) if SERVER_ROLE != 'all' else None
+# gzip files in cache/ with a manifest sidecar (timestamps, sizes, checksums)
+# The recorded all_<n> datasets seed the store and are the inputs of benchmark.py and
+# usgs_stub.py (and so loadtest.py); never swept
+disk_cache = DiskCache(CACHE_DIR, DATA_VERSION, DISK_CACHE_BYTES, metrics=metrics, keep=[f"all_*_{DATA_VERSION}.json.gz"])
+metrics.histogram('janitor_run_seconds', 'Duration of cache janitor passes')
+metrics.counter('janitor_removed_files_total', 'Cache files removed by the janitor')
+metrics.collector('disk_cache_bytes', 'gauge', 'Bytes of gzip cache files tracked by the manifest',
+                  lambda: [({}, disk_cache.snapshot()['bytes'])])
+
+def memory_cache_metrics(field):
+    return lambda: [({'cache': name}, cache.snapshot()[field])
+                    for name, cache in (('data', earthquake_cache), ('responses', response_cache))]
+
+metrics.collector('memory_cache_hits_total', 'counter', 'In-process cache hits', memory_cache_metrics('hits'))
+metrics.collector('memory_cache_misses_total', 'counter', 'In-process cache misses', memory_cache_metrics('misses'))
+metrics.collector('memory_cache_evictions_total', 'counter', 'In-process cache LRU evictions', memory_cache_metrics('evictions'))
+metrics.collector('memory_cache_bytes', 'gauge', 'Bytes held by the in-process caches', memory_cache_metrics('bytes'))
+metrics.collector('memory_cache_entries', 'gauge', 'Entries held by the in-process caches', memory_cache_metrics('entries'))
+metrics.collector('singleflight_calls_total', 'counter', 'Refresh calls that executed or joined an in-flight call',
+                  lambda: [({'outcome': outcome}, value) for outcome, value in refresh_flight.stats.items()])
+metrics.collector('usgs_requests_total', 'counter', 'USGS HTTP requests, retries and failures',
+                  lambda: [({'outcome': outcome}, value) for outcome, value in usgs_client.stats.items()])
+metrics.collector('store_records', 'gauge', 'Records in the published columnar store',
+                  lambda: [({}, len(current_store))] if current_store is not None else [])
+metrics.collector('store_age_seconds', 'gauge', 'Age of the published columnar store',
+                  lambda: [({}, time.time() - current_store.timestamp)] if current_store is not None else [])
+
+def size_label(size):
+    return str(size) if size in METRIC_SIZES else 'other'
 
 def get_cache_key(size):
     """Generate unique cache key for size"""
     return f"all_{size}_{DATA_VERSION}"
 
 def load_from_cache(cache_key):
-    """Load data from cache file with performance tracking"""
-    cache_file = os.path.join(CACHE_DIR, f"{cache_key}.json.gz")
-    if os.path.exists(cache_file):
-        try:
-            start_time = time.time()
-            with gzip.open(cache_file, 'rt') as f:
-                cached_data = json.load(f)
-                # Check if cache is still valid
-                if time.time() - cached_data.get('timestamp', 0) < CACHE_DURATION:
-                    load_time = time.time() - start_time
-                    cache_stats['hits'] += 1
-                    cache_stats['total_loads'] += 1
-                    print(f"Cache hit for {cache_key} (loaded in {load_time:.3f}s)")
-                    return cached_data['data']
-                else:
-                    print(f"Cache expired for {cache_key}")
-        except Exception as e:
-            print(f"Cache read error: {e}")
-    cache_stats['misses'] += 1
-    cache_stats['total_loads'] += 1
+    """Load data from the memory tier, falling back to the cache file"""
+    with metrics.stage('cache_lookup'):
+        cached = earthquake_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Freshness comes from the manifest; only a fresh entry's payload is read
+    try:
+        start_time = time.time()
+        cached = disk_cache.read(cache_key, CACHE_DURATION)
+        if cached is not None:
+            data, timestamp, size = cached
+            load_time = time.time() - start_time
+            metrics.inc('cache_lookups_total', tier='disk', result='hit')
+            earthquake_cache.put(cache_key, data, size, timestamp)
+            print(f"Cache hit for {cache_key} (loaded in {load_time:.3f}s)")
+            return data
+    except Exception as e:
+        print(f"Cache read error: {e}")
+    metrics.inc('cache_lookups_total', tier='disk', result='miss')
     return None
 
 def save_to_cache(cache_key, data):
-    """Save data to cache file (compressed) with performance tracking"""
+    """Save data to cache file (compressed, written atomically) and refresh the memory tier"""
     try:
-        cache_file = os.path.join(CACHE_DIR, f"{cache_key}.json.gz")
-        cache_data = {
-            'timestamp': time.time(),
-            'data': data
-        }
-
-        # Calculate uncompressed size for compression ratio
-        uncompressed_data = json.dumps(cache_data, separators=(',', ':'))
-        uncompressed_size = len(uncompressed_data.encode('utf-8'))
-
+        timestamp = time.time()
         start_time = time.time()
-        with gzip.open(cache_file, 'wt', compresslevel=6) as f:
-            json.dump(cache_data, f, separators=(',', ':'))  # Compact JSON
+        uncompressed_size, compressed_size = disk_cache.write(cache_key, data, timestamp)
         save_time = time.time() - start_time
 
+        # The file just written is the newest copy, so replace any older in-memory entry
+        earthquake_cache.put(cache_key, data, uncompressed_size, timestamp)
+
         # Calculate compression ratio
-        compressed_size = os.path.getsize(cache_file)
         compression_ratio = (1 - compressed_size / uncompressed_size) * 100
-        cache_stats['compression_ratio'] = compression_ratio
+        metrics.inc('cache_write_bytes_total', uncompressed_size, encoding='raw')
+        metrics.inc('cache_write_bytes_total', compressed_size, encoding='gzip')
 
         print(f"Data cached for {cache_key} ({compression_ratio:.1f}% compressed, saved in {save_time:.3f}s)")
     except Exception as e:
+        earthquake_cache.invalidate(cache_key)
         print(f"Cache write error: {e}")
 
-def cleanup_old_cache():
-    """Clean up old cache files"""
+def invalidate_derived_caches(disk=True):
+    """Drop cached analyses (memory and disk) and encoded responses after the dataset changed"""
+    earthquake_cache.invalidate_prefix("analysis_")
+    # Keys carry the generation, so this only frees memory early
+    response_cache.invalidate_prefix("")
+    if disk:
+        disk_cache.remove_prefix("analysis_")
+
+def publish_event(event, data):
+    """Send an SSE event to this process's subscribers, or to every worker through the event log"""
+    if event_log is not None:
+        event_log.append(event, data)
+    else:
+        broadcaster.publish(event, data)
+
+def import_legacy_cache():
+    """Seed the columnar store from the largest legacy all_{size} cache file"""
+    legacy_files = glob.glob(os.path.join(CACHE_DIR, f"all_*_{DATA_VERSION}.json.gz"))
+    if not legacy_files:
+        return None
+    legacy_file = max(legacy_files, key=lambda path: int(os.path.basename(path).split('_')[1]))
     try:
-        current_time = time.time()
-        for filename in os.listdir(CACHE_DIR):
-            if filename.endswith('.json.gz'):
-                filepath = os.path.join(CACHE_DIR, filename)
-                try:
-                    with gzip.open(filepath, 'rt') as f:
-                        cached_data = json.load(f)
-                        if current_time - cached_data.get('timestamp', 0) > CACHE_DURATION * 2:  # 2 hours
-                            os.remove(filepath)
-                            print(f"Removed old cache file: {filename}")
-                except:
-                    # Remove corrupted cache files
-                    os.remove(filepath)
+        start_time = time.time()
+        with gzip.open(legacy_file, 'rt') as f:
+            cached_data = json.load(f)
+        features = cached_data['data']['features']
+        store = write_store(STORE_DIR, features, timestamp=cached_data.get('timestamp', 0),
+                            complete=len(features) >= STORE_SIZE)
+        print(f"Imported {len(store)} records from {os.path.basename(legacy_file)} into columnar store in {time.time() - start_time:.3f}s")
+        return store
     except Exception as e:
-        print(f"Cache cleanup error: {e}")
+        print(f"Legacy cache import error: {e}")
+        return None
+
+def load_store(allow_expired=False):
+    """Return the canonical memory-mapped store if present (and fresh, unless allow_expired)"""
+    global current_store
+    if SERVER_ROLE == 'worker':
+        follow_published_store()
+    elif current_store is None:
+        start_time = time.time()
+        current_store = open_store(STORE_DIR) or import_legacy_cache()
+        if current_store is not None:
+            print(f"Opened columnar store {current_store.version} with {len(current_store)} records in {time.time() - start_time:.3f}s")
+
+    store = current_store
+    if store is not None and time.time() - store.timestamp < CACHE_DURATION:
+        metrics.inc('cache_lookups_total', tier='store', result='hit')
+        return store
+    if store is not None and allow_expired:
+        metrics.inc('cache_lookups_total', tier='store', result='stale')
+        return store
+    if store is not None:
+        print(f"Columnar store {store.version} expired")
+    metrics.inc('cache_lookups_total', tier='store', result='miss')
+    return None
 
-def combine_historical_live(size):
-    """Combine historical cached data with live feed for efficient large dataset handling"""
+def follow_published_store():
+    """Worker side: switch to the generation CURRENT points at (checked at most every STORE_POLL_INTERVAL)"""
+    global current_store, store_checked_at
+    now = time.time()
+    if now - store_checked_at < STORE_POLL_INTERVAL:
+        return
+    store_checked_at = now
+    warn_if_store_stale(now)
+    meta = read_current(STORE_DIR)
+    if not meta or (current_store is not None and meta == current_store.meta):
+        return
+    with cache_lock:
+        store = current_store
+        if store is not None and meta['generation'] == store.version:
+            # Same columns, only freshness and watermark moved
+            current_store = EarthquakeStore(store.columns, meta, store.indexes)
+            return
+        opened = open_store(STORE_DIR)
+        if opened is None:
+            return
+        current_store = opened
+        # The refresher already cleared the shared disk tier
+        invalidate_derived_caches(disk=False)
+    print(f"Worker {os.getpid()} switched to store {opened.version} with {len(opened)} records")
+
+def warn_if_store_stale(now):
+    """Worker side: say so (every STALE_WARNING_INTERVAL) when the refresher stopped publishing"""
+    global stale_warned_at
+    store = current_store
+    if store is None or now - store.timestamp < CACHE_DURATION + STALE_GRACE or now - stale_warned_at < STALE_WARNING_INTERVAL:
+        return
+    stale_warned_at = now
+    print(f"Warning: worker {os.getpid()} is serving store {store.version}, "
+          f"{(now - store.timestamp) / 3600:.1f} h old; is the refresher process running?")
+
+def store_complete(store):
+    """True for a store holding everything a full STORE_SIZE refresh found, even when that is fewer rows"""
+    meta = getattr(store, 'meta', None)
+    if meta is None:
+        return False
+    # Generations written before the flag existed are complete only when full
+    return meta.get('complete', len(store) >= STORE_SIZE)
+
+def save_store(columns):
+    """Publish the columns of a full STORE_SIZE refresh as the canonical store"""
+    global current_store
+    existing = current_store
     try:
-        live_response = requests.get("https://earthquake.usgs.gov/earthquakes/feed/v1.0/summary/all_month.geojson", timeout=30)
-        live_response.raise_for_status()
-        live_data = live_response.json()
-        live_data['features'] = [f for f in live_data['features'] if f['properties']['mag'] and f['properties']['mag'] >= 2.5]
-        live_count = len(live_data['features'])
-        print(f"Fetched {live_count} live records (M >= 2.5)")
-
-        # Get historical data (use existing 20000 cache)
-        large_cache_key = get_cache_key(20000)
-        historical_data = load_from_cache(large_cache_key)
-        if not historical_data:
-            print("No historical data cache, fetching historical...")
-            historical_data = fetch_earthquake_data(20000)
-
-        # Combine live + historical, filter duplicates, limit to size
-        all_features = live_data['features'] + historical_data['features']
-        existing_ids = set()
-        unique_features = []
-        for f in all_features:
-            if f['id'] not in existing_ids:
-                existing_ids.add(f['id'])
-                unique_features.append(f)
-
-        # Limit to size
-        unique_features = unique_features[:size]
-        print(f"Combined {len(unique_features)} unique records")
-
-        data = {
-            'type': 'FeatureCollection',
-            'features': unique_features
-        }
-        return data
+        start_time = time.time()
+        if existing is not None and columns_digest(columns) == (existing.meta.get('digest') or columns_digest(existing.columns)):
+            # Same events as the published generation: keep its caches, only freshness moves
+            current_store = touch_store(STORE_DIR, existing, last_sync=int(start_time * 1000), complete=True)
+            print(f"Refresh matched store {existing.version}, marked fresh")
+            return current_store
+        current_store = write_columns(STORE_DIR, columns, complete=True)
+        # Cached analyses and responses describe the previous generation
+        invalidate_derived_caches()
+        publish_rebuild(existing, current_store)
+        print(f"Published columnar store {current_store.version} with {len(current_store)} records in {time.time() - start_time:.3f}s")
     except Exception as e:
-        print(f"Error combining data: {e}, using historical only")
-        large_cache_key = get_cache_key(20000)
-        historical_data = load_from_cache(large_cache_key)
-        if historical_data:
-            data = {
-                'type': 'FeatureCollection',
-                'features': historical_data['features'][:size]
-            }
-            print(f"Using cached historical data ({len(data['features'])} records)")
-            return data
+        print(f"Store write error: {e}")
+    return current_store
+
+def rebuild_diff(previous, store):
+    """(upserts, deleted ids) that turn one generation into the other, matched by event id"""
+    previous_rows = {event_id: row for row, event_id in enumerate(previous['id'].tolist())}
+    ids = store['id'].tolist()
+    matched = np.array([previous_rows.pop(event_id, -1) for event_id in ids], dtype=np.int64)
+    changed = matched < 0
+    rows = np.flatnonzero(~changed)
+    for name in NUMERIC_COLUMNS:
+        now, before = np.asarray(store[name])[rows], np.asarray(previous[name])[matched[rows]]
+        same = now == before
+        if now.dtype.kind == 'f':
+            # Missing values (NaN) on both sides are unchanged
+            same |= np.isnan(now) & np.isnan(before)
+        changed[rows] |= ~same
+    places = store['place'].take(rows)
+    for row, place, previous_place in zip(rows.tolist(), places, previous['place'].take(matched[rows])):
+        if place != previous_place:
+            changed[row] = True
+    # Whatever is left was deleted upstream or fell out of the newest STORE_SIZE
+    return store.take(np.flatnonzero(changed)).to_features(), list(previous_rows)
+
+def publish_rebuild(previous, store):
+    """Announce a full rebuild as the events it changed, or as a reset when that diff is too large"""
+    if previous is None:
+        publish_event('reset', {'reason': 'rebuilt', 'dataset_version': store.version})
+        return
+    upserts, deleted_ids = rebuild_diff(previous, store)
+    if len(upserts) + len(deleted_ids) > MAX_DIFF_EVENTS:
+        publish_event('reset', {'reason': 'rebuilt', 'dataset_version': store.version})
+    else:
+        publish_changes(previous, store, upserts, deleted_ids)
+
+def get_dataset_key(size):
+    """Single-flight key for the dataset a miss of this size would rebuild"""
+    return 'store' if size > 100 else f"fetch_{size}"
+
+def refresh_dataset(size):
+    """Fetch fresh data for a miss
+
+    Sizes > 100 rebuild and publish the full store; smaller misses are
+    fetched directly and served as a view without replacing the store.
+    """
+    print(f"Cache miss or insufficient for size {size}, fetching fresh data...")
+
+    try:
+        # For sizes > 100, combine historical + live feed for comprehensive data
+        if size > 100:
+            print(f"For size > 100, combining historical + live feed for comprehensive data")
+            columns = combine_historical_live(STORE_SIZE)
         else:
             print("No cached data, fetching...")
-            return fetch_earthquake_data(size)
+            columns = columns_from_features(fetch_earthquake_data(size)['features'])
+            # Too small to be the canonical store; the scheduler builds that from a full refresh
+            return StoreView(columns) if len(columns['time']) else None
+    except UpstreamError as e:
+        print(f"Refresh for size {size} failed: {e}")
+        return None
+
+    if not len(columns['time']):
+        return None
+
+    # Publish the result as the canonical store
+    with cache_lock:
+        store = save_store(columns)
+    if store is not None and len(store) >= min(size, len(columns['time'])):
+        print(f"Cached {len(store)} records in columnar store")
+        return store
+    return StoreView(columns)
+
+def refresh_dataset_in_background(size):
+    """Stale-while-revalidate refresh; errors are logged, the stale copy keeps serving"""
+    try:
+        if sync_store_delta() is None:
+            refresh_dataset(size)
+    except Exception as e:
+        print(f"Background refresh error for size {size}: {e}")
+
+def cache_janitor(interval=JANITOR_INTERVAL):
+    """Single scheduled cleanup of cache files: expiry, old versions and the disk budget, all from the manifest"""
+    while True:
+        try:
+            start_time = time.time()
+            removed = disk_cache.sweep(max_age=CACHE_DURATION * 2)
+            disk_stats = disk_cache.snapshot()
+            metrics.observe('janitor_run_seconds', time.time() - start_time)
+            metrics.inc('janitor_removed_files_total', len(removed))
+            for key in removed:
+                print(f"Removed old cache file: {key}.json.gz")
+            print(f"Cache janitor: {disk_stats['entries']} files, {disk_stats['bytes'] / 1024:.0f} KB "
+                  f"of {disk_stats['max_bytes'] / 1024 / 1024:.0f} MB budget")
+        except Exception as e:
+            print(f"Cache cleanup error: {e}")
+        time.sleep(interval)
+
+def combine_historical_live(size):
+    """Historical store plus the in-memory live feed layer as columns; never downloads a summary feed"""
+    live_features = live_feed.features()
+    if live_feed.last_success is None:
+        # Nothing polled yet: serve historical data now and fill the live layer in the background
+        refresh_flight.do_async('live', refresh_live_feed)
+    print(f"Using {len(live_features)} live records (M >= {MIN_MAGNITUDE}) from the live feed layer")
+
+    # Get historical data (use existing columnar store unless it is short of a full refresh)
+    store = load_store()
+    if store is None or not store_complete(store):
+        print("No complete historical data cache, fetching historical...")
+        store = StoreView(columns_from_features(fetch_earthquake_data(STORE_SIZE)['features']))
+
+    # Live events replace historical rows with the same id; only the newest `size` rows are kept
+    columns = merge_columns(store, live_features, [], limit=size)
+    print(f"Combined {len(columns['time'])} unique records")
+    return columns
+
+def refresh_live_feed():
+    """Poll the live feed and merge new or revised events into the store without a full rebuild"""
+    global current_store
+    store = load_store(allow_expired=True)
+    changed = live_feed.refresh(store.meta.get('last_sync') if store is not None else None)
+    if not changed or store is None:
+        return changed
+    with cache_lock:
+        # The store may have been replaced while the feed was downloading
+        store = current_store
+        # After a restart the feed layer starts empty and reports every event as new; only
+        # events the store lacks or holds with different values are changes
+        changed = events_changed_from(store, changed)
+        if not changed:
+            print("Live feed events already in the store")
+            return changed
+        columns = merge_columns(store, changed, [], limit=max(len(store), STORE_SIZE))
+        # Timestamp and watermark are kept: freshness and delta sync still follow the full upstream sync
+        current_store = write_columns(STORE_DIR, columns, timestamp=store.timestamp, last_sync=store.meta.get('last_sync'),
+                                      complete=store_complete(store))
+        invalidate_derived_caches()
+        publish_changes(store, current_store, changed, [])
+    print(f"Merged {len(changed)} live events into store {current_store.version}")
+    return changed
+
+def events_changed_from(store, features):
+    """Features that are missing from the store or differ from its row for the same id"""
+    upserts, _ = rebuild_diff(store, StoreView(columns_from_features(features)))
+    changed_ids = {f['id'] for f in upserts}
+    return [f for f in features if f['id'] in changed_ids]
+
+def publish_changes(previous, store, upserts, deleted_ids):
+    """Push one ingest batch to SSE subscribers: added, revised and deleted events and the analysis change"""
+    known = set(previous['id'].tolist())
+    oldest_time = int(store['time'][len(store) - 1]) if len(store) else 0
+    # Events older than the store's retained window were not kept by the merge
+    upserts = [f for f in upserts if f['properties']['time'] >= oldest_time]
+    added = [f for f in upserts if f['id'] not in known]
+    updated = [f for f in upserts if f['id'] in known]
+    deleted = [event_id for event_id in deleted_ids if event_id in known]
+    if not (added or updated or deleted):
+        return
+    analysis, analysis_delta = analysis_change(previous['mag'], store['mag'])
+    views = {}
+    for size in METRIC_SIZES:
+        # Dashboards show the newest `size` events; each gets the statistics of its own view
+        view_analysis, view_delta = analysis_change(previous['mag'][:size], store['mag'][:size])
+        views[str(size)] = {'analysis': view_analysis, 'analysis_delta': view_delta}
+    publish_event('changes', {
+        'dataset_version': store.version,
+        'added': format_earthquakes(added),
+        'updated': format_earthquakes(updated),
+        'deleted': deleted,
+        'analysis': analysis,
+        'analysis_delta': analysis_delta,
+        'views': views,
+    })
+
+def analysis_change(previous_mags, mags):
+    """Magnitude statistics after an ingest and how much the headline numbers moved"""
+    before = format_aggregate(magnitude_aggregate(previous_mags) if len(previous_mags) else EMPTY_AGGREGATE)
+    after = format_aggregate(magnitude_aggregate(mags) if len(mags) else EMPTY_AGGREGATE)
+    after.pop('waktu_eksekusi')
+    return after, {name: round(after[name] - before[name], 3)
+                   for name in ('total_gempa', 'rata_rata_magnitudo', 'jumlah_berbahaya', 'max_magnitudo')}
+
+def live_feed_updater(interval=LIVE_FEED_INTERVAL):
+    """Keep the live feed layer fresh off the request path"""
+    while True:
+        try:
+            refresh_flight.do('live', refresh_live_feed)
+        except Exception as e:
+            print(f"Live feed update error: {e}")
+        time.sleep(interval)
 
 def fetch_earthquake_data(target_count):
     print(f"=== Fetching {target_count} REAL earthquake records (M >= 2.5) from USGS ===")
 
-    all_features = []
     batch_size = 2000  # Smaller batch size for better reliability
-    min_magnitude = 2.5  # Only earthquakes with magnitude >= 2.5
+    min_magnitude = MIN_MAGNITUDE  # Only earthquakes with magnitude >= 2.5
 
     # Optimized date ranges - start with most recent data first
     date_ranges = [
@@ -191,57 +533,8 @@ def fetch_earthquake_data(target_count):
         ("1999-01-01", "2001-12-31"),  # Late 1990s
     ]
 
-    for start_date, end_date in date_ranges:
-        if len(all_features) >= target_count:
-            break
-
-        print(f"Fetching M >= {min_magnitude} from {start_date} to {end_date}")
-        offset = 1
-        consecutive_errors = 0
-
-        while len(all_features) < target_count and consecutive_errors < 3:
-            remaining = target_count - len(all_features)
-            current_batch = min(batch_size, remaining, 10000)  # USGS limit is 20000 per request
-
-            url = f"https://earthquake.usgs.gov/fdsnws/event/1/query?format=geojson&offset={offset}&limit={current_batch}&minmagnitude={min_magnitude}&starttime={start_date}&endtime={end_date}&orderby=time"
-
-            try:
-                response = requests.get(url, timeout=60)  # Increased timeout
-                response.raise_for_status()
-                data = response.json()
-
-                batch_features = data.get('features', [])
-                if not batch_features:
-                    print(f"  No more data available for {start_date}-{end_date}")
-                    break
-
-                # Filter to ensure all have magnitude >= min_magnitude
-                valid_features = [f for f in batch_features if f['properties']['mag'] and f['properties']['mag'] >= min_magnitude]
-
-                # Filter out duplicates
-                existing_ids = {f['id'] for f in all_features}
-                new_features = [f for f in valid_features if f['id'] not in existing_ids]
-
-                all_features.extend(new_features)
-                offset += current_batch
-                consecutive_errors = 0  # Reset error counter
-
-                print(f"  Fetched {len(new_features)} valid records (total: {len(all_features)}/{target_count})")
-
-                if len(batch_features) < current_batch:
-                    print(f"  Reached end of data for {start_date}-{end_date}")
-                    break
-
-                # Small delay to be respectful to the API
-                time.sleep(0.1)
-
-            except Exception as e:
-                consecutive_errors += 1
-                print(f"  Error fetching from {start_date} (attempt {consecutive_errors}/3): {e}")
-                if consecutive_errors >= 3:
-                    print(f"  Giving up on {start_date}-{end_date} after 3 consecutive errors")
-                    break
-                time.sleep(1)  # Wait before retry
+    # Date ranges and pages are fetched concurrently over pooled connections
+    all_features = usgs_client.fetch_events(date_ranges, target_count, min_magnitude, batch_size=batch_size)
 
     # Final processing
     all_features.sort(key=lambda x: x['properties']['time'], reverse=True)
@@ -259,188 +552,8 @@ def fetch_earthquake_data(target_count):
     print(f"FINAL: {len(result_data['features'])} REAL earthquake records (M >= {min_magnitude}) collected from USGS")
     return result_data
 
-@app.route('/')
-def index():
-    return app.send_static_file('dashboard.html')
-
-@app.route('/analysis')
-def analysis():
-    return app.send_static_file('index.html')
-
-@app.route('/earthquakes', methods=['GET'])
-def get_earthquakes():
-    size = int(request.args.get('size', 10))
-    sort_by = request.args.get('sort', 'time')
-
-    # Use cache for all sizes
-    cache_key = get_cache_key(size)
-    data = load_from_cache(cache_key)
-    if data and len(data['features']) >= size:
-        print(f"Loaded {len(data['features'])} records from cache for size {size}")
-        data['features'] = data['features'][:size]
-    else:
-        print(f"Cache miss or insufficient for size {size}, fetching fresh data...")
-
-        # For sizes > 100, combine historical + live feed for comprehensive data
-        if size > 100:
-            print(f"For size > 100, combining historical + live feed for comprehensive data")
-            data = combine_historical_live(size)
-        else:
-            # For smaller sizes, use cached historical data for fast loading
-            large_cache_key = get_cache_key(20000)
-            historical_data = load_from_cache(large_cache_key)
-            if historical_data:
-                data = {
-                    'type': 'FeatureCollection',
-                    'features': historical_data['features'][:size]
-                }
-                print(f"Using cached historical data ({len(data['features'])} records)")
-            else:
-                print("No cached data, fetching...")
-                data = fetch_earthquake_data(size)
-
-        # Cache the result
-        if data and len(data['features']) >= size:
-            with cache_lock:
-                save_to_cache(cache_key, data)
-            print(f"Cached {len(data['features'])} records for size {size}")
-
-    if data is None:
-        return jsonify({'error': 'Failed to fetch earthquake data'}), 500
-
-    features = data.get('features', [])
-
-    # Clean up old cache files periodically
-    cleanup_thread = threading.Thread(target=cleanup_old_cache, daemon=True)
-    cleanup_thread.start()
-
-    # Sort data
-    if sort_by == 'magnitude':
-        features.sort(key=lambda x: x['properties']['mag'], reverse=True)
-        features = features[:size]  # Limit to requested size
-        print(f"For sort=magnitude, returning {len(features)} records from highest to lowest magnitude")
-    elif sort_by == 'location':
-        features.sort(key=lambda x: x['properties']['place'] or '')
-        features = features[:size]
-    else:  # time
-        features.sort(key=lambda x: x['properties']['time'], reverse=True)
-        features = features[:size]
-
-    # Check if analysis is cached
-    analysis_cache_key = f"analysis_{size}_{DATA_VERSION}"
-    cached_analysis = load_from_cache(analysis_cache_key)
-    if cached_analysis:
-        analysis = cached_analysis
-        print(f"Loaded analysis from cache for size {size}")
-    else:
-        print(f"Computing analysis for size {size}")
-        # Analisis Kompleksitas Algoritma - Implementasi Iteratif dan Rekursif
-
-        # Fungsi iteratif - O(n) time, O(1) space
-    def analyze_earthquakes_iterative(features):
-        start_time = time.time()
-        total_gempa = 0
-        sum_magnitudo = 0.0
-        jumlah_berbahaya = 0
-        min_mag = float('inf')
-        max_mag = float('-inf')
-        sum_squares = 0.0  # Untuk menghitung variansi
-
-        for feature in features:
-            magnitudo = feature['properties']['mag']
-            total_gempa += 1
-            sum_magnitudo += magnitudo
-            sum_squares += magnitudo ** 2
-            min_mag = min(min_mag, magnitudo)
-            max_mag = max(max_mag, magnitudo)
-            if magnitudo >= 5.0:
-                jumlah_berbahaya += 1
-
-        rata_rata_magnitudo = sum_magnitudo / total_gempa if total_gempa > 0 else 0.0
-        variansi = (sum_squares / total_gempa - rata_rata_magnitudo ** 2) if total_gempa > 1 else 0.0
-        std_dev = variansi ** 0.5 if variansi > 0 else 0.0
-        persentase_berbahaya = (jumlah_berbahaya / total_gempa * 100) if total_gempa > 0 else 0.0
-
-        execution_time = time.time() - start_time
-
-        return {
-            'total_gempa': total_gempa,
-            'rata_rata_magnitudo': round(rata_rata_magnitudo, 3),
-            'min_magnitudo': round(min_mag, 1) if min_mag != float('inf') else 0.0,
-            'max_magnitudo': round(max_mag, 1) if max_mag != float('-inf') else 0.0,
-            'standar_deviasi': round(std_dev, 3),
-            'jumlah_berbahaya': jumlah_berbahaya,
-            'persentase_berbahaya': round(persentase_berbahaya, 2),
-            'waktu_eksekusi': round(execution_time, 6)
-        }
-
-    # Fungsi rekursif - O(n) time, O(n) space (call stack)
-    def analyze_earthquakes_recursive(features, index=0, total_gempa=0, sum_magnitudo=0.0, jumlah_berbahaya=0, sum_squares=0.0, min_mag=float('inf'), max_mag=float('-inf')):
-        if index >= len(features):
-            rata_rata_magnitudo = sum_magnitudo / total_gempa if total_gempa > 0 else 0.0
-            variansi = (sum_squares / total_gempa - rata_rata_magnitudo ** 2) if total_gempa > 1 else 0.0
-            std_dev = variansi ** 0.5 if variansi > 0 else 0.0
-            persentase_berbahaya = (jumlah_berbahaya / total_gempa * 100) if total_gempa > 0 else 0.0
-            return {
-                'total_gempa': total_gempa,
-                'rata_rata_magnitudo': round(rata_rata_magnitudo, 3),
-                'min_magnitudo': round(min_mag, 1) if min_mag != float('inf') else 0.0,
-                'max_magnitudo': round(max_mag, 1) if max_mag != float('-inf') else 0.0,
-                'standar_deviasi': round(std_dev, 3),
-                'jumlah_berbahaya': jumlah_berbahaya,
-                'persentase_berbahaya': round(persentase_berbahaya, 2),
-                'waktu_eksekusi': 0  # akan diukur di luar
-            }
-
-        magnitudo = features[index]['properties']['mag']
-        new_total_gempa = total_gempa + 1
-        new_sum_magnitudo = sum_magnitudo + magnitudo
-        new_sum_squares = sum_squares + magnitudo ** 2
-        new_min_mag = min(min_mag, magnitudo)
-        new_max_mag = max(max_mag, magnitudo)
-        new_jumlah_berbahaya = jumlah_berbahaya + (1 if magnitudo >= 5.0 else 0)
-
-        return analyze_earthquakes_recursive(features, index + 1, new_total_gempa, new_sum_magnitudo, new_jumlah_berbahaya, new_sum_squares, new_min_mag, new_max_mag)
-
-    # Jalankan analisis iteratif
-    start_time_iterative = time.time()
-    iterative_result = analyze_earthquakes_iterative(features)
-    iterative_result['waktu_eksekusi'] = round(time.time() - start_time_iterative, 6)
-
-    # Jalankan analisis rekursif (dengan batas untuk menghindari stack overflow)
-    recursive_result = None
-    recursive_error = None
-    if len(features) <= 1200:  # Batasi untuk rekursif - push to maximum limit for true stack overflow demonstration
-        try:
-            start_time_recursive = time.time()
-            recursive_result = analyze_earthquakes_recursive(features)
-            recursive_result['waktu_eksekusi'] = round(time.time() - start_time_recursive, 6)
-        except RecursionError:
-            recursive_error = "Stack overflow - terlalu banyak data untuk algoritma rekursif"
-    else:
-        recursive_error = "Stack overflow - terlalu banyak data untuk algoritma rekursif"
-        # Don't set recursive_result for large datasets to show error in frontend
-
-    # Analisis kompleksitas
-    n = len(features)
-    complexity_analysis = {
-        'iterative': {
-            'best_case': f'O(n) - {n} iterasi loop, setiap elemen diproses dalam waktu konstan O(1)',
-            'worst_case': f'O(n) - {n} iterasi loop, kompleksitas tetap linier meskipun data tidak terurut',
-            'average_case': f'O(n) - {n} iterasi loop, rata-rata O(1) per elemen untuk operasi aritmatika',
-            'space_complexity': 'O(1) - menggunakan variabel tetap (total_gempa, sum_magnitudo, dll) tanpa struktur data tambahan',
-            'suitability': 'Optimal untuk dataset seismik skala global (n=20,000+), performa stabil dan efisien memori'
-        },
-        'recursive': {
-            'best_case': f'O(n) - {n} recursive calls, setiap call memproses satu elemen dalam O(1)',
-            'worst_case': f'O(n) - {n} recursive calls, risiko stack overflow ketika n > 1000 akibat batas call stack Python',
-            'average_case': f'O(n) - {n} recursive calls, overhead call stack meningkatkan kompleksitas praktis',
-            'space_complexity': f'O(n) - {n} stack frames, setiap call menyimpan state (index, total, sum_mag, dll)',
-            'suitability': 'Tidak sesuai untuk data seismik besar, risiko crash sistem; cocok hanya untuk n ≤ 1200 (dari maksimal 3000 recursion limit)'
-        }
-    }
-
-    # Format data untuk frontend
+def format_earthquakes(features):
+    """Flatten GeoJSON features into the row format the frontend expects"""
     earthquakes = []
     for feature in features:
         props = feature['properties']
@@ -455,27 +568,434 @@ def get_earthquakes():
             'depth': geom['coordinates'][2],
             'url': props['url']
         })
-
-    analysis_data = {
-        'iterative': iterative_result,
-        'recursive': recursive_result if recursive_result else {'error': recursive_error},
-        'complexity_analysis': complexity_analysis
-    }
+    return earthquakes
+
+def ordered_rows(dataset, size, filters, sort_by):
+    """Dataset row positions to return, in `sort_by` order, and the filter match count
+
+    Positions always index the dataset itself, so pages and streamed chunks
+    decode only their own rows instead of a materialized copy of the view.
+    """
+    if not filters:
+        with metrics.stage('sort'):
+            return dataset.head(size).sort_order(sort_by), None
+    with metrics.stage('filter'):
+        matched_rows = filter_rows(dataset, filters)
+    rows = matched_rows[:size]
+    if sort_by == 'time':
+        return rows, len(matched_rows)
+    with metrics.stage('sort'):
+        # Keep the full-store permutation order, restricted to the selected rows
+        selected = np.zeros(len(dataset), dtype=bool)
+        selected[rows] = True
+        order = dataset.sort_order(sort_by)
+        return order[selected[order]], len(matched_rows)
+
+def get_analysis(dataset, order, size, filters):
+    """Cached analysis for a size/filter combination of one store generation, computed on a miss"""
+    version = getattr(dataset, 'version', None)
+    analysis_cache_key = None
+    if version is not None:
+        # The generation is part of the key, so an analysis computed while the store
+        # was being replaced can never be served for the new one
+        analysis_cache_key = f"analysis_{size}_{version}_{DATA_VERSION}"
+        if filters:
+            analysis_cache_key = f"analysis_{size}_{filter_key(filters)}_{version}_{DATA_VERSION}"
+        analysis_data = load_from_cache(analysis_cache_key)
+        if analysis_data:
+            print(f"Loaded analysis from cache for size {size}")
+            return analysis_data
+
+    print(f"Computing analysis for size {size}")
+    with metrics.stage('analysis'):
+        analysis_data = run_analysis(dataset.to_features(order), np.asarray(dataset['mag'])[order])
+    if analysis_cache_key is None:
+        # A direct fetch that is not a published generation: nothing to key it by
+        return analysis_data
 
     # Cache the computed analysis
     with cache_lock:
         save_to_cache(analysis_cache_key, analysis_data)
     print(f"Cached analysis for size {size}")
+    return analysis_data
+
+def stream_json(dataset, order, head, analysis_fn):
+    """The regular /earthquakes document, encoded and sent STREAM_CHUNK_ROWS rows at a time"""
+    yield '{"earthquakes":['
+    separator = ''
+    for chunk in iter_chunks(order):
+        # One encode per chunk; strip the list brackets and splice into the open array
+        yield separator + app.json.dumps(format_earthquakes(dataset.to_features(chunk)))[1:-1]
+        separator = ','
+    # Analysis goes last so the rows are never held back by it
+    tail = dict(head, analysis=analysis_fn())
+    yield '],' + app.json.dumps(tail)[1:]
+
+def encode_response(response_key, raw, mimetype):
+    """Gzip an encoded response body once; returns (etag, gzip body, mimetype)"""
+    with metrics.stage('compress'):
+        # The ETag names the view (store generation + query), not the body, so every worker hands
+        # out the same validator for the same view. It is weak: bodies of one view are equivalent
+        # but not byte-identical (response timestamp, each worker's measured analysis timings)
+        etag = hashlib.sha1(f"{DATA_VERSION}|{response_key}".encode('utf-8')).hexdigest()[:20]
+        # mtime=0 keeps the compressed bytes identical for identical bodies
+        return etag, gzip.compress(raw, compresslevel=RESPONSE_GZIP_LEVEL, mtime=0), mimetype
+
+def send_encoded_response(etag, body, mimetype):
+    """304 for a matching If-None-Match, otherwise the precompressed body"""
+    # Each content-coding gets its own validator; either one revalidates
+    gzip_etag = f"{etag}-gzip"
+    accepts_gzip = 'gzip' in request.accept_encodings
+    # If-None-Match uses weak comparison
+    if request.if_none_match.contains_weak(etag) or request.if_none_match.contains_weak(gzip_etag):
+        response = Response(status=304)
+    elif accepts_gzip:
+        response = Response(body, mimetype=mimetype)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(gzip.decompress(body), mimetype=mimetype)
+    response.set_etag(gzip_etag if accepts_gzip else etag, weak=True)
+    response.vary.add('Accept-Encoding')
+    # Always revalidate; an unchanged dataset answers with an empty 304
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def cache_body(response_key, raw, mimetype):
+    """Compress a body once and keep it (with its ETag) in the response cache"""
+    encoded = encode_response(response_key, raw, mimetype)
+    response_cache.put(response_key, encoded, len(encoded[1]))
+    return encoded
+
+def send_body(response_key, raw, mimetype):
+    """Send an encoded body, caching it (gzipped, with its ETag) when it has a response key"""
+    if response_key is None:
+        return Response(raw, mimetype=mimetype)
+    return send_encoded_response(*cache_body(response_key, raw, mimetype))
+
+def view_key(version, output_format, size, sort_by, filters):
+    """Response cache key for one /earthquakes view of a store generation"""
+    return f"{version}|{output_format}|{size}|{sort_by}|{filter_key(filters)}"
+
+def response_head(order, matched, filters):
+    """Fields shared by every /earthquakes response shape"""
+    head = {'total': len(order), 'timestamp': datetime.now().isoformat(), 'cached': True}
+    if filters:
+        head['filters'] = filters
+        head['matched'] = matched
+    return head
+
+def encode_view(dataset, order, head, size, filters, output_format):
+    """Complete body for a json, columnar or binary view: (raw bytes, mimetype)"""
+    analysis_data = get_analysis(dataset, order, size, filters)
+
+    if output_format in ('columnar', 'binary'):
+        with metrics.stage('build'):
+            columns = columnar_columns(dataset, order)
+        with metrics.stage('serialize'):
+            if output_format == 'columnar':
+                # One array per field, places dictionary-encoded, urls rebuilt client-side from ids
+                document = columnar_json(columns, dict(head, analysis=analysis_data))
+                return app.json.dumps(document).encode('utf-8'), 'application/json'
+            return columnar_binary(columns, dict(head, analysis=analysis_data), dumps=app.json.dumps), BINARY_MIMETYPE
 
-    response_data = {
+    # Format data untuk frontend
+    with metrics.stage('build'):
+        earthquakes = format_earthquakes(dataset.to_features(order))
+
+    response_data = dict(head, earthquakes=earthquakes, analysis=analysis_data)
+    with metrics.stage('serialize'):
+        return app.json.dumps(response_data).encode('utf-8'), 'application/json'
+
+NDJSON_ENCODER = json.JSONEncoder(sort_keys=True, separators=(',', ':'))
+
+def stream_ndjson(dataset, order, head):
+    """A metadata line followed by one earthquake per line"""
+    yield app.json.dumps(head) + '\n'
+    for chunk in iter_chunks(order):
+        rows = format_earthquakes(dataset.to_features(chunk))
+        # One shared encoder; per-call dumps() setup dominates at one call per row
+        yield ''.join(NDJSON_ENCODER.encode(row) + '\n' for row in rows)
+
+def full_store():
+    """The canonical store for endpoints that need every record; fetched on a miss only where USGS may be called"""
+    store = load_store(allow_expired=True)
+    if store is None and FETCHES_UPSTREAM:
+        store, _ = refresh_flight.do('store', refresh_dataset, STORE_SIZE)
+    return store if store is not None and hasattr(store, 'version') else None
+
+def dataset_unavailable():
+    if FETCHES_UPSTREAM:
+        return jsonify({'error': 'Failed to fetch earthquake data'}), 500
+    # Worker before the refresher has published a first generation
+    return jsonify({'error': 'Earthquake data is not published yet, retry shortly'}), 503, {'Retry-After': '5'}
+
+def get_spatial_index(store):
+    """KD-tree for this store generation, built once per version"""
+    with spatial_lock:
+        if spatial_index['version'] != store.version:
+            start_time = time.time()
+            spatial_index['tree'] = SphereKDTree(store['lat'], store['lon'])
+            spatial_index['version'] = store.version
+            print(f"Built spatial index for {store.version} ({len(store)} points) in {time.time() - start_time:.3f}s")
+        return spatial_index['tree']
+
+def get_rollups(store):
+    """Hourly rollup indexes of a store generation (precomputed at ingest, built here only for older generations)"""
+    if has_rollups(store.indexes, len(store)):
+        return store.indexes
+    with rollup_lock:
+        if rollup_fallback['version'] != store.version:
+            start_time = time.time()
+            rollup_fallback['indexes'] = build_rollup_indexes(store.columns)
+            rollup_fallback['version'] = store.version
+            print(f"Built rollups for {store.version} in {time.time() - start_time:.3f}s")
+        return rollup_fallback['indexes']
+
+@app.route('/')
+def index():
+    return app.send_static_file('dashboard.html')
+
+@app.route('/analysis')
+def analysis():
+    return app.send_static_file('index.html')
+
+@app.route('/earthquakes', methods=['GET'])
+def get_earthquakes():
+    size = int(request.args.get('size', 10))
+    sort_by = request.args.get('sort', 'time')
+    try:
+        filters = parse_filters(request.args)
+    except FilterError as e:
+        return jsonify({'error': str(e)}), 400
+    output_format = request.args.get('format', 'json').lower()
+    if output_format not in ('json', 'ndjson', 'columnar', 'binary'):
+        return jsonify({'error': "Invalid format: expected json, ndjson, columnar or binary"}), 400
+    stream = request.args.get('stream', '').lower() in ('1', 'true')
+    cursor = request.args.get('cursor')
+    limit = request.args.get('limit')
+    if output_format in ('columnar', 'binary') and (stream or limit is not None or cursor is not None):
+        return jsonify({'error': f"format={output_format} does not support stream, limit or cursor"}), 400
+    if limit is not None or cursor is not None:
+        try:
+            limit = int(limit) if limit is not None else 1000
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            return jsonify({'error': f"Invalid limit: expected 1 to {MAX_PAGE_SIZE}"}), 400
+    cacheable = output_format != 'ndjson' and not stream and limit is None
+    # Demand drives refresh frequency and which views the scheduler pre-warms
+    refresh_scheduler.record((size, sort_by, filter_key(filters), output_format if cacheable else 'json'),
+                             (size, sort_by, filters, output_format if cacheable else 'json'))
+
+    # Serve any size as a zero-copy prefix of the canonical store
+    with metrics.stage('cache_lookup'):
+        store = load_store(allow_expired=True)
+    store_age = time.time() - store.timestamp if store is not None else None
+    # Workers always serve what the refresher published, however old or small; a complete store
+    # answers every size, since a refresh would not find more rows. Small sizes never wait for
+    # upstream while a store can answer them: a past-grace store is served and refreshed behind
+    covers = store is not None and (len(store) >= size or store_complete(store))
+    if store is not None and (not FETCHES_UPSTREAM or (covers and (store_age < CACHE_DURATION + STALE_GRACE
+                                                                   or size <= 100))):
+        served = 'store'
+        if store_age >= CACHE_DURATION:
+            served = 'stale'
+            # Stale-while-revalidate: one background refresh, everyone keeps the stale copy meanwhile
+            if FETCHES_UPSTREAM and refresh_flight.do_async('store', refresh_dataset_in_background, STORE_SIZE):
+                print(f"Store {store.version} is stale, refreshing in background")
+        dataset = store
+        print(f"Loaded {min(size, len(store))} records from columnar store for size {size}")
+    elif not FETCHES_UPSTREAM:
+        metrics.inc('earthquakes_requests_total', size=size_label(size), cache='error')
+        return dataset_unavailable()
+    else:
+        served = 'refresh'
+        # Only one caller per dataset fetches; concurrent callers wait for its result
+        with metrics.stage('refresh'):
+            dataset, shared = refresh_flight.do(get_dataset_key(size), refresh_dataset, size)
+            if shared and (dataset is None or (len(dataset) < size and not store_complete(dataset))):
+                # Joined a smaller refresh (e.g. a background updater); run our own
+                dataset, shared = refresh_flight.do(get_dataset_key(size), refresh_dataset, size)
+        if shared:
+            print(f"Joined in-flight refresh for size {size}")
+        if dataset is None and store is not None:
+            # Upstream failed: an old store is still better than an error
+            served = 'stale'
+            dataset = store
+            print(f"Refresh for size {size} failed, serving store {store.version}")
+        if dataset is None:
+            metrics.inc('earthquakes_requests_total', size=size_label(size), cache='error')
+            return jsonify({'error': 'Failed to fetch earthquake data'}), 500
+
+    # Repeat polls of an unchanged generation are answered from the encoded-response cache
+    version = getattr(dataset, 'version', None)
+    response_key = None
+    if version is not None and cacheable:
+        response_key = view_key(version, output_format, size, sort_by, filters)
+        with metrics.stage('cache_lookup'):
+            encoded = response_cache.get(response_key)
+        if encoded is not None:
+            metrics.inc('earthquakes_requests_total', size=size_label(size), cache='response')
+            return send_encoded_response(*encoded)
+    metrics.inc('earthquakes_requests_total', size=size_label(size), cache=served)
+
+    # Row positions in the requested order, from the store's precomputed indexes
+    order, matched = ordered_rows(dataset, size, filters, sort_by)
+    if filters:
+        print(f"Filters {filters} matched {matched} records, returning {len(order)}")
+    if sort_by == 'magnitude':
+        print(f"For sort=magnitude, returning {len(order)} records from highest to lowest magnitude")
+
+    head = response_head(order, matched, filters)
+
+    if output_format == 'ndjson':
+        head['dataset_version'] = version
+        return Response(stream_with_context(stream_ndjson(dataset, order, head)), mimetype='application/x-ndjson')
+    if stream:
+        analysis_fn = lambda: get_analysis(dataset, order, size, filters)
+        return Response(stream_with_context(stream_json(dataset, order, head, analysis_fn)), mimetype='application/json')
+
+    if limit is not None:
+        # Cursor pagination: an offset into this generation's sorted row order
+        fingerprint = query_fingerprint(size, sort_by, filter_key(filters))
+        try:
+            offset = decode_cursor(cursor, version, fingerprint) if cursor else 0
+        except CursorExpired as e:
+            return jsonify({'error': str(e)}), 410
+        except CursorError as e:
+            return jsonify({'error': str(e)}), 400
+        page = order[offset:offset + limit]
+        next_offset = offset + len(page)
+        with metrics.stage('build'):
+            earthquakes = format_earthquakes(dataset.to_features(page))
+        response_data = dict(
+            head,
+            earthquakes=earthquakes,
+            total=len(page),
+            available=len(order),
+            next_cursor=encode_cursor(version, fingerprint, next_offset) if next_offset < len(order) else None,
+        )
+        if offset == 0:
+            response_data['analysis'] = get_analysis(dataset, order, size, filters)
+        return jsonify(response_data)
+
+    raw, mimetype = encode_view(dataset, order, head, size, filters, output_format)
+    return send_body(response_key, raw, mimetype)
+
+@app.route('/earthquakes/nearby', methods=['GET'])
+def get_nearby_earthquakes():
+    """Events within `radius` km of (lat, lon), or the `k` nearest events"""
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        radius = float(request.args['radius']) if 'radius' in request.args else None
+        k = int(request.args['k']) if 'k' in request.args else None
+        limit = int(request.args.get('limit', 1000))
+    except (KeyError, ValueError):
+        return jsonify({'error': 'lat and lon are required; radius (km), k and limit must be numbers'}), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({'error': 'lat must be within [-90, 90] and lon within [-180, 180]'}), 400
+    if (radius is None) == (k is None):
+        return jsonify({'error': 'Specify exactly one of radius or k'}), 400
+    if (radius is not None and radius <= 0) or (k is not None and not 1 <= k <= 1000) or limit < 1:
+        return jsonify({'error': 'radius must be positive, k within [1, 1000] and limit at least 1'}), 400
+
+    store = full_store()
+    if store is None:
+        return dataset_unavailable()
+
+    tree = get_spatial_index(store)
+    start_time = time.time()
+    if radius is not None:
+        rows, distances = tree.query_radius(lat, lon, radius)
+        matched = len(rows)
+        rows, distances = rows[:limit], distances[:limit]
+    else:
+        rows, distances = tree.query_knn(lat, lon, k)
+        matched = len(rows)
+    query_time = time.time() - start_time
+
+    # Rows come back nearest first; take() keeps that order
+    earthquakes = format_earthquakes(store.take(rows).to_features())
+    for earthquake, distance in zip(earthquakes, distances.tolist()):
+        earthquake['distance_km'] = round(distance, 3)
+
+    return jsonify({
         'earthquakes': earthquakes,
         'total': len(earthquakes),
-        'analysis': analysis_data,
-        'timestamp': datetime.now().isoformat(),
-        'cached': True  # Data loaded from static cache
-    }
+        'matched': matched,
+        'query': {'lat': lat, 'lon': lon, 'radius_km': radius, 'k': k},
+        'query_time': round(query_time, 6),
+        'dataset_version': store.version,
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/earthquakes/rollups', methods=['GET'])
+def get_earthquake_rollups():
+    """Counts, magnitude/depth distributions, percentiles and b-value for a time window"""
+    try:
+        start = parse_time(request.args['start'], 'start') if request.args.get('start') else None
+        end = parse_time(request.args['end'], 'end') if request.args.get('end') else None
+        percentiles = parse_percentiles(request.args.get('percentiles'))
+        mc = float(request.args['mc']) if request.args.get('mc') else None
+    except (FilterError, RollupError) as e:
+        return jsonify({'error': str(e)}), 400
+    except ValueError:
+        return jsonify({'error': 'Invalid mc: expected a number'}), 400
+    interval = request.args.get('interval', 'day').lower()
+    if interval not in ('hour', 'day'):
+        return jsonify({'error': 'Invalid interval: expected hour or day'}), 400
+
+    store = full_store()
+    if store is None:
+        return dataset_unavailable()
+
+    response_key = f"{store.version}|rollups|{start}|{end}|{interval}|{','.join(map(str, percentiles))}|{mc}"
+    encoded = response_cache.get(response_key)
+    if encoded is not None:
+        return send_encoded_response(*encoded)
+    with metrics.stage('rollup'):
+        rollup = summarize(get_rollups(store), start, end, interval, percentiles, mc)
+    response_data = dict(rollup, dataset_version=store.version, timestamp=datetime.now().isoformat())
+    return send_body(response_key, app.json.dumps(response_data).encode('utf-8'), 'application/json')
+
+@app.route('/earthquakes/events', methods=['GET'])
+@limiter.exempt
+def stream_earthquake_events():
+    """Server-Sent Events: new, revised and deleted earthquakes as they are ingested"""
+    # EventSource resends the last id it saw when it reconnects
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    subscription = broadcaster.subscribe(last_event_id)
+    if subscription is None:
+        # Every stream slot of this worker is taken; the dashboard retries later
+        response = jsonify({'error': 'Too many event streams, retry later'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(SSE_RETRY_AFTER)
+        return response
+    response = Response(broadcaster.stream(subscription), mimetype='text/event-stream')
+    # A body that is never iterated does not run the generator's cleanup
+    response.call_on_close(lambda: broadcaster.unsubscribe(subscription))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
-    return jsonify(response_data)
+@app.route('/metrics', methods=['GET'])
+@limiter.exempt
+def get_metrics():
+    """Prometheus text exposition of counters and latency histograms"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.before_request
+def start_request_profile():
+    # Opt-in per-request stage breakdown, returned as a Server-Timing header
+    metrics.start_profile(request.headers.get('X-Profile', '').lower() in ('1', 'true'))
+
+@app.after_request
+def add_server_timing(response):
+    profile = metrics.profile()
+    if profile:
+        response.headers['Server-Timing'] = ', '.join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in profile)
+    return response
 
 @app.after_request
 def add_security_headers(response):
@@ -490,63 +1010,123 @@ def add_security_headers(response):
 
 
 
-def background_cache_updater(target_size, update_interval=300):
-    """Intelligent background cache updater with performance monitoring for specific size"""
-    while True:
-        try:
-            cache_key = get_cache_key(target_size)
-            cache_file = os.path.join(CACHE_DIR, f"{cache_key}.json.gz")
-
-            # Check if cache needs updating (only if older than update_interval/2 or doesn't exist)
-            needs_update = True
-            if os.path.exists(cache_file):
-                try:
-                    with gzip.open(cache_file, 'rt') as f:
-                        cached_data = json.load(f)
-                        cache_age = time.time() - cached_data.get('timestamp', 0)
-                        # Only update if cache is older than half the update interval
-                        needs_update = cache_age > (update_interval / 2)
-                        if not needs_update:
-                            print(f"Background cache for {target_size} still fresh ({cache_age/60:.1f} minutes old), skipping update")
-                except:
-                    print(f"Background cache file for {target_size} corrupted, will update")
-                    needs_update = True
-
-            if needs_update:
-                print(f"Background cache update starting for {target_size} records...")
-                start_time = time.time()
-                data = fetch_earthquake_data(target_size)
-                update_time = time.time() - start_time
-
-                if data:
-                    with cache_lock:
-                        save_to_cache(cache_key, data)
-                    print(f"Background cache updated with {len(data['features'])} records in {update_time:.1f}s")
-                else:
-                    print(f"Background cache update failed for {target_size}")
-            else:
-                # Print cache stats periodically
-                hit_rate = (cache_stats['hits'] / max(cache_stats['total_loads'], 1)) * 100
-                print(f"Cache status for {target_size}: {hit_rate:.1f}% hit rate, {cache_stats['compression_ratio']:.1f}% compression")
+def sync_store_delta():
+    """Apply events added, revised or deleted upstream since the store's last sync"""
+    global current_store
+    store = load_store(allow_expired=True)
+    if store is None or not store.meta.get('last_sync') or len(store) == 0:
+        return None
+    last_sync = store.meta['last_sync']
+    if time.time() - last_sync / 1000 > DELTA_MAX_AGE:
+        print(f"Store watermark is older than {DELTA_MAX_AGE // 86400} days, full rebuild needed")
+        return None
+
+    sync_started = int(time.time() * 1000)
+    oldest_time = int(store['time'][len(store) - 1])
+    changes = usgs_client.fetch_updates(oldest_time, last_sync - DELTA_OVERLAP_MS, MIN_MAGNITUDE)
+
+    deleted_ids = []
+    upserts = []
+    for f in changes:
+        props = f['properties']
+        if props.get('status') == 'deleted' or props.get('mag') is None or props['mag'] < MIN_MAGNITUDE:
+            deleted_ids.append(f['id'])
+        else:
+            upserts.append(f)
 
-        except Exception as e:
-            print(f"Background cache update error for {target_size}: {e}")
+    with cache_lock:
+        # Merge onto the published generation, which may include live events merged since `store` was read
+        store = current_store
+        if not upserts and not deleted_ids:
+            # Nothing changed upstream; only advance the watermark and freshness
+            current_store = touch_store(STORE_DIR, store, last_sync=sync_started)
+        else:
+            columns = merge_columns(store, upserts, deleted_ids, limit=max(len(store), STORE_SIZE))
+            current_store = write_columns(STORE_DIR, columns, last_sync=sync_started, complete=store_complete(store))
+            invalidate_derived_caches()
+            publish_changes(store, current_store, upserts, deleted_ids)
+    print(f"Delta sync applied {len(upserts)} upserts and {len(deleted_ids)} deletions "
+          f"(store {current_store.version}, {len(current_store)} records)")
+    return current_store
+
+def background_refresh(target_size):
+    """Delta-sync the store, or fetch target_size records when no usable watermark exists"""
+    store = load_store(allow_expired=True)
+    try:
+        if store is not None and (len(store) >= target_size or store_complete(store)):
+            synced = sync_store_delta()
+            if synced is not None:
+                return synced
+        data = fetch_earthquake_data(target_size)
+    except UpstreamError as e:
+        print(f"Background refresh failed: {e}")
+        return None
+    if not data['features']:
+        return None
+    with cache_lock:
+        return save_store(columns_from_features(data['features']))
+
+def scheduled_refresh():
+    """One store refresh for every size; joins a request-triggered refresh already in flight"""
+    dataset, shared = refresh_flight.do('store', background_refresh, STORE_SIZE)
+    if shared:
+        print("Scheduled refresh joined an in-flight refresh")
+    return dataset
+
+def store_age():
+    store = load_store(allow_expired=True)
+    return time.time() - store.timestamp if store is not None else None
+
+def warm_view(params):
+    """Precompute and cache one /earthquakes view for the current generation; False if already warm"""
+    size, sort_by, filters, output_format = params
+    store = load_store(allow_expired=True)
+    if store is None or (len(store) < size and not store_complete(store)):
+        return False
+    response_key = view_key(store.version, output_format, size, sort_by, filters)
+    if response_key in response_cache:
+        return False
+    order, matched = ordered_rows(store, size, filters, sort_by)
+    raw, mimetype = encode_view(store, order, response_head(order, matched, filters), size, filters, output_format)
+    cache_body(response_key, raw, mimetype)
+    print(f"Warmed {output_format} view for size {size}, sort {sort_by}, filters {filters or 'none'}")
+    return True
+
+# One demand-driven scheduler instead of fixed per-size updater threads; workers only warm views
+refresh_scheduler = RefreshScheduler(
+    refresh=scheduled_refresh if FETCHES_UPSTREAM else None,
+    warm=warm_view,
+    store_age=store_age,
+    upstream_requests=lambda: usgs_client.stats['requests'],
+    budget_per_hour=UPSTREAM_BUDGET_PER_HOUR,
+    min_interval=MIN_REFRESH_INTERVAL,
+    max_interval=MAX_REFRESH_INTERVAL,
+    tick=SCHEDULER_TICK,
+    metrics=metrics,
+)
 
-        # Sleep for specified interval (default 5 minutes for faster updates)
-        time.sleep(update_interval)
+def start_background_jobs():
+    """Janitor, live feed and refresh scheduler for the process that owns the store"""
+    # Open (or seed) the store before the janitor can expire the legacy files it is seeded from
+    load_store(allow_expired=True)
+    janitor_thread = threading.Thread(target=cache_janitor, daemon=True)
+    janitor_thread.start()
 
-if __name__ == '__main__':
-    # Start multiple background cache updaters for different sizes (24/7 operation)
-    popular_sizes = [5000, 10000, 20000]
-    update_intervals = [300, 300, 600]  # 5 minutes for smaller, 10 minutes for largest
+    live_feed_thread = threading.Thread(target=live_feed_updater, daemon=True)
+    live_feed_thread.start()
 
-    updater_threads = []
-    for size, interval in zip(popular_sizes, update_intervals):
-        updater_thread = threading.Thread(target=background_cache_updater, args=(size, interval), daemon=True)
-        updater_thread.start()
-        updater_threads.append(updater_thread)
-        print(f"Background cache updater started for {size} records (interval: {interval}s)")
+    scheduler_thread = threading.Thread(target=refresh_scheduler.run, daemon=True)
+    scheduler_thread.start()
+    print(f"Refresh scheduler running (budget {UPSTREAM_BUDGET_PER_HOUR} upstream requests/hour, "
+          f"refresh every {MIN_REFRESH_INTERVAL}-{MAX_REFRESH_INTERVAL}s by demand)")
+    return scheduler_thread
 
-    print(f"Total {len(updater_threads)} background cache updaters running 24/7")
+def start_worker_jobs():
+    """Per-worker threads: relay the refresher's SSE events and warm this worker's response cache"""
+    load_store(allow_expired=True)
+    threading.Thread(target=event_log.follow, args=(broadcaster.relay,), daemon=True).start()
+    threading.Thread(target=refresh_scheduler.run, daemon=True).start()
 
+if __name__ == '__main__':
+    start_background_jobs()
     app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
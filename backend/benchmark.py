@@ -0,0 +1,247 @@
+"""Benchmark the analysis strategies on the committed datasets and fit time against n
+
+    python backend/benchmark.py --output bench.json
+    python backend/benchmark.py --baseline bench.json    # exit status 1 on regressions
+
+Each cache/all_<n>_v10.json.gz dataset is run through every strategy with
+warm-up rounds and repeated perf_counter_ns timings (garbage collection
+off while timing). Separate untimed runs record peak traced memory and the
+deepest Python call stack. A least-squares fit of median time against n
+(and the log-log slope) checks the O(n) claims in complexity_analysis.
+"""
+import argparse
+import gc
+import glob
+import gzip
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from analysis import (RECURSIVE_LIMIT, analyze_earthquakes_iterative, analyze_earthquakes_recursive,
+                      analyze_earthquakes_divide_conquer, analyze_earthquakes_vectorized)
+
+DEFAULT_DATA_PATTERN = os.path.join('cache', 'all_*_v10.json.gz')
+FIT_MIN_N = 100  # Smaller inputs are dominated by call overhead and only add noise to the fit
+LINEAR_SLOPE_RANGE = (0.8, 1.2)  # Log-log slopes read as linear growth; above it growth is superlinear
+REGRESSION_MIN_NS = 50_000  # Slowdowns smaller than this are timer noise, whatever the ratio
+
+# name -> (callable taking (features, mags), largest n it can run)
+STRATEGIES = {
+    'iterative': (lambda features, mags: analyze_earthquakes_iterative(features), None),
+    'recursive': (lambda features, mags: analyze_earthquakes_recursive(features), RECURSIVE_LIMIT),
+    'recursive_divide_conquer': (lambda features, mags: analyze_earthquakes_divide_conquer(features), None),
+    'vectorized': (lambda features, mags: analyze_earthquakes_vectorized(mags), None),
+}
+
+
+def load_datasets(pattern):
+    """[(n, features, mags)] for every dataset file, smallest first"""
+    datasets = []
+    for path in glob.glob(pattern):
+        with gzip.open(path, 'rt') as f:
+            features = json.load(f)['data']['features']
+        mags = np.array([feature['properties']['mag'] for feature in features], dtype=np.float64)
+        datasets.append((len(features), features, mags))
+    return sorted(datasets, key=lambda dataset: dataset[0])
+
+
+def time_runs(fn, repeats, warmup):
+    """Nanosecond timings of repeated calls after warm-up, with the collector paused"""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            start = time.perf_counter_ns()
+            fn()
+            timings.append(time.perf_counter_ns() - start)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return timings
+
+
+def peak_memory(fn):
+    """Peak bytes allocated by one call, as seen by tracemalloc"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def max_stack_depth(fn):
+    """Deepest Python call stack reached during one call, relative to the caller"""
+    depth = 0
+    deepest = 0
+
+    def profile(frame, event, arg):
+        nonlocal depth, deepest
+        if event == 'call':
+            depth += 1
+            deepest = max(deepest, depth)
+        elif event == 'return':
+            depth -= 1
+
+    sys.setprofile(profile)
+    try:
+        fn()
+    finally:
+        sys.setprofile(None)
+    return deepest
+
+
+def summarize_timings(timings):
+    ordered = sorted(timings)
+    quartiles = statistics.quantiles(ordered, n=4) if len(ordered) > 1 else [ordered[0]] * 3
+    return {
+        'min_ns': ordered[0],
+        'median_ns': int(statistics.median(ordered)),
+        'mean_ns': int(statistics.fmean(ordered)),
+        'stdev_ns': int(statistics.stdev(ordered)) if len(ordered) > 1 else 0,
+        'iqr_ns': int(quartiles[2] - quartiles[0]),
+        'repeats': len(ordered),
+    }
+
+
+def fit_complexity(points):
+    """Linear fit t = a*n + b and log-log slope k of t ~ n^k over [(n, median ns)]
+
+    O(n) is an upper bound, so a slope below the linear range (fixed
+    overhead still dominating, as for the vectorized pass) is consistent
+    with it; only a slope above the range contradicts the claim.
+    """
+    points = [(n, t) for n, t in points if n >= FIT_MIN_N and t > 0]
+    if len(points) < 3:
+        return None
+    n = np.array([p[0] for p in points], dtype=np.float64)
+    t = np.array([p[1] for p in points], dtype=np.float64)
+    a, b = np.polyfit(n, t, 1)
+    predicted = a * n + b
+    residual = float(np.sum((t - predicted) ** 2))
+    total = float(np.sum((t - t.mean()) ** 2))
+    r2 = 1 - residual / total if total > 0 else 1.0
+    slope = float(np.polyfit(np.log(n), np.log(t), 1)[0])
+    if slope < LINEAR_SLOPE_RANGE[0]:
+        growth = 'sublinear'
+    elif slope <= LINEAR_SLOPE_RANGE[1]:
+        growth = 'linear'
+    else:
+        growth = 'superlinear'
+    return {
+        'ns_per_item': round(float(a), 3),
+        'intercept_ns': round(float(b), 1),
+        'r2': round(r2, 4),
+        'loglog_slope': round(slope, 3),
+        'points': len(points),
+        'growth': growth,
+        'consistent_with_o_n': growth != 'superlinear',
+    }
+
+
+def run_benchmarks(datasets, strategies, repeats, warmup):
+    results = []
+    for n, features, mags in datasets:
+        for name in strategies:
+            fn, max_n = STRATEGIES[name]
+            if max_n is not None and n > max_n:
+                results.append({'strategy': name, 'n': n, 'skipped': f'n > {max_n} (recursion limit)'})
+                continue
+            call = lambda: fn(features, mags)
+            entry = {'strategy': name, 'n': n}
+            entry.update(summarize_timings(time_runs(call, repeats, warmup)))
+            entry['peak_bytes'] = peak_memory(call)
+            entry['max_stack_depth'] = max_stack_depth(call)
+            results.append(entry)
+            print(f"{name:>26} n={n:<6} median {entry['median_ns'] / 1e6:10.3f} ms  "
+                  f"peak {entry['peak_bytes'] / 1024:9.1f} KiB  stack {entry['max_stack_depth']}", file=sys.stderr)
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Results whose median slowed down by more than tolerance (and REGRESSION_MIN_NS) vs the baseline"""
+    previous = {(r['strategy'], r['n']): r['median_ns'] for r in baseline['results'] if 'median_ns' in r}
+    regressions = []
+    for r in results:
+        before = previous.get((r['strategy'], r['n']))
+        if (before and 'median_ns' in r and r['median_ns'] > before * (1 + tolerance)
+                and r['median_ns'] - before >= REGRESSION_MIN_NS):
+            regressions.append({'strategy': r['strategy'], 'n': r['n'], 'baseline_ns': before, 'current_ns': r['median_ns']})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--data', default=DEFAULT_DATA_PATTERN, help='glob of dataset files (default: %(default)s)')
+    parser.add_argument('--strategies', default=','.join(STRATEGIES), help='comma-separated strategies')
+    parser.add_argument('--repeats', type=int, default=7)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--output', help='write JSON results here (default: stdout)')
+    parser.add_argument('--baseline', help='previous JSON results to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed median slowdown vs baseline')
+    args = parser.parse_args(argv)
+
+    strategies = [name.strip() for name in args.strategies.split(',') if name.strip()]
+    unknown = [name for name in strategies if name not in STRATEGIES]
+    if unknown:
+        parser.error(f"unknown strategies: {', '.join(unknown)}")
+    datasets = load_datasets(args.data)
+    if not datasets:
+        parser.error(f"no datasets match {args.data}")
+    # Same limit as the server, so the recursive strategy fails (or not) exactly as it does there
+    sys.setrecursionlimit(3000)
+
+    results = run_benchmarks(datasets, strategies, args.repeats, args.warmup)
+    fits = {}
+    for name in strategies:
+        points = [(r['n'], r['median_ns']) for r in results if r['strategy'] == name and 'median_ns' in r]
+        fits[name] = fit_complexity(points)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'repeats': args.repeats,
+            'warmup': args.warmup,
+            'sizes': [n for n, _, _ in datasets],
+        },
+        'results': results,
+        'fits': fits,
+    }
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = compare_to_baseline(results, json.load(f), args.tolerance)
+        exit_code = 1 if report['regressions'] else 0
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(payload + '\n')
+    else:
+        print(payload)
+    for name, fit in fits.items():
+        if fit:
+            verdict = 'consistent with O(n)' if fit['consistent_with_o_n'] else 'NOT O(n)'
+            print(f"{name:>26}: {fit['ns_per_item']} ns/item, slope {fit['loglog_slope']}, R² {fit['r2']}, "
+                  f"{fit['growth']} -> {verdict}",
+                  file=sys.stderr)
+    for regression in report.get('regressions', []):
+        print(f"REGRESSION {regression['strategy']} n={regression['n']}: "
+              f"{regression['baseline_ns'] / 1e6:.3f} ms -> {regression['current_ns'] / 1e6:.3f} ms", file=sys.stderr)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+HISTORY_SIZE = 256  # Messages kept for Last-Event-ID resume
+CLIENT_QUEUE_SIZE = 64  # Undelivered messages per client before it is told to resync
+KEEPALIVE_SECONDS = 15
+RETRY_MS = 5000
+
+
+def encode_event(event_id, event, data):
+    """One Server-Sent Events frame; data is JSON on a single line"""
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode('utf-8')
+
+
+class Subscription:
+    def __init__(self, max_queue):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.lagged = False
+
+
+class Broadcaster:
+    """Fan-out of ingest events to Server-Sent Events clients
+
+    Each message is encoded once and shared by every subscriber, so the cost
+    of a publish grows with the number of events, not with client count
+    times payload size. Every client has a bounded queue: a client that falls
+    behind is not waited for; its backlog is dropped and it gets a single
+    `reset` event telling it to reload, after which delivery resumes. Event
+    ids are `<boot>-<seq>`; a reconnecting client sending Last-Event-ID is
+    replayed what it missed from a short history, or reset if that is no
+    longer available. Each open stream holds a server thread, so at most
+    `max_subscribers` are accepted at once.
+    """
+
+    def __init__(self, history_size=HISTORY_SIZE, max_queue=CLIENT_QUEUE_SIZE, max_subscribers=None, metrics=None):
+        self.boot = f"{int(time.time()):x}"
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self.metrics = metrics
+        self._seq = 0
+        self._history = deque(maxlen=history_size)  # (seq, frame)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        if metrics is not None:
+            metrics.counter('sse_events_total', 'Server-Sent Events published by type')
+            metrics.counter('sse_resets_total', 'Clients told to resync, by reason')
+            metrics.counter('sse_rejected_total', 'Streams refused because the stream limit was reached')
+            metrics.collector('sse_clients', 'gauge', 'Connected Server-Sent Events clients',
+                              lambda: [({}, len(self._subscribers))])
+
+    def publish(self, event, data):
+        with self._lock:
+            self._publish(self._seq + 1, event, data)
+        self._count('sse_events_total', type=event)
+
+    def relay(self, boot, seq, event, data):
+        """Publish an event under the id another process assigned it (see EventLog)"""
+        with self._lock:
+            if boot != self.boot:
+                self.boot = boot
+                self._history.clear()
+            elif seq <= self._seq:
+                return
+            self._publish(seq, event, data)
+        self._count('sse_events_total', type=event)
+
+    def _publish(self, seq, event, data):
+        # Caller holds the lock
+        self._seq = seq
+        frame = encode_event(f"{self.boot}-{seq}", event, data)
+        self._history.append((seq, frame))
+        for subscription in self._subscribers:
+            if subscription.lagged:
+                continue
+            try:
+                subscription.queue.put_nowait(frame)
+            except queue.Full:
+                self._drop_backlog(subscription)
+
+    def _drop_backlog(self, subscription):
+        # Caller holds the lock; the reset frame takes the place of the dropped backlog
+        subscription.lagged = True
+        while True:
+            try:
+                subscription.queue.get_nowait()
+            except queue.Empty:
+                break
+        subscription.queue.put_nowait(self._reset_frame('lagged'))
+        self._count('sse_resets_total', reason='lagged')
+
+    def _reset_frame(self, reason):
+        return encode_event(f"{self.boot}-{self._seq}", 'reset', {'reason': reason})
+
+    def subscribe(self, last_event_id=None):
+        """New subscription, primed with missed messages for a resuming client; None when full"""
+        subscription = Subscription(self.max_queue)
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subscribers) >= self.max_subscribers:
+                self._count('sse_rejected_total')
+                return None
+            if last_event_id:
+                boot, _, seq = last_event_id.partition('-')
+                oldest = self._history[0][0] if self._history else self._seq + 1
+                missed = [frame for s, frame in self._history if s > int(seq)] if seq.isdigit() else None
+                if boot != self.boot or missed is None or int(seq) < oldest - 1 or len(missed) > self.max_queue:
+                    subscription.queue.put_nowait(self._reset_frame('expired'))
+                    self._count('sse_resets_total', reason='expired')
+                else:
+                    for frame in missed:
+                        subscription.queue.put_nowait(frame)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def stream(self, subscription, keepalive=KEEPALIVE_SECONDS):
+        """SSE body for one client, with comment lines as keepalives while idle"""
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode('utf-8')
+            while True:
+                try:
+                    frame = subscription.queue.get(timeout=keepalive)
+                except queue.Empty:
+                    yield b": keepalive\n\n"
+                    continue
+                yield frame
+                if subscription.lagged:
+                    with self._lock:
+                        # The reset was the last queued frame; deliver new events again
+                        subscription.lagged = not subscription.queue.empty()
+        finally:
+            self.unsubscribe(subscription)
+
+    def _count(self, name, **labels):
+        if self.metrics is not None:
+            self.metrics.inc(name, **labels)
+
+
+class EventLog:
+    """Append-only JSON-lines spool carrying events from the refresher process to web workers
+
+    The refresher is the only writer; each line holds the boot id and
+    sequence number the event is served under, so every worker relays it
+    with the same SSE id and a client can resume on any worker. The file is
+    compacted to the last `keep` lines once it grows past `max_lines`.
+    """
+
+    def __init__(self, path, keep=HISTORY_SIZE, max_lines=HISTORY_SIZE * 4):
+        self.path = path
+        self.keep = keep
+        self.max_lines = max_lines
+        self._lock = threading.Lock()
+        self._lines = None  # Writer side, loaded on first append
+
+    def _read(self):
+        try:
+            with open(self.path, 'rb') as f:
+                return [line for line in f.read().split(b'\n') if line]
+        except OSError:
+            return []
+
+    def append(self, event, data):
+        with self._lock:
+            if self._lines is None:
+                self._lines = self._read()
+            if self._lines:
+                last = json.loads(self._lines[-1])
+                boot, seq = last['boot'], last['seq'] + 1
+            else:
+                boot, seq = f"{int(time.time()):x}", 1
+            line = json.dumps({'boot': boot, 'seq': seq, 'event': event, 'data': data}, separators=(',', ':')).encode('utf-8')
+            self._lines.append(line)
+            if len(self._lines) > self.max_lines:
+                self._lines = self._lines[-self.keep:]
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(b'\n'.join(self._lines) + b'\n')
+                os.replace(tmp_path, self.path)
+            else:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                with open(self.path, 'ab') as f:
+                    f.write(line + b'\n')
+
+    def follow(self, relay, interval=1.0):
+        """Relay every line to relay(boot, seq, event, data), then keep polling for new ones"""
+        inode = None
+        position = 0
+        while True:
+            try:
+                stat = os.stat(self.path)
+                if stat.st_ino != inode or stat.st_size < position:
+                    # New or compacted file: replay it; relay() skips ids it has already seen
+                    inode, position = stat.st_ino, 0
+                if stat.st_size > position:
+                    with open(self.path, 'rb') as f:
+                        f.seek(position)
+                        chunk = f.read(stat.st_size - position)
+                    complete = chunk.rfind(b'\n') + 1  # A line still being written is read next time
+                    position += complete
+                    for line in chunk[:complete].split(b'\n'):
+                        if line:
+                            entry = json.loads(line)
+                            relay(entry['boot'], entry['seq'], entry['event'], entry['data'])
+            except OSError:
+                pass
+            except Exception as e:
+                print(f"Event log follow error: {e}")
+            time.sleep(interval)
@@ -0,0 +1,263 @@
+import fnmatch
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    import fcntl
+except ImportError:  # Not POSIX: one process per cache directory
+    fcntl = None
+
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_LOCK_FILE = '.manifest.lock'
+SUFFIX = '.json.gz'
+TMP_MAX_AGE = 3600  # Leftover temp files from crashed writers are removed after this long
+
+
+def _atomic_write(path, payload):
+    """Write bytes next to path and rename over it; readers see the old or new file, never a torn one"""
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+class DiskCache:
+    """gzip JSON cache files tracked by a manifest sidecar
+
+    The manifest records key, timestamp, size, checksum, dataset version and
+    last access for every file, so expiry and budget checks never open a
+    payload. One janitor (sweep) enforces age, version and a total byte
+    budget with least-recently-used eviction.
+
+    Several processes (gunicorn workers and the refresher) share one
+    directory: each change reloads the manifest under an exclusive file
+    lock, applies itself and writes it back, so no process overwrites
+    another's entries; lookups reload it whenever the file was replaced.
+    Files matching one of the `keep` patterns (recorded datasets that live
+    next to the cache) are never tracked or removed by the janitor.
+    """
+
+    def __init__(self, directory, version, max_bytes, metrics=None, keep=()):
+        self.directory = directory
+        self.version = version
+        self.max_bytes = max_bytes
+        self.metrics = metrics
+        self.keep = tuple(keep)
+        self._lock = threading.Lock()
+        self._manifest_path = os.path.join(directory, MANIFEST_FILE)
+        self._lock_path = os.path.join(directory, MANIFEST_LOCK_FILE)
+        self._manifest_stat = None  # Identity of the manifest file _entries was loaded from
+        self._entries = {}
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        """Pick up the manifest written by another process; caller holds the lock"""
+        try:
+            stat = os.stat(self._manifest_path)
+            if (stat.st_ino, stat.st_mtime_ns, stat.st_size) == self._manifest_stat:
+                return
+            with open(self._manifest_path) as f:
+                stat = os.fstat(f.fileno())
+                entries = json.load(f)['entries']
+        except (OSError, ValueError, KeyError):
+            return
+        for key, entry in entries.items():
+            local = self._entries.get(key)
+            if local is not None and local.get('checksum') == entry.get('checksum'):
+                # Accesses are only written with the next change; keep the latest either side saw
+                entry['last_access'] = max(entry.get('last_access', 0), local.get('last_access', 0))
+        self._entries = entries
+        self._manifest_stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    @contextmanager
+    def _update(self):
+        """Change the manifest with every other process locked out: reload, change, save"""
+        with self._lock, self._file_lock():
+            self._refresh()
+            yield self._entries
+            payload = json.dumps({'entries': self._entries}, separators=(',', ':')).encode('utf-8')
+            _atomic_write(self._manifest_path, payload)
+            stat = os.stat(self._manifest_path)
+            self._manifest_stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _stage(self, name):
+        return self.metrics.stage(name) if self.metrics is not None else nullcontext()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def entry(self, key):
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(key)
+            return dict(entry) if entry else None
+
+    def read(self, key, max_age):
+        """(data, timestamp, uncompressed bytes) for a fresh, intact entry, or None"""
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry['timestamp'] >= max_age or entry['version'] != self.version:
+                return None
+        try:
+            with open(self._path(key), 'rb') as f:
+                compressed = f.read()
+        except OSError:
+            self.remove(key)
+            return None
+        if hashlib.sha1(compressed).hexdigest() != entry['checksum']:
+            # Replaced by another process since the manifest was read, or damaged
+            return None
+        with self._stage('gzip_decode'):
+            raw = gzip.decompress(compressed)
+        with self._stage('json_parse'):
+            cached_data = json.loads(raw)
+        with self._lock:
+            if key in self._entries:
+                self._entries[key]['last_access'] = time.time()
+        return cached_data['data'], cached_data['timestamp'], len(raw)
+
+    def write(self, key, data, timestamp=None, compresslevel=6):
+        """Atomically write an entry; returns (uncompressed, compressed) byte counts"""
+        timestamp = time.time() if timestamp is None else timestamp
+        raw = json.dumps({'timestamp': timestamp, 'data': data}, separators=(',', ':')).encode('utf-8')
+        compressed = gzip.compress(raw, compresslevel=compresslevel)
+        with self._update() as entries:
+            # Rename and manifest update together, so the recorded checksum matches the file on disk
+            _atomic_write(self._path(key), compressed)
+            entries[key] = {
+                'timestamp': timestamp,
+                'size': len(compressed),
+                'checksum': hashlib.sha1(compressed).hexdigest(),
+                'version': self.version,
+                'last_access': time.time(),
+            }
+        return len(raw), len(compressed)
+
+    def remove(self, key):
+        self.remove_keys([key])
+
+    def remove_prefix(self, prefix):
+        with self._lock:
+            self._refresh()
+            keys = [key for key in self._entries if key.startswith(prefix)]
+        # Untracked files with the prefix (e.g. from before the manifest) go too
+        keys += [name[:-len(SUFFIX)] for name in self._files() if name.startswith(prefix)]
+        self.remove_keys(set(keys))
+
+    def remove_keys(self, keys):
+        with self._update() as entries:
+            for key in keys:
+                entries.pop(key, None)
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+
+    def _files(self):
+        try:
+            return [name for name in os.listdir(self.directory) if name.endswith(SUFFIX) and not name.startswith('.')]
+        except OSError:
+            return []
+
+    def _kept(self, key):
+        return any(fnmatch.fnmatchcase(key + SUFFIX, pattern) for pattern in self.keep)
+
+    def _adopt(self, key):
+        """Track a file written before the manifest existed (reads its payload this one time)"""
+        version = key.rsplit('_', 1)[-1]
+        if version != self.version:
+            return {'version': version}
+        path = self._path(key)
+        with open(path, 'rb') as f:
+            compressed = f.read()
+        timestamp = json.loads(gzip.decompress(compressed)).get('timestamp', 0)
+        return {
+            'timestamp': timestamp,
+            'size': len(compressed),
+            'checksum': hashlib.sha1(compressed).hexdigest(),
+            'version': version,
+            'last_access': os.path.getmtime(path),
+        }
+
+    def sweep(self, max_age):
+        """Janitor pass: adopt untracked files, then drop expired, foreign-version and over-budget entries"""
+        now = time.time()
+        removed = []
+        with self._lock:
+            self._refresh()
+            tracked = set(self._entries)
+        adopted = {}
+        for name in self._files():
+            key = name[:-len(SUFFIX)]
+            if key in tracked or self._kept(key):
+                continue
+            try:
+                adopted[key] = self._adopt(key)
+            except (OSError, ValueError, EOFError):
+                adopted[key] = {'version': None}  # Unreadable: remove below
+
+        with self._update() as entries:
+            for key, entry in adopted.items():
+                entries.setdefault(key, entry)
+            for key in [key for key in entries if self._kept(key)]:
+                # Adopted by an older janitor: stop tracking it, but leave the file alone
+                del entries[key]
+            for key, entry in list(entries.items()):
+                path = self._path(key)
+                if entry.get('version') != self.version or now - entry['timestamp'] > max_age or not os.path.exists(path):
+                    removed.append(key)
+            for key in removed:
+                del entries[key]
+            # Least recently used first until the directory fits the budget
+            total = sum(entry['size'] for entry in entries.values())
+            for key, entry in sorted(entries.items(), key=lambda item: item[1]['last_access']):
+                if total <= self.max_bytes:
+                    break
+                total -= entry['size']
+                removed.append(key)
+                del entries[key]
+            for key in removed:
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+
+        for name in os.listdir(self.directory):
+            if not (name.startswith('.') and name.endswith('.tmp')):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                # Another process may rename or remove its temp file at any moment
+                if now - os.path.getmtime(path) > TMP_MAX_AGE:
+                    os.remove(path)
+            except OSError:
+                continue
+        return removed
+
+    def snapshot(self):
+        with self._lock:
+            self._refresh()
+            return {
+                'entries': len(self._entries),
+                'bytes': sum(entry['size'] for entry in self._entries.values()),
+                'max_bytes': self.max_bytes,
+            }
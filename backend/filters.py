@@ -0,0 +1,208 @@
+import hashlib
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Region labels assigned at ingest; code 0 is anything outside the boxes below (open ocean)
+REGIONS = ('other', 'africa', 'antarctica', 'asia', 'europe', 'north_america', 'south_america', 'oceania')
+REGION_CODES = {name: code for code, name in enumerate(REGIONS)}
+
+# Approximate continent boxes (lat_min, lat_max, lon_min, lon_max), checked in order
+REGION_BOXES = (
+    ('antarctica', -90, -60, -180, 180),
+    ('europe', 35, 72, -25, 45),
+    ('africa', -36, 37, -20, 52),
+    ('asia', -11, 82, 45, 180),
+    ('asia', 0, 82, 25, 45),  # Middle East and Anatolia east of the Europe box
+    ('oceania', -50, 0, 110, 180),
+    ('oceania', -50, 30, -180, -140),  # Pacific islands east of the antimeridian
+    ('north_america', 7, 85, -180, -50),
+    ('south_america', -60, 13, -92, -30),
+)
+
+GRID_DEGREES = 10  # Coarse lat/lon cells for bbox candidate lookup
+GRID_ROWS = 180 // GRID_DEGREES
+GRID_COLS = 360 // GRID_DEGREES
+
+
+class FilterError(ValueError):
+    """Raised for malformed filter query parameters"""
+
+
+def classify_regions(lat, lon):
+    """Region code per event from the approximate continent boxes"""
+    lat = np.asarray(lat)
+    lon = np.asarray(lon)
+    codes = np.zeros(len(lat), dtype=np.uint8)
+    unassigned = np.ones(len(lat), dtype=bool)
+    for name, lat_min, lat_max, lon_min, lon_max in REGION_BOXES:
+        inside = unassigned & (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+        codes[inside] = REGION_CODES[name]
+        unassigned &= ~inside
+    return codes
+
+
+def grid_cells(lat, lon):
+    """Coarse grid cell id per event"""
+    row = np.clip(((np.asarray(lat) + 90) // GRID_DEGREES).astype(np.int64), 0, GRID_ROWS - 1)
+    col = np.clip(((np.asarray(lon) + 180) // GRID_DEGREES).astype(np.int64), 0, GRID_COLS - 1)
+    return row * GRID_COLS + col
+
+
+def posting_lists(keys, n_keys):
+    """CSR posting lists: rows grouped by key, ascending row order within each key"""
+    order = np.argsort(keys, kind='stable')
+    offsets = np.zeros(n_keys + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n_keys), out=offsets[1:])
+    return order.astype(np.int64), offsets
+
+
+def build_filter_indexes(columns, magnitude_order):
+    """Region labels, region/grid posting lists and magnitudes in descending order"""
+    regions = classify_regions(columns['lat'], columns['lon'])
+    region_order, region_offsets = posting_lists(regions, len(REGIONS))
+    grid_order, grid_offsets = posting_lists(grid_cells(columns['lat'], columns['lon']), GRID_ROWS * GRID_COLS)
+    return {
+        'region': regions,
+        'region_order': region_order,
+        'region_offsets': region_offsets,
+        'grid_order': grid_order,
+        'grid_offsets': grid_offsets,
+        'mag_desc': np.asarray(columns['mag'])[magnitude_order],
+    }
+
+
+def parse_time(value, name):
+    """ISO-8601 date/datetime (UTC if naive) or epoch milliseconds"""
+    if value.isdigit():
+        return int(value)
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise FilterError(f"Invalid {name}: expected ISO date or epoch milliseconds")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+def parse_float(value, name):
+    try:
+        return float(value)
+    except ValueError:
+        raise FilterError(f"Invalid {name}: expected a number")
+
+
+def parse_filters(args):
+    """Filter dict from /earthquakes query parameters, or {} when nothing is filtered"""
+    filters = {}
+    continent = args.get('continent', 'all').lower()
+    if continent not in ('', 'all'):
+        if continent not in REGION_CODES:
+            raise FilterError(f"Unknown continent '{continent}', expected one of: all, {', '.join(REGIONS[1:])}, other")
+        filters['continent'] = continent
+    if args.get('bbox'):
+        parts = args['bbox'].split(',')
+        if len(parts) != 4:
+            raise FilterError("Invalid bbox: expected minlon,minlat,maxlon,maxlat")
+        min_lon, min_lat, max_lon, max_lat = (parse_float(p, 'bbox') for p in parts)
+        if min_lat > max_lat:
+            raise FilterError("Invalid bbox: minlat is greater than maxlat")
+        filters['bbox'] = (min_lon, min_lat, max_lon, max_lat)
+    if args.get('minmag'):
+        filters['minmag'] = parse_float(args['minmag'], 'minmag')
+    if args.get('maxmag'):
+        filters['maxmag'] = parse_float(args['maxmag'], 'maxmag')
+    if args.get('start'):
+        filters['start'] = parse_time(args['start'], 'start')
+    if args.get('end'):
+        filters['end'] = parse_time(args['end'], 'end')
+    return filters
+
+
+def filter_key(filters):
+    """Short stable identifier of a filter combination for cache keys"""
+    if not filters:
+        return 'all'
+    canonical = '&'.join(f"{name}={filters[name]}" for name in sorted(filters))
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:12]
+
+
+def _descending_range(values, low=None, high=None):
+    """[lo, hi) positions in a descending array whose values lie within [low, high]"""
+    n = len(values)
+    ascending = values[::-1]  # Reversed view, no copy
+    lo = n - int(np.searchsorted(ascending, high, side='right')) if high is not None else 0
+    hi = n - int(np.searchsorted(ascending, low, side='left')) if low is not None else n
+    return lo, max(hi, lo)
+
+
+def filter_rows(view, filters):
+    """Ascending row positions (newest first) matching all filters
+
+    Each filter is answered from an index: a row range for time (rows are
+    time ordered), a range of the magnitude permutation, the region
+    posting list, and grid-cell posting lists for bbox. Only the smallest
+    candidate set is materialized; the other predicates are checked on
+    those rows alone.
+    """
+    indexes = view.indexes
+    if 'region_order' not in indexes or len(indexes['region']) != len(view):
+        order = np.argsort(-np.asarray(view['mag']), kind='stable')
+        indexes = dict(build_filter_indexes(view.columns, order), magnitude=order)
+    mag = view['mag']
+    lat = view['lat']
+    lon = view['lon']
+
+    # Time: contiguous row range because rows are newest first
+    row_lo, row_hi = _descending_range(view['time'], filters.get('start'), filters.get('end'))
+    candidates = [(row_hi - row_lo, lambda: np.arange(row_lo, row_hi))]
+
+    if 'minmag' in filters or 'maxmag' in filters:
+        mag_lo, mag_hi = _descending_range(indexes['mag_desc'], filters.get('minmag'), filters.get('maxmag'))
+        candidates.append((mag_hi - mag_lo, lambda: indexes['magnitude'][mag_lo:mag_hi]))
+
+    if 'continent' in filters:
+        code = REGION_CODES[filters['continent']]
+        start, stop = int(indexes['region_offsets'][code]), int(indexes['region_offsets'][code + 1])
+        candidates.append((stop - start, lambda: indexes['region_order'][start:stop]))
+
+    if 'bbox' in filters:
+        cells = _bbox_cells(filters['bbox'])
+        offsets = indexes['grid_offsets']
+        size = int(sum(offsets[c + 1] - offsets[c] for c in cells))
+        candidates.append((size, lambda: np.concatenate(
+            [indexes['grid_order'][offsets[c]:offsets[c + 1]] for c in cells] or [np.zeros(0, dtype=np.int64)])))
+
+    # Materialize the smallest candidate set, then check every predicate on it
+    _, materialize = min(candidates, key=lambda c: c[0])
+    rows = np.asarray(materialize(), dtype=np.int64)
+    keep = (rows >= row_lo) & (rows < row_hi)
+    if 'minmag' in filters:
+        keep &= np.asarray(mag)[rows] >= filters['minmag']
+    if 'maxmag' in filters:
+        keep &= np.asarray(mag)[rows] <= filters['maxmag']
+    if 'continent' in filters:
+        keep &= np.asarray(indexes['region'])[rows] == REGION_CODES[filters['continent']]
+    if 'bbox' in filters:
+        min_lon, min_lat, max_lon, max_lat = filters['bbox']
+        row_lat = np.asarray(lat)[rows]
+        row_lon = np.asarray(lon)[rows]
+        keep &= (row_lat >= min_lat) & (row_lat <= max_lat)
+        if min_lon <= max_lon:
+            keep &= (row_lon >= min_lon) & (row_lon <= max_lon)
+        else:  # Crosses the antimeridian
+            keep &= (row_lon >= min_lon) | (row_lon <= max_lon)
+    return np.sort(rows[keep])
+
+
+def _bbox_cells(bbox):
+    min_lon, min_lat, max_lon, max_lat = bbox
+    row_lo = int(np.clip((min_lat + 90) // GRID_DEGREES, 0, GRID_ROWS - 1))
+    row_hi = int(np.clip((max_lat + 90) // GRID_DEGREES, 0, GRID_ROWS - 1))
+    col_lo = int(np.clip((min_lon + 180) // GRID_DEGREES, 0, GRID_COLS - 1))
+    col_hi = int(np.clip((max_lon + 180) // GRID_DEGREES, 0, GRID_COLS - 1))
+    if col_lo <= col_hi:
+        cols = range(col_lo, col_hi + 1)
+    else:
+        cols = list(range(col_lo, GRID_COLS)) + list(range(0, col_hi + 1))
+    return [row * GRID_COLS + col for row in range(row_lo, row_hi + 1) for col in cols]
@@ -0,0 +1,76 @@
+# Production serving: gunicorn -c backend/gunicorn.conf.py (from the repository root)
+#
+# Pre-forked workers map the store published by one refresher process, so adding workers
+# scales across cores without another copy of the dataset or more USGS requests.
+# Workers share rate-limit counters through cache/ratelimit.sqlite; set RATELIMIT_STORAGE_URI
+# (e.g. redis://localhost:6379) when several hosts serve the same clients.
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+wsgi_app = 'app:app'
+pythonpath = BACKEND_DIR
+chdir = os.path.dirname(BACKEND_DIR)  # cache/ is resolved from the repository root
+bind = os.environ.get('BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+# Threads per worker; each open /earthquakes/events stream holds one, and app.SSE_MAX_STREAMS
+# accepts at most half of them (WORKER_THREADS is read there too)
+worker_class = 'gthread'
+threads = int(os.environ.get('WORKER_THREADS', '16'))
+timeout = 120
+raw_env = ['SERVER_ROLE=worker']
+
+REFRESHER_CHECK_INTERVAL = 5  # Seconds between liveness checks of the refresher process
+REFRESHER_MAX_DELAY = 60  # Longest wait before restarting a refresher that keeps crashing
+REFRESHER_STABLE_AFTER = 60  # A refresher that ran this long is restarted after one check interval
+
+refresher = None
+stopping = threading.Event()
+
+
+def start_refresher(server):
+    global refresher
+    env = dict(os.environ, SERVER_ROLE='refresher')
+    refresher = subprocess.Popen([sys.executable, os.path.join(BACKEND_DIR, 'refresher.py')], cwd=chdir, env=env)
+    server.log.info(f"Started refresher process {refresher.pid}")
+    return time.monotonic()
+
+
+def supervise_refresher(server, started):
+    """Master thread: restart the refresher when it exits, backing off while it keeps crashing"""
+    delay = REFRESHER_CHECK_INTERVAL
+    while not stopping.wait(REFRESHER_CHECK_INTERVAL):
+        code = refresher.poll()
+        if code is None:
+            continue
+        ran = time.monotonic() - started
+        delay = REFRESHER_CHECK_INTERVAL if ran >= REFRESHER_STABLE_AFTER else min(delay * 2, REFRESHER_MAX_DELAY)
+        server.log.error(f"Refresher process {refresher.pid} exited with status {code} after {ran:.0f}s; "
+                         f"restarting in {delay}s (workers keep serving the last published store)")
+        if stopping.wait(delay):
+            return
+        started = start_refresher(server)
+
+
+def on_starting(server):
+    if os.environ.get('REFRESHER', 'local') == 'external':
+        return
+    started = start_refresher(server)
+    threading.Thread(target=supervise_refresher, args=(server, started), daemon=True).start()
+
+
+def post_worker_init(worker):
+    import app
+    app.start_worker_jobs()
+
+
+def on_exit(server):
+    stopping.set()
+    if refresher is not None and refresher.poll() is None:
+        refresher.terminate()
+        refresher.wait(timeout=10)
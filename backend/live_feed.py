@@ -0,0 +1,112 @@
+import threading
+import time
+
+from usgs import FEED_PATH, UpstreamError
+
+# Summary feeds by the window they cover; a refresh uses the smallest one that spans the gap
+FEED_WINDOWS = (
+    ('all_hour', 3600),
+    ('all_day', 86400),
+    ('all_month', 30 * 86400),
+)
+COVERAGE_MARGIN = 300  # Seconds of overlap, so events indexed late upstream are not missed
+
+
+def select_feed(gap):
+    """Smallest summary feed covering a gap in seconds (all_month when unknown or larger)"""
+    if gap is not None:
+        for feed, window in FEED_WINDOWS:
+            if gap + COVERAGE_MARGIN <= window:
+                return feed
+    return FEED_WINDOWS[-1][0]
+
+
+class LiveFeed:
+    """Parsed USGS summary-feed events kept in memory and refreshed with conditional GETs
+
+    Each refresh asks for the smallest feed (hour, day, month) that covers
+    the time since the last successful refresh or the given watermark, and
+    sends the ETag / Last-Modified seen for that feed, so an unchanged feed
+    costs an empty 304. Events are keyed by id and replaced only when their
+    `updated` time advances; refresh() returns just those changes so callers
+    can merge them incrementally.
+    """
+
+    def __init__(self, client, min_magnitude, max_age=30 * 86400, metrics=None):
+        self.client = client
+        self.min_magnitude = min_magnitude
+        self.max_age = max_age
+        self.metrics = metrics
+        self.last_success = None  # Epoch seconds of the last refresh that reached USGS
+        self._events = {}  # id -> feature
+        self._validators = {}  # feed -> {'etag': ..., 'last_modified': ...}
+        self._lock = threading.Lock()
+        if metrics is not None:
+            metrics.counter('live_feed_requests_total', 'Live summary feed requests by feed and result')
+
+    def features(self):
+        """Current live events, newest first (no network access)"""
+        with self._lock:
+            events = list(self._events.values())
+        return sorted(events, key=lambda f: f['properties']['time'], reverse=True)
+
+    def age(self):
+        return time.time() - self.last_success if self.last_success is not None else None
+
+    def refresh(self, covered_until=None):
+        """Fetch the feed that covers the gap since the last refresh (or covered_until, epoch ms)
+
+        Returns the features that are new or revised, [] when nothing changed,
+        or None when the request failed.
+        """
+        covered = self.last_success
+        if covered_until is not None:
+            covered = max(covered or 0, covered_until / 1000)
+        feed = select_feed(time.time() - covered if covered else None)
+        path = FEED_PATH.format(feed=feed)
+        validators = self._validators.get(feed, {})
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        started = time.time()
+        try:
+            response = self.client.get(path, headers=headers)
+            if response.status_code == 304:
+                self.last_success = started
+                self._count(feed, 'not_modified')
+                return []
+            data = response.json()
+        except (UpstreamError, ValueError) as e:
+            print(f"Live feed {feed} refresh failed: {e}")
+            self._count(feed, 'error')
+            return None
+
+        self._validators[feed] = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+        cutoff = (started - self.max_age) * 1000
+        changed = []
+        with self._lock:
+            for f in data.get('features', []):
+                props = f['properties']
+                if props.get('mag') is None or props['mag'] < self.min_magnitude or props['time'] < cutoff:
+                    continue
+                known = self._events.get(f['id'])
+                if known is None or (props.get('updated') or 0) > (known['properties'].get('updated') or 0):
+                    self._events[f['id']] = f
+                    changed.append(f)
+            for event_id in [i for i, f in self._events.items() if f['properties']['time'] < cutoff]:
+                del self._events[event_id]
+            total = len(self._events)
+        self.last_success = started
+        self._count(feed, 'modified')
+        print(f"Live feed {feed}: {len(changed)} new or revised events ({total} held) in {time.time() - started:.2f}s")
+        return changed
+
+    def _count(self, feed, result):
+        if self.metrics is not None:
+            self.metrics.inc('live_feed_requests_total', feed=feed, result=result)
@@ -0,0 +1,313 @@
+"""Load-test /earthquakes end to end against a local USGS stand-in
+
+    python backend/loadtest.py --states cold,warm,expiring --concurrency 16 --duration 30
+    python backend/loadtest.py --stub-latency 200 --stub-error-rate 0.1 --output load.json
+
+For each cache state the app runs as its own server process in a scratch
+directory, with USGS_BASE_URL pointing at an in-process usgs_stub:
+
+    cold      no store at all; the first requests trigger the full fetch
+    warm      a fresh store seeded from the fixture
+    expiring  a store that expires --expire-after seconds into the run, so
+              stale-while-revalidate and the delta sync happen under load
+
+Worker threads request random (size, sort) pairs from the mix for the run
+duration. The report has throughput, latency percentiles, status codes,
+how the app served the requests (from its /metrics), upstream requests
+seen by the stub and the server's peak RSS.
+"""
+import argparse
+import gzip
+import json
+import os
+import platform
+import random
+import re
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import requests
+
+from usgs_stub import DEFAULT_FIXTURE, FixtureCatalog, USGSStub
+
+STATES = ('cold', 'warm', 'expiring')
+DATA_VERSION = 'v10'  # Must match app.DATA_VERSION, so the seed file is picked up as a legacy cache
+CACHE_DURATION = 7200  # app.CACHE_DURATION; importing app here would start a second server's state
+STARTUP_TIMEOUT = 60
+REQUEST_TIMEOUT = 300  # A cold request waits for the whole upstream fetch
+SERVED_PATTERN = re.compile(r'^earthquakes_requests_total\{(.*)\} ([0-9.e+]+)$', re.M)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def seed_cache(workdir, state, fixture, expire_after):
+    """Scratch cache directory for a state: empty, fresh, or about to expire"""
+    cache_dir = os.path.join(workdir, 'cache')
+    os.makedirs(cache_dir)
+    if state == 'cold':
+        return
+    timestamp = time.time() if state == 'warm' else time.time() - CACHE_DURATION + expire_after
+    with gzip.open(fixture, 'rt') as f:
+        data = json.load(f)['data']
+    path = os.path.join(cache_dir, f"all_{len(data['features'])}_{DATA_VERSION}.json.gz")
+    with gzip.open(path, 'wt') as f:
+        json.dump({'timestamp': timestamp, 'data': data}, f)
+
+
+def serve_app(port):
+    """Child process: the app with its background jobs, threaded, rate limits off"""
+    import logging
+    from werkzeug.serving import make_server
+
+    import app
+
+    app.limiter.enabled = False
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    app.start_background_jobs()
+    make_server('127.0.0.1', port, app.app, threaded=True).serve_forever()
+
+
+def start_server(workdir, stub_url):
+    port = free_port()
+    env = dict(os.environ, USGS_BASE_URL=stub_url, SERVER_ROLE='all', PYTHONUNBUFFERED='1')
+    log = open(os.path.join(workdir, 'server.log'), 'wb')
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve-app', str(port)],
+                               cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited during startup, see {log.name}")
+        try:
+            if requests.get(f"{base_url}/metrics", timeout=1).status_code == 200:
+                return process, base_url, log
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"server did not start within {STARTUP_TIMEOUT}s, see {log.name}")
+
+
+def peak_rss_bytes(process):
+    """High-water resident set size of a running child (Linux), or None"""
+    try:
+        with open(f"/proc/{process.pid}/status") as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def stop_server(process, log):
+    """Terminate the child; returns its peak RSS in bytes"""
+    peak = peak_rss_bytes(process)
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+    log.close()
+    if peak is None:
+        # Largest of all waited-for children; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        peak *= 1 if platform.system() == 'Darwin' else 1024
+    return peak
+
+
+def served_counts(base_url):
+    """earthquakes_requests_total summed by how the app served them (store, stale, refresh, ...)"""
+    counts = {}
+    text = requests.get(f"{base_url}/metrics", timeout=10).text
+    for labels, value in SERVED_PATTERN.findall(text):
+        served = dict(re.findall(r'(\w+)="([^"]*)"', labels)).get('cache', 'unknown')
+        counts[served] = counts.get(served, 0) + int(float(value))
+    return counts
+
+
+def drive(base_url, mix, concurrency, duration, seed):
+    """Run worker threads for duration seconds; [(started offset, latency s, status, size, sort)]"""
+    samples = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+    deadline = start + duration
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        session = requests.Session()
+        local = []
+        while time.perf_counter() < deadline:
+            size, sort = rng.choice(mix)
+            begin = time.perf_counter()
+            try:
+                response = session.get(f"{base_url}/earthquakes", params={'size': size, 'sort': sort},
+                                       timeout=REQUEST_TIMEOUT)
+                response.content  # Read the whole body, as a client would
+                status = response.status_code
+            except requests.RequestException:
+                status = 'error'
+            local.append((begin - start, time.perf_counter() - begin, status, size, sort))
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - start
+
+
+def latency_summary(latencies):
+    if not len(latencies):
+        return {'count': 0}
+    ms = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        'count': len(ms),
+        'p50_ms': round(float(p50), 2),
+        'p95_ms': round(float(p95), 2),
+        'p99_ms': round(float(p99), 2),
+        'max_ms': round(float(ms.max()), 2),
+        'mean_ms': round(float(ms.mean()), 2),
+    }
+
+
+def summarize(samples, elapsed):
+    statuses = {}
+    for _, _, status, _, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    ok = [latency for _, latency, status, _, _ in samples if status == 200]
+    by_size = {}
+    for size in sorted({s[3] for s in samples}):
+        by_size[str(size)] = latency_summary([latency for _, latency, status, n, _ in samples
+                                              if n == size and status == 200])
+    first = min(samples, key=lambda s: s[0]) if samples else None
+    return {
+        'requests': len(samples),
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(len(ok) / elapsed, 1) if elapsed else 0.0,
+        'statuses': statuses,
+        'error_rate': round(1 - len(ok) / len(samples), 4) if samples else 0.0,
+        'latency': latency_summary(ok),
+        'first_request_ms': round(first[1] * 1000, 2) if first else None,
+        'by_size': by_size,
+    }
+
+
+def run_state(state, args, stub, mix):
+    workdir = tempfile.mkdtemp(prefix=f"loadtest-{state}-")
+    try:
+        seed_cache(workdir, state, args.fixture, args.expire_after)
+        upstream_before = stub.stats()
+        process, base_url, log = start_server(workdir, stub.url)
+        try:
+            samples, elapsed = drive(base_url, mix, args.concurrency, args.duration, args.seed)
+            served = served_counts(base_url)
+        finally:
+            peak_rss = stop_server(process, log)
+        upstream = {}
+        for endpoint, statuses in stub.stats().items():
+            for status, count in statuses.items():
+                delta = count - upstream_before.get(endpoint, {}).get(status, 0)
+                if delta:
+                    upstream.setdefault(endpoint, {})[status] = delta
+        report = summarize(samples, elapsed)
+        report.update({'state': state, 'served': served, 'upstream': upstream,
+                       'peak_rss_mb': round(peak_rss / 2 ** 20, 1)})
+        if args.keep:
+            report['workdir'] = workdir
+        return report
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--states', default=','.join(STATES), help='comma-separated cache states (default: %(default)s)')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads')
+    parser.add_argument('--duration', type=float, default=20, help='seconds per state')
+    parser.add_argument('--sizes', default='10,100,1000,5000,20000', help='comma-separated sizes in the mix')
+    parser.add_argument('--sorts', default='time,magnitude', help='comma-separated sort orders in the mix')
+    parser.add_argument('--expire-after', type=float, default=5, help='seconds after seeding that an expiring store expires')
+    parser.add_argument('--fixture', default=DEFAULT_FIXTURE, help='recorded cache file served by the stub')
+    parser.add_argument('--stub-latency', type=float, default=50, help='milliseconds added to every USGS response')
+    parser.add_argument('--stub-jitter', type=float, default=50, help='extra random milliseconds per USGS response')
+    parser.add_argument('--stub-error-rate', type=float, default=0.0, help='fraction of USGS requests that fail')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--keep', action='store_true', help='keep scratch directories (server.log) for inspection')
+    parser.add_argument('--output', help='write JSON results here (default: stdout)')
+    parser.add_argument('--serve-app', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve_app:
+        serve_app(args.serve_app)
+        return 0
+
+    states = [state.strip() for state in args.states.split(',') if state.strip()]
+    unknown = [state for state in states if state not in STATES]
+    if unknown:
+        parser.error(f"unknown states: {', '.join(unknown)}")
+    try:
+        sizes = [int(size) for size in args.sizes.split(',')]
+    except ValueError:
+        parser.error("--sizes must be comma-separated integers")
+    sorts = [sort.strip() for sort in args.sorts.split(',') if sort.strip()]
+    mix = [(size, sort) for size in sizes for sort in sorts]
+    args.fixture = os.path.abspath(args.fixture)
+
+    catalog = FixtureCatalog.load(args.fixture)
+    stub = USGSStub(catalog, port=0, latency=args.stub_latency / 1000, jitter=args.stub_jitter / 1000,
+                    error_rate=args.stub_error_rate, seed=args.seed).start()
+    results = []
+    try:
+        for state in states:
+            print(f"Running {state} for {args.duration:g}s at concurrency {args.concurrency}", file=sys.stderr)
+            report = run_state(state, args, stub, mix)
+            results.append(report)
+            latency = report['latency']
+            print(f"{state:>9}: {report['throughput_rps']} req/s, p50 {latency.get('p50_ms')} ms, "
+                  f"p95 {latency.get('p95_ms')} ms, p99 {latency.get('p99_ms')} ms, "
+                  f"errors {report['error_rate']:.2%}, peak RSS {report['peak_rss_mb']} MiB, "
+                  f"served {report['served']}, upstream {report['upstream']}", file=sys.stderr)
+    finally:
+        stub.stop()
+
+    payload = json.dumps({
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'concurrency': args.concurrency,
+            'duration_s': args.duration,
+            'mix': [f"{size}/{sort}" for size, sort in mix],
+            'fixture_events': len(catalog.features),
+            'stub': {'latency_ms': args.stub_latency, 'jitter_ms': args.stub_jitter,
+                     'error_rate': args.stub_error_rate},
+        },
+        'results': results,
+    }, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(payload + '\n')
+    else:
+        print(payload)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
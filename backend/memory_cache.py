@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryCache:
+    """Thread-safe in-process LRU cache with a byte budget and TTL"""
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.current_bytes = 0
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0
+        }
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        """Whether a live entry exists; unlike get(), touches neither stats nor LRU order"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and time.time() < entry[2]
+
+    def get(self, key):
+        """Return the cached value or None; refreshes the entry's LRU position"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            value, size, expires_at = entry
+            if time.time() >= expires_at:
+                self._remove(key)
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return value
+
+    def put(self, key, value, size, timestamp=None):
+        """Store a value of `size` bytes; it expires `ttl` seconds after `timestamp`"""
+        if size > self.max_bytes:
+            return False
+        expires_at = (time.time() if timestamp is None else timestamp) + self.ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.stats['evictions'] += 1
+        return True
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                self.stats['invalidations'] += 1
+
+    def invalidate_prefix(self, prefix):
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                self._remove(key)
+                self.stats['invalidations'] += 1
+
+    def snapshot(self):
+        """Copy of the statistics plus current occupancy"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self.current_bytes
+            stats['max_bytes'] = self.max_bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] / lookups * 100) if lookups else 0.0
+        return stats
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
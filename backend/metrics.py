@@ -0,0 +1,133 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds, from sub-millisecond index lookups to multi-second USGS crawls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_METRIC = 'earthquakes_stage_seconds'
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """Thread-safe counters, histograms and callback gauges rendered in Prometheus text format
+
+    Every update is a dict lookup and an add under one lock, cheap enough to
+    leave on for every request. Stage timings can also be collected per
+    request (see start_profile) for a Server-Timing style breakdown.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._definitions = {}  # name -> (type, help, buckets)
+        self._counters = {}  # name -> {label key: value}
+        self._histograms = {}  # name -> {label key: [bucket counts..., sum, count]}
+        self._collectors = []  # (name, type, help, fn returning [(labels, value)])
+        self._local = threading.local()
+        self.histogram(STAGE_METRIC, 'Time spent in each stage of serving /earthquakes')
+
+    def counter(self, name, help_text):
+        self._definitions[name] = ('counter', help_text, None)
+        self._counters.setdefault(name, {})
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self._definitions[name] = ('histogram', help_text, tuple(buckets))
+        self._histograms.setdefault(name, {})
+
+    def collector(self, name, metric_type, help_text, fn):
+        """Values read at scrape time from state owned elsewhere (cache snapshots, client stats)"""
+        self._collectors.append((name, metric_type, help_text, fn))
+
+    def inc(self, name, value=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        buckets = self._definitions[name][2]
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms[name]
+            state = series.get(key)
+            if state is None:
+                # One count per bucket plus the +Inf overflow, then sum and count
+                state = series[key] = [0] * (len(buckets) + 3)
+            # Counts are stored per bucket and made cumulative at render time
+            state[bisect.bisect_left(buckets, value)] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def value(self, name, **labels):
+        """Current counter value for one label set (0 if never incremented)"""
+        with self._lock:
+            return self._counters[name].get(_label_key(labels), 0)
+
+    def total(self, name, **labels):
+        """Sum of a counter over every series matching the given labels"""
+        wanted = set(_label_key(labels))
+        with self._lock:
+            return sum(v for key, v in self._counters[name].items() if wanted <= set(key))
+
+    def start_profile(self, enabled):
+        """Begin (or clear) the calling thread's per-request stage breakdown"""
+        self._local.profile = [] if enabled else None
+
+    def profile(self):
+        return getattr(self._local, 'profile', None)
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block into the stage histogram and the active request profile"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(STAGE_METRIC, elapsed, stage=name)
+            profile = self.profile()
+            if profile is not None:
+                profile.append((name, elapsed))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: {key: list(state) for key, state in series.items()} for name, series in self._histograms.items()}
+        for name, (metric_type, help_text, buckets) in self._definitions.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            if metric_type == 'counter':
+                for key, value in sorted(counters[name].items()):
+                    lines.append(f'{name}{_format_labels(key)} {_format_value(value)}')
+                continue
+            for key, state in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, count in zip(buckets + ('+Inf',), state[:-2]):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else repr(float(bound))
+                    lines.append(f'{name}_bucket{_format_labels(key, [("le", le)])} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(key)} {_format_value(state[-2])}')
+                lines.append(f'{name}_count{_format_labels(key)} {state[-1]}')
+        for name, metric_type, help_text, fn in self._collectors:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for labels, value in fn():
+                lines.append(f'{name}{_format_labels(_label_key(labels))} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,46 @@
+import base64
+import hashlib
+import json
+
+STREAM_CHUNK_ROWS = 1000  # Rows materialized and encoded per streamed chunk
+MAX_PAGE_SIZE = 5000
+
+
+class CursorError(ValueError):
+    """Raised for malformed cursors or cursors issued for a different query"""
+
+
+class CursorExpired(CursorError):
+    """Raised when the store generation a cursor was issued against has been replaced"""
+
+
+def query_fingerprint(size, sort_by, filter_id):
+    """Short identifier of the query a cursor belongs to"""
+    return hashlib.sha1(f"{size}|{sort_by}|{filter_id}".encode('utf-8')).hexdigest()[:12]
+
+
+def encode_cursor(version, fingerprint, offset):
+    """Opaque cursor: position in the sorted row order of one store generation"""
+    payload = json.dumps([version, fingerprint, offset], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, version, fingerprint):
+    """Offset encoded in cursor, checked against the current generation and query"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_version, cursor_fingerprint, offset = json.loads(base64.urlsafe_b64decode(padded))
+        offset = int(offset)
+    except (ValueError, TypeError):
+        raise CursorError("Invalid cursor")
+    if cursor_fingerprint != fingerprint or offset < 0:
+        raise CursorError("Cursor does not match this query (size, sort and filters must be unchanged)")
+    if cursor_version != version:
+        raise CursorExpired("Cursor expired: the dataset was refreshed, restart from the first page")
+    return offset
+
+
+def iter_chunks(rows, chunk_rows=STREAM_CHUNK_ROWS):
+    """Consecutive slices of a row order"""
+    for start in range(0, len(rows), chunk_rows):
+        yield rows[start:start + chunk_rows]
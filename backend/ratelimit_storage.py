@@ -0,0 +1,108 @@
+"""Rate-limit counters in a SQLite file, shared by every process on the host
+
+Importing this module registers the sqlite:// scheme with the limits library,
+so Flask-Limiter accepts e.g. storage_uri='sqlite:///cache/ratelimit.sqlite'
+(three slashes for a path relative to the working directory, four for an
+absolute one). Only the fixed-window strategy (Flask-Limiter's default) is
+supported. Every increment is one short write transaction, which SQLite
+serializes across processes; that is plenty for the request rates a single
+host of gunicorn workers sees, and needs no server.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from limits.storage import Storage
+
+SCHEME = 'sqlite'
+PURGE_EVERY = 1000  # Increments between deletes of expired windows
+
+
+class SQLiteStorage(Storage):
+    STORAGE_SCHEME = [SCHEME]
+
+    def __init__(self, uri, wrap_exceptions=False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.path = uri[len(f"{SCHEME}:///"):]
+        if not self.path:
+            raise ValueError(f"{uri}: expected {SCHEME}:///<path>")
+        self.timeout = float(options.get('timeout', 10))
+        self._local = threading.local()
+        self._increments = 0
+        # WAL: readers never wait for the writer; cannot be switched inside a transaction
+        self._connect().execute('PRAGMA journal_mode=WAL')
+        with self._transaction() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS counters '
+                       '(key TEXT PRIMARY KEY, count INTEGER NOT NULL, expiry REAL NOT NULL)')
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connect(self):
+        # One connection per thread, reopened after a fork (gunicorn workers)
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def _transaction(self):
+        return _Transaction(self._connect())
+
+    def incr(self, key, expiry, elastic_expiry=False, amount=1):
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute('SELECT count, expiry FROM counters WHERE key = ?', (key,)).fetchone()
+            if row is None or row[1] <= now:
+                count, expires = amount, now + expiry
+            else:
+                count, expires = row[0] + amount, now + expiry if elastic_expiry else row[1]
+            db.execute('INSERT OR REPLACE INTO counters (key, count, expiry) VALUES (?, ?, ?)', (key, count, expires))
+            self._increments += 1
+            if self._increments % PURGE_EVERY == 0:
+                db.execute('DELETE FROM counters WHERE expiry <= ?', (now,))
+        return count
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT count FROM counters WHERE key = ? AND expiry > ?', (key, time.time())).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        row = self._connect().execute(
+            'SELECT expiry FROM counters WHERE key = ? AND expiry > ?', (key, time.time())).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self):
+        try:
+            self._connect().execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        with self._transaction() as db:
+            return db.execute('DELETE FROM counters').rowcount
+
+    def clear(self, key):
+        with self._transaction() as db:
+            db.execute('DELETE FROM counters WHERE key = ?', (key,))
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT: the read-modify-write of a counter holds the write lock throughout"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc, tb):
+        self.connection.execute('COMMIT' if exc_type is None else 'ROLLBACK')
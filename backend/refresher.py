@@ -0,0 +1,16 @@
+"""Background process for multi-worker serving
+
+Runs the janitor, live feed and refresh scheduler, and publishes store
+generations and SSE events that web workers (SERVER_ROLE=worker) map and
+relay read-only. gunicorn.conf.py starts it next to the workers; run it
+directly when the workers are started some other way.
+"""
+import os
+
+os.environ.setdefault('SERVER_ROLE', 'refresher')
+
+import app  # noqa: E402  (the role must be set before the app module is configured)
+
+
+if __name__ == '__main__':
+    app.start_background_jobs().join()
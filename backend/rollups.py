@@ -0,0 +1,207 @@
+import math
+
+import numpy as np
+
+from analysis import DANGEROUS_MAGNITUDE
+
+BUCKET_MS = 3_600_000  # Rollups are kept per UTC hour; days are merged from hours at query time
+DAY_MS = 86_400_000
+
+# Magnitudes are binned to the nearest 0.1 (the usual catalogue precision) from -2.0 to 10.0;
+# the binned histogram doubles as an exact, mergeable quantile sketch at that resolution
+MAG_STEP = 0.1
+MAG_MIN = -2.0
+MAG_BINS = 121
+
+# Depth bin edges in km; the first bin holds events above sea level, the last everything deeper
+DEPTH_EDGES = (0, 5, 10, 20, 35, 70, 150, 300, 450, 600, 800)
+
+# Cumulative per-bucket sums: count, magnitude sum, magnitude sum of squares, dangerous count, depth sum
+STAT_FIELDS = ('count', 'mag_sum', 'mag_sq_sum', 'dangerous', 'depth_sum')
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95, 99)
+MIN_B_VALUE_EVENTS = 50  # Below this the maximum-likelihood b-value is too noisy to report
+
+
+class RollupError(ValueError):
+    """Raised for malformed rollup query parameters"""
+
+
+def magnitude_codes(mags):
+    """Histogram bin per magnitude (nearest 0.1, clipped to the binned range)"""
+    codes = np.rint((np.asarray(mags, dtype=np.float64) - MAG_MIN) / MAG_STEP)
+    return np.clip(np.nan_to_num(codes), 0, MAG_BINS - 1).astype(np.int64)
+
+
+def depth_codes(depths):
+    return np.searchsorted(DEPTH_EDGES, np.asarray(depths, dtype=np.float64), side='right')
+
+
+def _cumulative(per_bucket):
+    """Prefix sums with a leading zero row, so a bucket range [a, b) is cum[b] - cum[a]"""
+    cum = np.zeros((per_bucket.shape[0] + 1,) + per_bucket.shape[1:], dtype=per_bucket.dtype)
+    np.cumsum(per_bucket, axis=0, out=cum[1:])
+    return cum
+
+
+def build_rollup_indexes(columns):
+    """Per-hour rollups for every non-empty hour, stored with the generation like the other indexes
+
+    Histograms and sums are cumulative over buckets, so any window is two
+    row lookups and a subtraction; min and max are kept per bucket and
+    reduced over the (at most one row per event) bucket range.
+    """
+    times = np.asarray(columns['time'], dtype=np.int64)
+    mags = np.asarray(columns['mag'], dtype=np.float64)
+    depths = np.asarray(columns['depth'], dtype=np.float64)
+    hours = times // BUCKET_MS
+    starts, bucket = np.unique(hours, return_inverse=True)  # Ascending, oldest hour first
+    n_buckets = len(starts)
+
+    stats = np.zeros((n_buckets, len(STAT_FIELDS)), dtype=np.float64)
+    for column, values in enumerate((np.ones(len(mags)), mags, mags * mags,
+                                     (mags >= DANGEROUS_MAGNITUDE).astype(np.float64), depths)):
+        stats[:, column] = np.bincount(bucket, weights=values, minlength=n_buckets)
+
+    mag_hist = np.bincount(bucket * MAG_BINS + magnitude_codes(mags),
+                           minlength=n_buckets * MAG_BINS).reshape(n_buckets, MAG_BINS)
+    depth_bins = len(DEPTH_EDGES) + 1
+    depth_hist = np.bincount(bucket * depth_bins + depth_codes(depths),
+                             minlength=n_buckets * depth_bins).reshape(n_buckets, depth_bins)
+
+    extrema = np.full((n_buckets, 2), np.nan)
+    if n_buckets:
+        extrema[:, 0] = np.inf
+        extrema[:, 1] = -np.inf
+        np.minimum.at(extrema[:, 0], bucket, mags)
+        np.maximum.at(extrema[:, 1], bucket, mags)
+
+    return {
+        'rollup_start': (starts * BUCKET_MS).astype(np.int64),
+        'rollup_stats': _cumulative(stats),
+        'rollup_mag_hist': _cumulative(mag_hist.astype(np.uint32)),
+        'rollup_depth_hist': _cumulative(depth_hist.astype(np.uint32)),
+        'rollup_extrema': extrema,
+    }
+
+
+def has_rollups(indexes, store_size):
+    return 'rollup_stats' in indexes and int(indexes['rollup_stats'][-1, 0]) == store_size
+
+
+def parse_percentiles(value):
+    if not value:
+        return DEFAULT_PERCENTILES
+    try:
+        percentiles = tuple(float(p) for p in value.split(','))
+    except ValueError:
+        raise RollupError("Invalid percentiles: expected comma-separated numbers")
+    if not all(0 <= p <= 100 for p in percentiles):
+        raise RollupError("Invalid percentiles: each must be within [0, 100]")
+    return percentiles
+
+
+def bucket_range(rollups, start=None, end=None):
+    """[lo, hi) bucket positions of the hours overlapping [start, end] (epoch ms, inclusive)"""
+    starts = rollups['rollup_start']
+    lo = int(np.searchsorted(starts, start // BUCKET_MS * BUCKET_MS, side='left')) if start is not None else 0
+    hi = int(np.searchsorted(starts, end, side='right')) if end is not None else len(starts)
+    return lo, max(hi, lo)
+
+
+def magnitude_percentiles(histogram, percentiles):
+    """Nearest-rank percentiles from the binned magnitude histogram"""
+    total = int(histogram.sum())
+    if total == 0:
+        return {}
+    cumulative = np.cumsum(histogram)
+    result = {}
+    for p in percentiles:
+        rank = max(1, math.ceil(p / 100 * total))
+        code = int(np.searchsorted(cumulative, rank, side='left'))
+        result[f"p{p:g}"] = round(MAG_MIN + code * MAG_STEP, 1)
+    return result
+
+
+def b_value(histogram, mc=None):
+    """Gutenberg-Richter b-value by Aki-Utsu maximum likelihood on the binned magnitudes
+
+    The magnitude of completeness defaults to the maximum-curvature estimate
+    (the most populated bin); the uncertainty is Shi & Bolt (1982).
+    """
+    histogram = np.asarray(histogram, dtype=np.float64)
+    if histogram.sum() == 0:
+        return None
+    if mc is None:
+        mc_code = int(np.argmax(histogram))
+        method = 'maximum_curvature'
+    else:
+        mc_code = int(magnitude_codes([mc])[0])
+        method = 'given'
+    values = MAG_MIN + np.arange(MAG_BINS) * MAG_STEP
+    counts = histogram[mc_code:]
+    values = values[mc_code:]
+    n = counts.sum()
+    result = {'mc': round(MAG_MIN + mc_code * MAG_STEP, 1), 'mc_method': method, 'events': int(n)}
+    if n < MIN_B_VALUE_EVENTS:
+        return dict(result, b_value=None, b_error=None)
+    mean = float(np.dot(counts, values) / n)
+    denominator = mean - (values[0] - MAG_STEP / 2)
+    if denominator <= 0:
+        return dict(result, b_value=None, b_error=None)
+    b = math.log10(math.e) / denominator
+    variance = float(np.dot(counts, (values - mean) ** 2)) / (n * (n - 1))
+    return dict(result, b_value=round(b, 3), b_error=round(2.3 * b * b * math.sqrt(variance), 3))
+
+
+def bucket_series(rollups, lo, hi, interval):
+    """[(bucket start ms, count)] for non-empty hours or days in a bucket range"""
+    starts = np.asarray(rollups['rollup_start'][lo:hi])
+    counts = np.diff(np.asarray(rollups['rollup_stats'][lo:hi + 1, 0])).astype(np.int64)
+    if interval == 'day':
+        days, first = np.unique(starts // DAY_MS, return_index=True)
+        starts = days * DAY_MS
+        counts = np.add.reduceat(counts, first) if len(counts) else counts
+    return [[start, count] for start, count in zip(starts.tolist(), counts.tolist())]
+
+
+def summarize(rollups, start=None, end=None, interval='day', percentiles=DEFAULT_PERCENTILES, mc=None):
+    """Window statistics answered from the rollup indexes alone, without reading event rows"""
+    lo, hi = bucket_range(rollups, start, end)
+    stats = np.asarray(rollups['rollup_stats'][hi]) - np.asarray(rollups['rollup_stats'][lo])
+    mag_hist = np.asarray(rollups['rollup_mag_hist'][hi], dtype=np.int64) - rollups['rollup_mag_hist'][lo]
+    depth_hist = np.asarray(rollups['rollup_depth_hist'][hi], dtype=np.int64) - rollups['rollup_depth_hist'][lo]
+    count, mag_sum, mag_sq_sum, dangerous, depth_sum = stats.tolist()
+    count = int(round(count))
+
+    mean = mag_sum / count if count else 0.0
+    variance = max(mag_sq_sum / count - mean * mean, 0.0) if count else 0.0
+    extrema = np.asarray(rollups['rollup_extrema'][lo:hi])
+    starts = rollups['rollup_start']
+    depth_bounds = (None,) + DEPTH_EDGES + (None,)
+    return {
+        'window': {
+            'start': int(starts[lo]) if hi > lo else start,
+            'end': int(starts[hi - 1]) + BUCKET_MS if hi > lo else end,
+            'buckets': hi - lo,
+        },
+        'count': count,
+        'dangerous': int(round(dangerous)),
+        'magnitude': {
+            'mean': round(mean, 3),
+            'std': round(math.sqrt(variance), 3),
+            'min': round(float(extrema[:, 0].min()), 2) if count else None,
+            'max': round(float(extrema[:, 1].max()), 2) if count else None,
+            'percentiles': magnitude_percentiles(mag_hist, percentiles),
+            'histogram': [{'magnitude': round(MAG_MIN + code * MAG_STEP, 1), 'count': int(mag_hist[code])}
+                          for code in np.flatnonzero(mag_hist).tolist()],
+            'bin_width': MAG_STEP,
+        },
+        'depth': {
+            'mean': round(depth_sum / count, 3) if count else 0.0,
+            'histogram': [{'min_km': depth_bounds[i], 'max_km': depth_bounds[i + 1], 'count': int(c)}
+                          for i, c in enumerate(depth_hist.tolist())],
+        },
+        'gutenberg_richter': b_value(mag_hist, mc),
+        'series': {'interval': interval, 'counts': bucket_series(rollups, lo, hi, interval)},
+    }
@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import deque
+
+MAX_TRACKED = 256  # Distinct request shapes remembered; the least demanded are dropped first
+MIN_SCORE = 0.05
+
+
+class RefreshScheduler:
+    """Refreshes the canonical store by demand and staleness, then pre-warms the most requested views
+
+    Every request shape (size, sort, filters, format) is counted with
+    exponential decay. The store is refreshed once for all sizes: sooner when
+    demand is high, at most every `min_interval` seconds, never later than
+    `max_interval`, and only while the upstream request budget for the last
+    hour allows. After each tick the most demanded shapes that are not yet
+    cached for the current generation are warmed from the store, which costs
+    no upstream requests. Without a refresh callable (web workers that only
+    map a store published by another process) it only warms views.
+    """
+
+    def __init__(self, refresh, warm, store_age, upstream_requests, budget_per_hour,
+                 min_interval=300, max_interval=7200, half_life=3600, max_warm=8, tick=30, metrics=None):
+        self.refresh = refresh  # () -> dataset or None; None to only warm views
+        self.warm = warm  # (params) -> True if something was computed
+        self.store_age = store_age  # () -> seconds, or None without a store
+        self.upstream_requests = upstream_requests  # () -> cumulative upstream request count
+        self.budget_per_hour = budget_per_hour
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.half_life = half_life
+        self.max_warm = max_warm
+        self.tick = tick
+        self.metrics = metrics
+        self.last_refresh_cost = 1
+        self._demand = {}  # key -> [score, updated_at, params]
+        self._usage = deque()  # (time, cumulative upstream requests) samples
+        self._lock = threading.Lock()
+
+    def _decayed(self, score, updated_at, now):
+        return score * 0.5 ** ((now - updated_at) / self.half_life)
+
+    def record(self, key, params):
+        """Count one request for a shape; params are handed back to warm()"""
+        now = time.time()
+        with self._lock:
+            entry = self._demand.get(key)
+            if entry is None:
+                if len(self._demand) >= MAX_TRACKED:
+                    coldest = min(self._demand, key=lambda k: self._decayed(*self._demand[k][:2], now))
+                    del self._demand[coldest]
+                self._demand[key] = [1.0, now, params]
+            else:
+                entry[0] = self._decayed(entry[0], entry[1], now) + 1
+                entry[1] = now
+
+    def demand(self):
+        """[(score, key, params)] by current decayed score, highest first"""
+        now = time.time()
+        with self._lock:
+            for key in [k for k, (score, updated_at, _) in self._demand.items()
+                        if self._decayed(score, updated_at, now) < MIN_SCORE]:
+                del self._demand[key]
+            ranked = [(self._decayed(score, updated_at, now), key, params)
+                      for key, (score, updated_at, params) in self._demand.items()]
+        return sorted(ranked, key=lambda item: item[0], reverse=True)
+
+    def refresh_after(self, total_demand):
+        """Store age that triggers a refresh: max_interval when idle, shrinking with demand"""
+        return max(self.min_interval, self.max_interval / (1 + total_demand))
+
+    def budget_used(self):
+        """Upstream requests made in the last hour"""
+        now = time.time()
+        current = self.upstream_requests()
+        self._usage.append((now, current))
+        while len(self._usage) > 1 and now - self._usage[1][0] >= 3600:
+            self._usage.popleft()
+        return current - self._usage[0][1]
+
+    def run_once(self):
+        """One scheduling pass; returns a summary of what was done"""
+        ranked = self.demand()
+        total_demand = sum(score for score, _, _ in ranked)
+        age = self.store_age()
+        summary = {'demand': round(total_demand, 2), 'refreshed': False, 'warmed': 0, 'skipped_budget': False}
+
+        if self.refresh is not None and (age is None or age >= self.refresh_after(total_demand)):
+            used = self.budget_used()
+            if used + self.last_refresh_cost > self.budget_per_hour:
+                summary['skipped_budget'] = True
+                print(f"Refresh deferred: {used}/{self.budget_per_hour} upstream requests used in the last hour")
+            else:
+                before = self.upstream_requests()
+                start_time = time.time()
+                dataset = self.refresh()
+                duration = time.time() - start_time
+                self.last_refresh_cost = max(1, self.upstream_requests() - before)
+                summary['refreshed'] = dataset is not None
+                if self.metrics is not None:
+                    self.metrics.observe('background_refresh_seconds', duration,
+                                         result='fetched' if dataset is not None else 'failed')
+                print(f"Scheduled refresh {'done' if dataset is not None else 'failed'} in {duration:.1f}s "
+                      f"({self.last_refresh_cost} upstream requests, store age was "
+                      f"{'none' if age is None else f'{age / 60:.1f} min'})")
+
+        # Warm-ups are derived from the store and cost no upstream requests
+        for score, key, params in ranked[:self.max_warm]:
+            try:
+                if self.warm(params):
+                    summary['warmed'] += 1
+            except Exception as e:
+                print(f"Warm-up error for {key}: {e}")
+        return summary
+
+    def run(self):
+        while True:
+            try:
+                summary = self.run_once()
+                if summary['refreshed'] or summary['warmed']:
+                    print(f"Scheduler: {summary}")
+            except Exception as e:
+                print(f"Scheduler error: {e}")
+            time.sleep(self.tick)
@@ -0,0 +1,72 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one execution"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {'executions': 0, 'shared': 0}
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key, fn, *args):
+        """Run fn(*args) once per key; concurrent callers wait and share the result
+
+        Returns (result, shared) where shared is True for callers that joined
+        an execution started by someone else. Exceptions are re-raised in
+        every waiting caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.stats['shared'] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.stats['executions'] += 1
+                leader = True
+
+        if leader:
+            self._run(key, call, fn, args)
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result, not leader
+
+    def do_async(self, key, fn, *args):
+        """Start fn(*args) in a background thread unless the key is already in flight"""
+        with self._lock:
+            if key in self._calls:
+                return False
+            call = _Call()
+            self._calls[key] = call
+            self.stats['executions'] += 1
+        thread = threading.Thread(target=self._run, args=(key, call, fn, args), daemon=True)
+        thread.start()
+        return True
+
+    def _run(self, key, call, fn, args):
+        try:
+            call.result = fn(*args)
+        except Exception as e:
+            call.error = e
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
@@ -0,0 +1,122 @@
+import heapq
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+LEAF_SIZE = 16
+
+
+def to_unit_xyz(lat, lon):
+    """Points on the unit sphere for latitude/longitude in degrees"""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km (vectorized over the second point)"""
+    lat1, lon1 = np.radians(lat1), np.radians(lon1)
+    lat2, lon2 = np.radians(np.asarray(lat2)), np.radians(np.asarray(lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def chord_for_km(distance_km):
+    """Straight-line distance on the unit sphere for a great-circle distance"""
+    angle = min(distance_km / EARTH_RADIUS_KM, np.pi)
+    return 2 * np.sin(angle / 2)
+
+
+class SphereKDTree:
+    """KD-tree over unit-sphere coordinates; chord distance is monotonic in haversine distance"""
+
+    def __init__(self, lat, lon):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.points = to_unit_xyz(self.lat, self.lon)
+        self.order = np.arange(len(self.points))
+        # Flat node arrays: row span in self.order, children, bounding box
+        self.starts, self.stops, self.lefts, self.rights = [], [], [], []
+        self.box_min, self.box_max = [], []
+        if len(self.points):
+            self._build(0, len(self.points))
+        self.box_min = np.array(self.box_min)
+        self.box_max = np.array(self.box_max)
+
+    def __len__(self):
+        return len(self.points)
+
+    def _build(self, start, stop):
+        node = len(self.starts)
+        span = self.points[self.order[start:stop]]
+        self.starts.append(start)
+        self.stops.append(stop)
+        self.lefts.append(-1)
+        self.rights.append(-1)
+        self.box_min.append(span.min(axis=0))
+        self.box_max.append(span.max(axis=0))
+        if stop - start > LEAF_SIZE:
+            axis = int(np.argmax(self.box_max[node] - self.box_min[node]))
+            mid = (start + stop) // 2
+            # Median split along the widest axis
+            part = np.argpartition(span[:, axis], mid - start)
+            self.order[start:stop] = self.order[start:stop][part]
+            self.lefts[node] = self._build(start, mid)
+            self.rights[node] = self._build(mid, stop)
+        return node
+
+    def _box_distance(self, node, point):
+        excess = np.maximum(self.box_min[node] - point, 0) + np.maximum(point - self.box_max[node], 0)
+        return float(np.sqrt(np.dot(excess, excess)))
+
+    def query_radius(self, lat, lon, radius_km):
+        """(rows, distances_km) of every point within radius_km, nearest first"""
+        if not len(self.points):
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        point = to_unit_xyz([lat], [lon])[0]
+        chord = chord_for_km(radius_km)
+        found = []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if self._box_distance(node, point) > chord:
+                continue
+            if self.lefts[node] < 0:
+                rows = self.order[self.starts[node]:self.stops[node]]
+                diff = self.points[rows] - point
+                found.append(rows[np.einsum('ij,ij->i', diff, diff) <= chord * chord])
+            else:
+                stack.extend((self.lefts[node], self.rights[node]))
+        rows = np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+        distances = haversine_km(lat, lon, self.lat[rows], self.lon[rows])
+        # Re-check with the exact great-circle distance at the boundary
+        keep = distances <= radius_km
+        rows, distances = rows[keep], distances[keep]
+        nearest = np.argsort(distances, kind='stable')
+        return rows[nearest], distances[nearest]
+
+    def query_knn(self, lat, lon, k):
+        """(rows, distances_km) of the k nearest points, nearest first (best-first search)"""
+        if not len(self.points) or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        point = to_unit_xyz([lat], [lon])[0]
+        best = []  # Max-heap of (-chord^2, row) holding the current k nearest
+        frontier = [(0.0, 0)]  # Min-heap of (box distance, node)
+        while frontier:
+            box_distance, node = heapq.heappop(frontier)
+            if len(best) == k and box_distance * box_distance > -best[0][0]:
+                break
+            if self.lefts[node] < 0:
+                rows = self.order[self.starts[node]:self.stops[node]]
+                diff = self.points[rows] - point
+                for row, dist_sq in zip(rows.tolist(), np.einsum('ij,ij->i', diff, diff).tolist()):
+                    if len(best) < k:
+                        heapq.heappush(best, (-dist_sq, row))
+                    elif dist_sq < -best[0][0]:
+                        heapq.heapreplace(best, (-dist_sq, row))
+            else:
+                for child in (self.lefts[node], self.rights[node]):
+                    heapq.heappush(frontier, (self._box_distance(child, point), child))
+        rows = np.array([row for _, row in sorted(best, reverse=True)], dtype=np.int64)
+        return rows, haversine_km(lat, lon, self.lat[rows], self.lon[rows])
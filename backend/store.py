@@ -0,0 +1,346 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from filters import build_filter_indexes
+from rollups import build_rollup_indexes
+
+# Numeric columns, all row-aligned and ordered newest event first
+NUMERIC_COLUMNS = {
+    'time': np.int64,
+    'mag': np.float64,
+    'lat': np.float64,
+    'lon': np.float64,
+    'depth': np.float64,
+}
+# Variable-length text columns, stored as a utf-8 blob plus an offsets array
+TEXT_COLUMNS = ('id', 'place', 'url')
+
+# Precomputed row orders stored with each generation, keyed by /earthquakes sort mode
+SORT_INDEXES = ('magnitude', 'location')
+
+CURRENT_FILE = 'CURRENT'
+KEEP_GENERATIONS = 2
+
+
+class TextColumn:
+    """Variable-length strings backed by an offsets array and a byte blob"""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("TextColumn only supports contiguous slices")
+            # Offsets stay absolute, so the blob is shared rather than copied
+            return TextColumn(self.offsets[start:stop + 1], self.blob)
+        start, stop = int(self.offsets[index]), int(self.offsets[index + 1])
+        value = bytes(self.blob[start:stop]).decode('utf-8')
+        return value or None
+
+    def tolist(self):
+        offsets = self.offsets.tolist()
+        if not offsets:
+            return []
+        base = offsets[0]
+        raw = bytes(self.blob[base:offsets[-1]])
+        text = raw.decode('utf-8')
+        # Offsets are byte positions, so decode per value when text is not ASCII
+        if len(text) != len(raw):
+            return [raw[a - base:b - base].decode('utf-8') or None for a, b in zip(offsets, offsets[1:])]
+        return [text[a - base:b - base] or None for a, b in zip(offsets, offsets[1:])]
+
+    def take(self, rows):
+        """Values at the given row positions, decoding only those rows"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return []
+        offsets = np.asarray(self.offsets)
+        starts = offsets[rows]
+        stops = offsets[rows + 1]
+        base = int(starts.min())
+        raw = bytes(self.blob[base:int(stops.max())])
+        return [raw[a:b].decode('utf-8') or None for a, b in zip((starts - base).tolist(), (stops - base).tolist())]
+
+    @classmethod
+    def from_strings(cls, values):
+        encoded = [(v or '').encode('utf-8') for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(offsets, blob)
+
+
+class StoreView:
+    """Row-aligned slice over the store columns (no data is copied)"""
+
+    def __init__(self, columns, indexes=None):
+        self.columns = columns
+        # Sort permutations over the full store; only valid for views starting at row 0
+        self.indexes = indexes or {}
+
+    def __len__(self):
+        return len(self.columns['time'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def slice(self, start, stop):
+        indexes = self.indexes if start == 0 else None
+        return StoreView({name: col[start:stop] for name, col in self.columns.items()}, indexes)
+
+    def head(self, size):
+        """Newest `size` events as a zero-copy view"""
+        return self.slice(0, min(size, len(self)))
+
+    def take(self, rows):
+        """Copy of the given rows, in the given order, as a standalone view"""
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = {name: np.asarray(self.columns[name])[rows] for name in NUMERIC_COLUMNS}
+        for name in TEXT_COLUMNS:
+            columns[name] = TextColumn.from_strings(self.columns[name].take(rows))
+        return StoreView(columns)
+
+    def sort_order(self, sort_by):
+        """Row positions in `sort_by` order, from the precomputed index when available"""
+        n = len(self)
+        if sort_by not in SORT_INDEXES:
+            return np.arange(n)  # Rows are already newest first
+        index = self.indexes.get(sort_by)
+        if index is not None:
+            if len(index) == n:
+                return index
+            # Prefix view: keep index order, drop rows past the prefix (one vectorized pass)
+            return index[index < n]
+        return build_sort_indexes(self.columns, names=(sort_by,))[sort_by]
+
+    def to_features(self, order=None):
+        """Materialize the rows (optionally in `order`) as minimal GeoJSON features"""
+        numeric = {name: np.asarray(self.columns[name]) for name in NUMERIC_COLUMNS}
+        if order is None:
+            ids = self.columns['id'].tolist()
+            places = self.columns['place'].tolist()
+            urls = self.columns['url'].tolist()
+        else:
+            # Only the requested rows are decoded, so a page costs O(page) not O(view)
+            numeric = {name: col[order] for name, col in numeric.items()}
+            ids = self.columns['id'].take(order)
+            places = self.columns['place'].take(order)
+            urls = self.columns['url'].take(order)
+        times = numeric['time'].tolist()
+        mags = numeric['mag'].tolist()
+        lats = numeric['lat'].tolist()
+        lons = numeric['lon'].tolist()
+        depths = numeric['depth'].tolist()
+        return [
+            {
+                'type': 'Feature',
+                'id': ids[i],
+                'properties': {'mag': mags[i], 'place': places[i], 'time': times[i], 'url': urls[i]},
+                'geometry': {'type': 'Point', 'coordinates': [lons[i], lats[i], depths[i]]}
+            }
+            for i in range(len(ids))
+        ]
+
+
+class EarthquakeStore(StoreView):
+    """One published generation of the canonical earthquake dataset"""
+
+    def __init__(self, columns, meta, indexes=None):
+        super().__init__(columns, indexes)
+        self.meta = meta
+
+    @property
+    def version(self):
+        return self.meta['generation']
+
+    @property
+    def timestamp(self):
+        return self.meta['timestamp']
+
+
+def build_sort_indexes(columns, names=SORT_INDEXES):
+    """Stable sort permutations matching the /earthquakes sort modes"""
+    indexes = {}
+    if 'magnitude' in names:
+        # Stable on the newest-first row order, so ties stay newest first
+        indexes['magnitude'] = np.argsort(-np.asarray(columns['mag']), kind='stable')
+    if 'location' in names:
+        places = columns['place'].tolist()
+        indexes['location'] = np.array(sorted(range(len(places)), key=lambda i: places[i] or ''), dtype=np.int64)
+    return indexes
+
+
+def build_indexes(columns):
+    """Every per-generation index: sort permutations, filter indexes and hourly rollups"""
+    indexes = build_sort_indexes(columns)
+    indexes.update(build_filter_indexes(columns, indexes['magnitude']))
+    indexes.update(build_rollup_indexes(columns))
+    return indexes
+
+
+def columns_from_features(features):
+    """Build in-memory columns from GeoJSON features, newest event first"""
+    features = sorted(features, key=lambda f: f['properties']['time'], reverse=True)
+    coords = [f['geometry']['coordinates'] for f in features]
+    columns = {
+        'time': np.array([f['properties']['time'] for f in features], dtype=np.int64),
+        'mag': np.array([f['properties']['mag'] for f in features], dtype=np.float64),
+        'lat': np.array([c[1] for c in coords], dtype=np.float64),
+        'lon': np.array([c[0] for c in coords], dtype=np.float64),
+        'depth': np.array([c[2] if len(c) > 2 and c[2] is not None else 0.0 for c in coords], dtype=np.float64),
+        'id': TextColumn.from_strings(f['id'] for f in features),
+        'place': TextColumn.from_strings(f['properties'].get('place') for f in features),
+        'url': TextColumn.from_strings(f['properties'].get('url') for f in features),
+    }
+    return columns
+
+
+def columns_digest(columns):
+    """Content hash of row-aligned columns, so an identical rebuild can be recognised"""
+    digest = hashlib.sha1()
+    for name in NUMERIC_COLUMNS:
+        digest.update(np.ascontiguousarray(columns[name]).tobytes())
+    for name in TEXT_COLUMNS:
+        offsets = np.asarray(columns[name].offsets)
+        base = int(offsets[0]) if len(offsets) else 0
+        # Offsets of a sliced column are absolute into a shared blob; hash them relative to the slice
+        digest.update((offsets - base).tobytes())
+        digest.update(bytes(columns[name].blob[base:int(offsets[-1]) if len(offsets) else 0]))
+    return digest.hexdigest()
+
+
+def read_current(store_dir):
+    """Read the pointer to the published generation, or None"""
+    try:
+        with open(os.path.join(store_dir, CURRENT_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def open_store(store_dir):
+    """Memory-map the currently published generation, or return None"""
+    meta = read_current(store_dir)
+    if not meta:
+        return None
+    gen_dir = os.path.join(store_dir, meta['generation'])
+    try:
+        columns = {}
+        for name in NUMERIC_COLUMNS:
+            columns[name] = np.load(os.path.join(gen_dir, f"{name}.npy"), mmap_mode='r')
+        for name in TEXT_COLUMNS:
+            offsets = np.load(os.path.join(gen_dir, f"{name}.off.npy"), mmap_mode='r')
+            blob_file = os.path.join(gen_dir, f"{name}.bin")
+            if os.path.getsize(blob_file):
+                blob = np.memmap(blob_file, dtype=np.uint8, mode='r')
+            else:
+                blob = np.zeros(0, dtype=np.uint8)  # mmap cannot map an empty file
+            columns[name] = TextColumn(offsets, blob)
+        indexes = {}
+        for index_file in glob.glob(os.path.join(gen_dir, 'index_*.npy')):
+            name = os.path.basename(index_file)[len('index_'):-len('.npy')]
+            indexes[name] = np.load(index_file, mmap_mode='r')
+    except (OSError, ValueError) as e:
+        print(f"Store open error for generation {meta['generation']}: {e}")
+        return None
+    return EarthquakeStore(columns, meta, indexes)
+
+
+def merge_columns(view, upserts, deleted_ids, limit):
+    """Apply upserted features and deletions to a view, keeping the newest `limit` rows"""
+    replaced = set(deleted_ids)
+    replaced.update(f['id'] for f in upserts)
+    ids = view['id'].tolist()
+    keep = np.fromiter((event_id not in replaced for event_id in ids), dtype=bool, count=len(ids))
+    new = columns_from_features(upserts)
+
+    merged = {name: np.concatenate([np.asarray(view[name])[keep], new[name]]) for name in NUMERIC_COLUMNS}
+    order = np.argsort(-merged['time'], kind='stable')[:limit]
+    columns = {name: merged[name][order] for name in NUMERIC_COLUMNS}
+    for name in TEXT_COLUMNS:
+        values = [v for v, k in zip(view[name].tolist(), keep) if k] + new[name].tolist()
+        columns[name] = TextColumn.from_strings(values[i] for i in order.tolist())
+    return columns
+
+
+def write_store(store_dir, features, timestamp=None, last_sync=None, complete=False):
+    """Write features as a new generation and publish it atomically"""
+    return write_columns(store_dir, columns_from_features(features), timestamp, last_sync, complete)
+
+
+def write_columns(store_dir, columns, timestamp=None, last_sync=None, complete=False):
+    """Write row-aligned columns (newest first) as a new generation and publish it
+
+    `complete` marks a generation holding everything a full refresh found,
+    so readers do not take a short store for a partial one.
+    """
+    timestamp = time.time() if timestamp is None else timestamp
+    generation = f"g{time.time_ns():x}"
+    os.makedirs(store_dir, exist_ok=True)
+    tmp_dir = os.path.join(store_dir, f".{generation}.tmp")
+    os.makedirs(tmp_dir)
+
+    for name in NUMERIC_COLUMNS:
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(columns[name]))
+    for name in TEXT_COLUMNS:
+        np.save(os.path.join(tmp_dir, f"{name}.off.npy"), columns[name].offsets)
+        with open(os.path.join(tmp_dir, f"{name}.bin"), 'wb') as f:
+            f.write(columns[name].blob.tobytes())
+    # Sort, filter and rollup indexes are built once per generation and mapped alongside the data
+    for name, index in build_indexes(columns).items():
+        np.save(os.path.join(tmp_dir, f"index_{name}.npy"), index)
+
+    os.rename(tmp_dir, os.path.join(store_dir, generation))
+    count = len(columns['time'])
+    meta = {
+        'generation': generation,
+        'timestamp': timestamp,
+        'count': count,
+        # Watermarks for incremental sync (epoch milliseconds)
+        'newest_time': int(columns['time'][0]) if count else None,
+        'last_sync': int(timestamp * 1000) if last_sync is None else int(last_sync),
+        'complete': bool(complete),
+        'digest': columns_digest(columns),
+    }
+    publish_meta(store_dir, meta)
+
+    prune_generations(store_dir, keep=meta['generation'])
+    return open_store(store_dir)
+
+
+def publish_meta(store_dir, meta):
+    """Atomically point CURRENT at a generation with the given metadata"""
+    pointer_tmp = os.path.join(store_dir, f".{CURRENT_FILE}.tmp")
+    with open(pointer_tmp, 'w') as f:
+        json.dump(meta, f)
+    os.replace(pointer_tmp, os.path.join(store_dir, CURRENT_FILE))
+
+
+def touch_store(store_dir, store, last_sync, **changes):
+    """Mark an unchanged generation as freshly synced without rewriting its columns"""
+    meta = dict(store.meta, timestamp=time.time(), last_sync=int(last_sync), **changes)
+    publish_meta(store_dir, meta)
+    return EarthquakeStore(store.columns, meta, store.indexes)
+
+
+def prune_generations(store_dir, keep):
+    """Remove old generations; open mmaps keep their pages until released"""
+    generations = sorted(
+        name for name in os.listdir(store_dir)
+        if name.startswith('g') and os.path.isdir(os.path.join(store_dir, name))
+    )
+    stale = [name for name in generations if name != keep][:-(KEEP_GENERATIONS - 1) or None]
+    for name in stale:
+        shutil.rmtree(os.path.join(store_dir, name), ignore_errors=True)
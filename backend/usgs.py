@@ -0,0 +1,255 @@
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Point this at a local stand-in (e.g. http://127.0.0.1:8081) for testing
+USGS_BASE_URL = os.environ.get('USGS_BASE_URL', 'https://earthquake.usgs.gov').rstrip('/')
+QUERY_PATH = '/fdsnws/event/1/query'
+COUNT_PATH = '/fdsnws/event/1/count'
+FEED_PATH = '/earthquakes/feed/v1.0/summary/{feed}.geojson'
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def iso_time(epoch_ms):
+    """fdsnws time parameter (UTC) for epoch milliseconds"""
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(epoch_ms / 1000))
+
+
+class UpstreamError(Exception):
+    """Raised when a USGS request still fails after all retries"""
+
+
+class AdaptiveBackoff:
+    """Shared pacing between upstream requests that widens on throttling and relaxes on success"""
+
+    def __init__(self, min_delay=0.0, base_delay=0.5, max_delay=30.0):
+        self.min_delay = min_delay
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.delay = min_delay
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until this caller's slot; slots are `delay` seconds apart across all workers"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.delay
+        if slot > now:
+            time.sleep(slot - now)
+
+    def success(self):
+        with self._lock:
+            self.delay = max(self.min_delay, self.delay / 2)
+            if self.delay < self.base_delay / 8:
+                self.delay = self.min_delay
+
+    def failure(self, retry_after=None):
+        with self._lock:
+            self.delay = min(self.max_delay, max(self.base_delay, self.delay * 2, retry_after or 0))
+            # Push every worker back, not just the one that was throttled
+            self._next_slot = max(self._next_slot, time.monotonic() + self.delay)
+
+
+class USGSClient:
+    """Connection-pooled USGS client with bounded concurrency and adaptive backoff"""
+
+    def __init__(self, base_url=USGS_BASE_URL, max_workers=4, timeout=60, max_attempts=3, metrics=None):
+        self.base_url = base_url.rstrip('/')
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff = AdaptiveBackoff()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0}
+        self._stats_lock = threading.Lock()
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.histogram('usgs_request_seconds', 'Latency of each USGS HTTP request (one page, count or feed)')
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def get(self, path, params=None, headers=None):
+        """GET with retries; returns the requests.Response (which may be a 304)"""
+        url = path if path.startswith('http') else self.base_url + path
+        last_error = None
+        for attempt in range(1, self.max_attempts + 1):
+            self.backoff.wait()
+            self._count('requests')
+            start_time = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+                self._observe(path, response.status_code, start_time)
+                if response.status_code in RETRY_STATUSES:
+                    retry_after = response.headers.get('Retry-After')
+                    retry_after = float(retry_after) if retry_after and retry_after.isdigit() else None
+                    self.backoff.failure(retry_after)
+                    last_error = UpstreamError(f"HTTP {response.status_code} from {url}")
+                elif response.status_code >= 400:
+                    # Rejected, not overloaded (e.g. 400 for bad parameters): the same request would
+                    # fail again, and widening the shared backoff would slow every other caller down
+                    self._count('failures')
+                    raise UpstreamError(f"HTTP {response.status_code} from {url}")
+                else:
+                    self.backoff.success()
+                    return response
+            except requests.RequestException as e:
+                if getattr(e, 'response', None) is None:
+                    self._observe(path, 'error', start_time)
+                self.backoff.failure()
+                last_error = e
+            if attempt < self.max_attempts:
+                self._count('retries')
+                # Jitter keeps retrying workers from lining up on the same slot
+                time.sleep(random.uniform(0, self.backoff.delay))
+        self._count('failures')
+        raise UpstreamError(f"Giving up on {url} after {self.max_attempts} attempts: {last_error}")
+
+    def _observe(self, path, status, start_time):
+        if self.metrics is None:
+            return
+        endpoint = 'count' if COUNT_PATH in path else 'query' if QUERY_PATH in path else 'feed'
+        self.metrics.observe('usgs_request_seconds', time.perf_counter() - start_time, endpoint=endpoint, status=status)
+
+    def get_json(self, path, params=None):
+        return self.get(path, params=params).json()
+
+    def count(self, params):
+        """Number of events matching params, or None if the count endpoint fails"""
+        try:
+            data = self.get_json(COUNT_PATH, dict(params, format='geojson'))
+            return int(data['count'])
+        except (UpstreamError, KeyError, ValueError) as e:
+            print(f"  Count query failed ({e}), falling back to paging until a short page")
+            return None
+
+    def query(self, params):
+        return self.get_json(QUERY_PATH, dict(params, format='geojson')).get('features', [])
+
+    def fetch_events(self, date_ranges, target_count, min_magnitude, batch_size=2000):
+        """Collect up to target_count unique events from date_ranges (newest range first)
+
+        Ranges are read in order, a round at a time. A round that fits in one
+        page just reads the next range's first page; a larger one first counts
+        only the ranges it expects to need (judged by the ranges counted so
+        far), then fetches all their pages concurrently. Pages are merged in
+        (range, offset) order so the result is the same as a serial crawl. A
+        page that still fails after retries is fetched once more in order and
+        otherwise fails the whole crawl with UpstreamError, so callers never
+        get a silently short dataset.
+        """
+        collected = []
+        seen_ids = set()  # Maintained incrementally as pages are merged
+
+        def merge(features):
+            added = 0
+            for f in features:
+                mag = f['properties']['mag']
+                if mag is None or mag < min_magnitude or f['id'] in seen_ids:
+                    continue
+                seen_ids.add(f['id'])
+                collected.append(f)
+                added += 1
+            return added
+
+        range_params = [
+            {'minmagnitude': min_magnitude, 'starttime': start, 'endtime': end, 'orderby': 'time'}
+            for start, end in date_ranges
+        ]
+        counts = {}  # Range position -> event count (None when the count endpoint failed)
+        pending = list(range(len(date_ranges)))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending and len(collected) < target_count:
+                needed = target_count - len(collected)
+                if needed > batch_size:
+                    known = [count for count in counts.values() if count is not None]
+                    density = max(1, sum(known) / len(known)) if known else None
+                    wanted = min(self.max_workers, math.ceil(needed / density)) if density else 1
+                    to_count = [i for i in pending[:wanted] if i not in counts]
+                    for i, total in zip(to_count, executor.map(self.count, [range_params[i] for i in to_count])):
+                        counts[i] = total
+
+                # Plan pages for as many ranges as are needed to cover the remaining target
+                planned = []
+                while pending and needed > 0:
+                    i = pending[0]
+                    if needed > batch_size and i not in counts:
+                        break  # Counted next round, once these pages show how much is still missing
+                    pending.pop(0)
+                    total = counts.get(i)
+                    available = needed if total is None else min(total, needed)
+                    pages = [(offset, min(batch_size, available - offset + 1)) for offset in range(1, available + 1, batch_size)]
+                    start, end = date_ranges[i]
+                    print(f"Fetching M >= {min_magnitude} from {start} to {end} ({len(pages)} pages)")
+                    planned.append((range_params[i], total, pages))
+                    needed -= available
+
+                futures = [
+                    [executor.submit(self._fetch_page, params, offset, limit) for offset, limit in pages]
+                    for params, _, pages in planned
+                ]
+
+                for (params, total, pages), page_futures in zip(planned, futures):
+                    for (offset, limit), future in zip(pages, page_futures):
+                        batch_features = future.result()
+                        if batch_features is None:
+                            # Backfill in place rather than leave a hole in the crawl
+                            batch_features = self.query(dict(params, offset=offset, limit=limit))
+                        added = merge(batch_features)
+                        print(f"  Fetched {added} valid records (total: {len(collected)}/{target_count})")
+                        if len(batch_features) < limit:
+                            break
+                    else:
+                        if total is None and len(collected) < target_count:
+                            # Unknown size: keep paging this range serially until it runs dry
+                            offset = pages[-1][0] + pages[-1][1] if pages else 1
+                            while len(collected) < target_count:
+                                limit = min(batch_size, target_count - len(collected))
+                                batch_features = self.query(dict(params, offset=offset, limit=limit))
+                                if not batch_features:
+                                    break
+                                merge(batch_features)
+                                offset += limit
+                                if len(batch_features) < limit:
+                                    break
+
+        return collected[:target_count] if len(collected) > target_count else collected
+
+    def fetch_updates(self, start_ms, updated_after_ms, min_magnitude, page_size=20000):
+        """Events at or after start_ms that were added, revised or deleted after updated_after_ms"""
+        params = {
+            'starttime': iso_time(start_ms),
+            'updatedafter': iso_time(updated_after_ms),
+            'minmagnitude': min_magnitude,
+            'includedeleted': 'true',
+            'orderby': 'time',
+        }
+        features = []
+        offset = 1
+        while True:
+            page = self.query(dict(params, offset=offset, limit=page_size))
+            features.extend(page)
+            if len(page) < page_size:
+                return features
+            offset += page_size
+
+    def _fetch_page(self, params, offset, limit):
+        try:
+            return self.query(dict(params, offset=offset, limit=limit))
+        except UpstreamError as e:
+            print(f"  Error fetching page at offset {offset} from {params['starttime']}: {e}")
+            return None
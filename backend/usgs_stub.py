@@ -0,0 +1,232 @@
+"""Local stand-in for the USGS event API, served from a recorded cache file
+
+    python backend/usgs_stub.py --port 8081 --latency 50 --error-rate 0.05
+    USGS_BASE_URL=http://127.0.0.1:8081 python backend/app.py
+
+Serves fdsnws/event/1/query (paged with offset/limit, filtered by
+starttime, endtime, minmagnitude and updatedafter) and fdsnws/event/1/count
+from a recorded all_<n>_v10.json.gz file, plus the all_hour/day/week/month
+summary feeds with ETag / Last-Modified validators. Feed windows end at the
+newest recorded event, since the recording has no "now" of its own. Every
+response can be delayed and a fraction replaced by errors; per-endpoint
+request counts are served at /stats.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from usgs import COUNT_PATH, FEED_PATH, QUERY_PATH
+
+# A recorded dataset the app's cache janitor leaves alone (see app.disk_cache), found from any cwd
+DEFAULT_FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'all_20000_v10.json.gz')
+FEED_PREFIX = FEED_PATH.split('{feed}')[0]
+FEED_WINDOWS = {'all_hour': 3600, 'all_day': 86400, 'all_week': 7 * 86400, 'all_month': 30 * 86400}
+MAX_QUERY_LIMIT = 20000  # Same cap as the real service
+
+
+def parse_fdsn_time(value):
+    """Epoch ms for an fdsnws time parameter (date or date-time, UTC)"""
+    parsed = datetime.fromisoformat(value.rstrip('Z'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+class FixtureCatalog:
+    """Recorded events, newest first, with the filters the app's queries use"""
+
+    def __init__(self, features):
+        self.features = sorted(features, key=lambda f: f['properties']['time'], reverse=True)
+        props = [f['properties'] for f in self.features]
+        self.times = np.array([p['time'] for p in props], dtype=np.int64)
+        self.updated = np.array([p.get('updated') or p['time'] for p in props], dtype=np.int64)
+        self.mags = np.array([np.nan if p.get('mag') is None else p['mag'] for p in props], dtype=np.float64)
+        self.newest = int(self.times[0]) if len(self.times) else int(time.time() * 1000)
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, 'rt') as f:
+            return cls(json.load(f)['data']['features'])
+
+    def select(self, params):
+        """Positions matching the query parameters, newest first"""
+        mask = np.ones(len(self.times), dtype=bool)
+        if 'starttime' in params:
+            mask &= self.times >= parse_fdsn_time(params['starttime'])
+        if 'endtime' in params:
+            mask &= self.times <= parse_fdsn_time(params['endtime'])
+        if 'updatedafter' in params:
+            mask &= self.updated > parse_fdsn_time(params['updatedafter'])
+        if 'minmagnitude' in params:
+            mask &= self.mags >= float(params['minmagnitude'])
+        positions = np.flatnonzero(mask)
+        if params.get('orderby') == 'time-asc':
+            positions = positions[::-1]
+        return positions
+
+    def feed(self, window):
+        return np.flatnonzero(self.times >= self.newest - window * 1000)
+
+
+class USGSStub:
+    """Threaded HTTP server answering like USGS, with injected latency and errors"""
+
+    def __init__(self, catalog, host='127.0.0.1', port=8081, latency=0.0, jitter=0.0,
+                 error_rate=0.0, error_status=503, retry_after=1, seed=None):
+        self.catalog = catalog
+        self.latency = latency  # Seconds added to every response
+        self.jitter = jitter  # Extra uniform delay, up to this many seconds
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self._bodies = {}  # Request target -> (status, body, headers); the fixture never changes
+        self._stats = {}  # (endpoint, status) -> count
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self):
+        """{endpoint: {status: count}} since start"""
+        with self._lock:
+            result = {}
+            for (endpoint, status), count in self._stats.items():
+                result.setdefault(endpoint, {})[str(status)] = count
+            return result
+
+    def _record(self, endpoint, status):
+        with self._lock:
+            self._stats[(endpoint, status)] = self._stats.get((endpoint, status), 0) + 1
+
+    def respond(self, target, headers):
+        """(endpoint, status, body, response headers) for one GET"""
+        url = urlparse(target)
+        if url.path == '/stats':
+            return 'stats', 200, json.dumps(self.stats()).encode('utf-8'), {}
+        endpoint = ('query' if url.path == QUERY_PATH else 'count' if url.path == COUNT_PATH
+                    else 'feed' if url.path.startswith(FEED_PREFIX) else None)
+        if endpoint is None:
+            return 'unknown', 404, b'{"error": "not found"}', {}
+
+        with self._lock:
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            failed = self.random.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            return endpoint, self.error_status, b'{"error": "injected failure"}', {'Retry-After': str(self.retry_after)}
+
+        cached = self._bodies.get(target)
+        if cached is None:
+            try:
+                cached = self._build(endpoint, url)
+            except (KeyError, ValueError) as e:
+                return endpoint, 400, json.dumps({'error': str(e)}).encode('utf-8'), {}
+            self._bodies[target] = cached
+        status, body, response_headers = cached
+        if endpoint == 'feed' and status == 200 and headers.get('If-None-Match') == response_headers['ETag']:
+            return endpoint, 304, b'', response_headers
+        return endpoint, status, body, response_headers
+
+    def _build(self, endpoint, url):
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if endpoint == 'feed':
+            feed = url.path[len(FEED_PREFIX):].rsplit('.', 1)[0]
+            if feed not in FEED_WINDOWS:
+                return 404, b'{"error": "unknown feed"}', {}
+            features = [self.catalog.features[i] for i in self.catalog.feed(FEED_WINDOWS[feed])]
+            body = json.dumps({
+                'type': 'FeatureCollection',
+                'metadata': {'generated': self.catalog.newest, 'title': f"USGS stub {feed}", 'count': len(features)},
+                'features': features,
+            }).encode('utf-8')
+            return 200, body, {
+                'ETag': f'"{hashlib.sha1(body).hexdigest()[:16]}"',
+                'Last-Modified': formatdate(self.catalog.newest / 1000, usegmt=True),
+            }
+
+        positions = self.catalog.select(params)
+        if endpoint == 'count':
+            return 200, json.dumps({'count': len(positions), 'maxAllowed': MAX_QUERY_LIMIT}).encode('utf-8'), {}
+        offset = int(params.get('offset', 1))
+        limit = int(params.get('limit', MAX_QUERY_LIMIT))
+        if offset < 1 or not 1 <= limit <= MAX_QUERY_LIMIT:
+            raise ValueError(f"offset must be >= 1 and limit within 1..{MAX_QUERY_LIMIT}")
+        page = [self.catalog.features[i] for i in positions[offset - 1:offset - 1 + limit]]
+        return 200, json.dumps({'type': 'FeatureCollection', 'features': page}).encode('utf-8'), {}
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive, like the pooled client expects
+
+            def do_GET(self):
+                endpoint, status, body, headers = stub.respond(self.path, self.headers)
+                stub._record(endpoint, status)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if status != 304:
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--fixture', default=DEFAULT_FIXTURE, help='recorded cache file (default: %(default)s)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0, help='milliseconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random milliseconds, up to this much')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with an error')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    catalog = FixtureCatalog.load(args.fixture)
+    stub = USGSStub(catalog, args.host, args.port, latency=args.latency / 1000, jitter=args.jitter / 1000,
+                    error_rate=args.error_rate, error_status=args.error_status, seed=args.seed)
+    print(f"USGS stub with {len(catalog.features)} events on {stub.url} "
+          f"(latency {args.latency:g}+{args.jitter:g} ms, error rate {args.error_rate:g})")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
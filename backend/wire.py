@@ -0,0 +1,98 @@
+import json
+import struct
+
+import numpy as np
+
+# Event URLs follow this pattern; when every url matches, the column is dropped
+URL_TEMPLATE = 'https://earthquake.usgs.gov/earthquakes/eventpage/{id}'
+
+# Numeric columns sent as typed arrays, keyed by their row-format names
+NUMERIC_FIELDS = (
+    ('magnitude', 'mag'),
+    ('time', 'time'),
+    ('latitude', 'lat'),
+    ('longitude', 'lon'),
+    ('depth', 'depth'),
+)
+
+BINARY_MAGIC = b'EQC1'
+BINARY_ALIGN = 8  # Every buffer starts on an 8-byte boundary so Float64Array can wrap it in place
+BINARY_MIMETYPE = 'application/vnd.earthquakes.columnar'
+
+
+def dictionary_encode(values):
+    """(codes, dictionary) with dictionary entries in first-seen order"""
+    positions = {}
+    codes = np.fromiter((positions.setdefault(v, len(positions)) for v in values), dtype=np.uint32, count=len(values))
+    return codes, list(positions)
+
+
+def columnar_columns(dataset, order):
+    """Selected rows as columns: numeric arrays, ids, dictionary-encoded places and urls if needed"""
+    order = np.asarray(order, dtype=np.int64)
+    numeric = {name: np.asarray(dataset[column])[order] for name, column in NUMERIC_FIELDS}
+    ids = dataset['id'].take(order)
+    codes, places = dictionary_encode(dataset['place'].take(order))
+    urls = dataset['url'].take(order)
+    derivable = all(url == URL_TEMPLATE.format(id=event_id) for event_id, url in zip(ids, urls))
+    return {
+        'numeric': numeric,
+        'id': ids,
+        'location': codes,
+        'dictionaries': {'location': places},
+        'url': None if derivable else urls,
+    }
+
+
+def columnar_json(columns, meta):
+    """format=columnar document: one array per field instead of one object per event"""
+    data = {name: values.tolist() for name, values in columns['numeric'].items()}
+    data['id'] = columns['id']
+    data['location'] = columns['location'].tolist()
+    document = dict(meta, format='columnar', count=len(columns['id']), columns=data,
+                    dictionaries=columns['dictionaries'], url_template=URL_TEMPLATE)
+    if columns['url'] is not None:
+        data['url'] = columns['url']
+        document.pop('url_template')
+    return document
+
+
+def columnar_binary(columns, meta, dumps=json.dumps):
+    """format=binary body: magic, header length, JSON header, then aligned little-endian buffers
+
+    Numeric fields are float64 (epoch milliseconds are exact below 2**53) and
+    location codes are uint32; the header lists each buffer's offset and
+    carries ids, dictionaries and the remaining response fields.
+    """
+    buffers = [(name, values.astype('<f8')) for name, values in columns['numeric'].items()]
+    buffers.append(('location', columns['location'].astype('<u4')))
+    header = dict(meta, format='binary', count=len(columns['id']), ids=columns['id'],
+                  dictionaries=columns['dictionaries'], url_template=URL_TEMPLATE)
+    if columns['url'] is not None:
+        header['urls'] = columns['url']
+        header.pop('url_template')
+
+    # Offsets depend on the header length, so settle the layout before encoding buffers
+    header['columns'] = [{'name': name, 'dtype': array.dtype.name, 'offset': 0} for name, array in buffers]
+    while True:
+        header_bytes = dumps(header).encode('utf-8')
+        offset = _align(len(BINARY_MAGIC) + 4 + len(header_bytes))
+        layout = []
+        for name, array in buffers:
+            layout.append({'name': name, 'dtype': array.dtype.name, 'offset': offset})
+            offset = _align(offset + array.nbytes)
+        if layout == header['columns']:
+            break
+        header['columns'] = layout
+
+    parts = [BINARY_MAGIC, struct.pack('<I', len(header_bytes)), header_bytes]
+    position = len(BINARY_MAGIC) + 4 + len(header_bytes)
+    for column, (_, array) in zip(layout, buffers):
+        parts.append(b'\0' * (column['offset'] - position))
+        parts.append(array.tobytes())
+        position = column['offset'] + array.nbytes
+    return b''.join(parts)
+
+
+def _align(offset):
+    return -(-offset // BINARY_ALIGN) * BINARY_ALIGN
@@ -72,7 +72,8 @@ document.addEventListener('DOMContentLoaded', function() {
         }, 50); // More frequent updates for smoothness
 
         try {
-            const response = await fetch(`http://localhost:5001/earthquakes?size=${size}&sort=${sort}&continent=${continent}`);
+            // Columnar binary payload: numeric columns arrive as typed arrays instead of per-row JSON objects
+            const response = await fetch(`http://localhost:5001/earthquakes?size=${size}&sort=${sort}&continent=${continent}&format=binary`);
 
             // Complete progress bar
             if (parseInt(size) > 1000) {
@@ -86,7 +87,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 throw new Error('Gagal mengambil data');
             }
 
-            const data = await response.json();
+            const data = decodeBinaryEarthquakes(await response.arrayBuffer());
 
             // Show cache indicator if data came from cache
             const cacheIndicator = document.getElementById('cache-indicator');
@@ -141,8 +142,20 @@ document.addEventListener('DOMContentLoaded', function() {
                 recursiveTime = recursive.waktu_eksekusi;
             }
 
+            // Divide and conquer recursion (O(log n) stack) works for every size
+            let divideConquerTime = null;
+            const divideConquer = analysis.recursive_divide_conquer;
+            if (divideConquer) {
+                document.getElementById('divide-conquer-total').textContent = divideConquer.total_gempa;
+                document.getElementById('divide-conquer-rata-rata').textContent = divideConquer.rata_rata_magnitudo;
+                document.getElementById('divide-conquer-std').textContent = divideConquer.standar_deviasi;
+                document.getElementById('divide-conquer-depth').textContent = divideConquer.kedalaman_rekursi;
+                document.getElementById('divide-conquer-waktu').textContent = divideConquer.waktu_eksekusi;
+                divideConquerTime = divideConquer.waktu_eksekusi;
+            }
+
             // Plot performance chart for current size
-            plotCurrentSizeChart(iterative.waktu_eksekusi, recursiveTime, size);
+            plotCurrentSizeChart(iterative.waktu_eksekusi, recursiveTime, size, divideConquerTime);
 
             // Complexity analysis
             const complexity = analysis.complexity_analysis;
@@ -166,49 +179,10 @@ document.addEventListener('DOMContentLoaded', function() {
             if (tablePlaceholder) tablePlaceholder.style.display = 'none';
 
             // Populate table
-            data.earthquakes.forEach((eq, index) => {
-                const row = document.createElement('tr');
-
-                // Highlight dangerous earthquakes (magnitude >= 5.0)
-                if (eq.magnitude >= 5.0) {
-                    row.classList.add('dangerous-earthquake');
-                }
-
-                // Numbering column
-                const numCell = document.createElement('td');
-                numCell.textContent = index + 1;
-                numCell.style.fontWeight = 'bold';
-                numCell.style.textAlign = 'center';
-
-                const magCell = document.createElement('td');
-                magCell.textContent = eq.magnitude ? eq.magnitude.toFixed(1) : 'N/A';
-                magCell.className = getMagnitudeClass(eq.magnitude || 0);
-
-                const locCell = document.createElement('td');
-                locCell.textContent = eq.location || 'Unknown';
-
-                const timeCell = document.createElement('td');
-                timeCell.textContent = new Date(eq.time).toLocaleString();
-
-                const latCell = document.createElement('td');
-                latCell.textContent = eq.latitude ? eq.latitude.toFixed(2) : 'N/A';
-
-                const lonCell = document.createElement('td');
-                lonCell.textContent = eq.longitude ? eq.longitude.toFixed(2) : 'N/A';
-
-                const depthCell = document.createElement('td');
-                depthCell.textContent = eq.depth ? eq.depth.toFixed(1) : 'N/A';
-
-                row.appendChild(numCell);
-                row.appendChild(magCell);
-                row.appendChild(locCell);
-                row.appendChild(timeCell);
-                row.appendChild(latCell);
-                row.appendChild(lonCell);
-                row.appendChild(depthCell);
+            currentView = { size: parseInt(size), sort: sort, earthquakes: data.earthquakes };
+            renderEarthquakeRows(data.earthquakes);
+            connectEarthquakeEvents();
 
-                tbody.appendChild(row);
-            });
             // Show results and table
             loading.style.display = 'none';
             results.style.display = 'block';
@@ -278,7 +252,7 @@ document.addEventListener('DOMContentLoaded', function() {
         console.log('🎉 All algorithm tooltips setup complete');
     }
 
-    function plotCurrentSizeChart(iterativeTime, recursiveTime, size) {
+    function plotCurrentSizeChart(iterativeTime, recursiveTime, size, divideConquerTime) {
         const canvas = document.getElementById('currentSizeChart');
         if (!canvas) {
             console.error('Canvas currentSizeChart not found');
@@ -300,6 +274,13 @@ document.addEventListener('DOMContentLoaded', function() {
         const labels = ['Iteratif', 'Rekursif'];
         const times = [iterativeTime, recursiveTime || 0];
         const backgroundColors = ['rgba(75, 192, 192, 0.8)', recursiveTime ? 'rgba(255, 99, 132, 0.8)' : 'rgba(128, 128, 128, 0.8)'];
+        const borderColors = ['rgba(75, 192, 192, 1)', recursiveTime ? 'rgba(255, 99, 132, 1)' : 'rgba(128, 128, 128, 1)'];
+        if (divideConquerTime !== null && divideConquerTime !== undefined) {
+            labels.push('Rekursif D&C');
+            times.push(divideConquerTime);
+            backgroundColors.push('rgba(153, 102, 255, 0.8)');
+            borderColors.push('rgba(153, 102, 255, 1)');
+        }
 
         try {
             window.currentSizeChartInstance = new Chart(ctx, {
@@ -310,7 +291,7 @@ document.addEventListener('DOMContentLoaded', function() {
                         label: `Waktu Eksekusi (detik) untuk n=${size}`,
                         data: times,
                         backgroundColor: backgroundColors,
-                        borderColor: ['rgba(75, 192, 192, 1)', recursiveTime ? 'rgba(255, 99, 132, 1)' : 'rgba(128, 128, 128, 1)'],
+                        borderColor: borderColors,
                         borderWidth: 1
                     }]
                 },
@@ -353,6 +334,146 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    // Table rows for the current view; also used to apply pushed changes without refetching
+    function renderEarthquakeRows(earthquakes) {
+        tbody.innerHTML = '';
+        earthquakes.forEach((eq, index) => {
+            const row = document.createElement('tr');
+
+            // Highlight dangerous earthquakes (magnitude >= 5.0)
+            if (eq.magnitude >= 5.0) {
+                row.classList.add('dangerous-earthquake');
+            }
+
+            // Numbering column
+            const numCell = document.createElement('td');
+            numCell.textContent = index + 1;
+            numCell.style.fontWeight = 'bold';
+            numCell.style.textAlign = 'center';
+
+            const magCell = document.createElement('td');
+            magCell.textContent = eq.magnitude ? eq.magnitude.toFixed(1) : 'N/A';
+            magCell.className = getMagnitudeClass(eq.magnitude || 0);
+
+            const locCell = document.createElement('td');
+            locCell.textContent = eq.location || 'Unknown';
+
+            const timeCell = document.createElement('td');
+            timeCell.textContent = new Date(eq.time).toLocaleString();
+
+            const latCell = document.createElement('td');
+            latCell.textContent = eq.latitude ? eq.latitude.toFixed(2) : 'N/A';
+
+            const lonCell = document.createElement('td');
+            lonCell.textContent = eq.longitude ? eq.longitude.toFixed(2) : 'N/A';
+
+            const depthCell = document.createElement('td');
+            depthCell.textContent = eq.depth ? eq.depth.toFixed(1) : 'N/A';
+
+            row.appendChild(numCell);
+            row.appendChild(magCell);
+            row.appendChild(locCell);
+            row.appendChild(timeCell);
+            row.appendChild(latCell);
+            row.appendChild(lonCell);
+            row.appendChild(depthCell);
+
+            tbody.appendChild(row);
+        });
+    }
+
+    // Server-Sent Events: apply new, revised and deleted earthquakes to the loaded view
+    let currentView = null;
+    let eventSource = null;
+
+    // Reloads asked for by 'reset' events are debounced, jittered and backed off, so a burst of
+    // resets (or every dashboard receiving the same one) does not turn into a burst of full reloads
+    const RELOAD_MIN_DELAY = 2000;
+    const RELOAD_MAX_DELAY = 60000;
+    const STREAM_RETRY_DELAY = 30000;
+    let reloadTimer = null;
+    let reloadDelay = RELOAD_MIN_DELAY;
+    let lastReloadRequest = 0;
+
+    function scheduleReload() {
+        if (!currentView || reloadTimer) return;
+        const now = Date.now();
+        if (now - lastReloadRequest > RELOAD_MAX_DELAY) reloadDelay = RELOAD_MIN_DELAY;
+        lastReloadRequest = now;
+        const delay = reloadDelay / 2 + Math.random() * reloadDelay / 2;
+        reloadDelay = Math.min(reloadDelay * 2, RELOAD_MAX_DELAY);
+        reloadTimer = setTimeout(() => {
+            reloadTimer = null;
+            loadEarthquakeData();
+        }, delay);
+    }
+
+    // Same orders as the server: the view is the newest `size` events, then sorted (ties newest first)
+    const VIEW_ORDERS = {
+        magnitude: (a, b) => b.magnitude - a.magnitude || b.time - a.time,
+        location: (a, b) => {
+            const x = a.location || '';
+            const y = b.location || '';
+            return x < y ? -1 : x > y ? 1 : b.time - a.time;
+        }
+    };
+
+    function applyPushedAnalysis(analysis) {
+        const setText = (id, value) => {
+            const element = document.getElementById(id);
+            if (element) element.textContent = value;
+        };
+        ['iterative', 'recursive', 'divide-conquer'].forEach(prefix => {
+            setText(`${prefix}-total`, analysis.total_gempa);
+            setText(`${prefix}-rata-rata`, analysis.rata_rata_magnitudo);
+            setText(`${prefix}-std`, analysis.standar_deviasi);
+        });
+        ['iterative', 'recursive'].forEach(prefix => {
+            setText(`${prefix}-min`, analysis.min_magnitudo);
+            setText(`${prefix}-max`, analysis.max_magnitudo);
+            setText(`${prefix}-berbahaya`, `${analysis.jumlah_berbahaya} (${analysis.persentase_berbahaya}%)`);
+        });
+    }
+
+    function connectEarthquakeEvents() {
+        if (eventSource || !window.EventSource) return;
+        eventSource = new EventSource('http://localhost:5001/earthquakes/events');
+        eventSource.addEventListener('changes', (event) => {
+            if (!currentView) return;
+            const change = JSON.parse(event.data);
+            const removed = new Set(change.deleted.concat(change.updated.map(eq => eq.id)));
+            const wasFull = currentView.earthquakes.length >= currentView.size;
+            const rows = currentView.earthquakes
+                .filter(eq => !removed.has(eq.id))
+                .concat(change.added, change.updated)
+                .sort((a, b) => b.time - a.time);
+            if (wasFull && rows.length < currentView.size) {
+                // Deletions opened a gap that only older events this page never received can fill
+                scheduleReload();
+                return;
+            }
+            currentView.earthquakes = rows.slice(0, currentView.size);
+            if (VIEW_ORDERS[currentView.sort]) currentView.earthquakes.sort(VIEW_ORDERS[currentView.sort]);
+            renderEarthquakeRows(currentView.earthquakes);
+
+            // Statistics of this view as the server computed them after the ingest
+            const view = (change.views || {})[currentView.size] || { analysis: change.analysis, analysis_delta: change.analysis_delta };
+            applyPushedAnalysis(view.analysis);
+            const delta = view.analysis_delta;
+            console.log(`📡 ${change.added.length} gempa baru, ${change.updated.length} diperbarui, ${change.deleted.length} dihapus ` +
+                        `(Δ rata-rata ${delta.rata_rata_magnitudo}, Δ berbahaya ${delta.jumlah_berbahaya})`);
+        });
+        // The server could not send the missed changes (dataset rebuilt or client too slow): reload
+        eventSource.addEventListener('reset', scheduleReload);
+        // EventSource retries dropped streams itself, but gives up on an error response
+        // (e.g. 503 when the server's stream slots are full): reconnect later ourselves
+        eventSource.addEventListener('error', () => {
+            if (eventSource.readyState !== EventSource.CLOSED) return;
+            eventSource = null;
+            setTimeout(connectEarthquakeEvents, STREAM_RETRY_DELAY / 2 + Math.random() * STREAM_RETRY_DELAY);
+        });
+    }
+
     function getMagnitudeClass(mag) {
         if (!mag) return 'minor';
         if (mag >= 7.0) return 'major';
@@ -362,6 +483,40 @@ document.addEventListener('DOMContentLoaded', function() {
         return 'minor';
     }
 
+    // Decode a format=binary response into the same shape as the default JSON response
+    function decodeBinaryEarthquakes(buffer) {
+        const bytes = new Uint8Array(buffer);
+        if (String.fromCharCode(...bytes.subarray(0, 4)) !== 'EQC1') {
+            throw new Error('Format data biner tidak dikenal');
+        }
+        const headerLength = new DataView(buffer).getUint32(4, true);
+        const header = JSON.parse(new TextDecoder().decode(bytes.subarray(8, 8 + headerLength)));
+
+        // Buffers are 8-byte aligned, so the typed arrays view the response without copying
+        const arrayTypes = { float64: Float64Array, uint32: Uint32Array };
+        const columns = {};
+        header.columns.forEach(column => {
+            columns[column.name] = new arrayTypes[column.dtype](buffer, column.offset, header.count);
+        });
+
+        const places = header.dictionaries.location;
+        const earthquakes = new Array(header.count);
+        for (let i = 0; i < header.count; i++) {
+            const id = header.ids[i];
+            earthquakes[i] = {
+                id: id,
+                magnitude: columns.magnitude[i],
+                location: places[columns.location[i]],
+                time: columns.time[i],
+                latitude: columns.latitude[i],
+                longitude: columns.longitude[i],
+                depth: columns.depth[i],
+                url: header.urls ? header.urls[i] : header.url_template.replace('{id}', id)
+            };
+        }
+        return { ...header, earthquakes: earthquakes };
+    }
+
     // Scroll animations
     const observerOptions = {
         threshold: 0.1,
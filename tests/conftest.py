@@ -0,0 +1,51 @@
+import os
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+# The backend modules import each other as top-level modules (python backend/app.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from wire import URL_TEMPLATE  # noqa: E402
+
+
+def epoch_ms(year, month=1, day=1):
+    return int(datetime(year, month, day, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def features_between(n, start_ms, end_ms, seed=0, prefix='ev'):
+    """n synthetic GeoJSON events in [start_ms, end_ms), newest first"""
+    rng = np.random.default_rng(seed)
+    times = np.sort(rng.integers(start_ms, end_ms, n))[::-1]
+    mags = np.round(rng.uniform(2.5, 7.5, n), 1)
+    lats = rng.uniform(-89, 89, n)
+    lons = rng.uniform(-180, 180, n)
+    depths = rng.uniform(0, 700, n)
+    features = []
+    for i in range(n):
+        event_id = f"{prefix}{seed}x{i}"
+        features.append({
+            'type': 'Feature',
+            'id': event_id,
+            'properties': {
+                'mag': float(mags[i]), 'place': f"{i % 37} km N of Place {i % 11}", 'time': int(times[i]),
+                'updated': int(times[i]) + 60000, 'url': URL_TEMPLATE.format(id=event_id),
+            },
+            'geometry': {'type': 'Point', 'coordinates': [float(lons[i]), float(lats[i]), float(depths[i])]},
+        })
+    return features
+
+
+@pytest.fixture
+def make_features():
+    return features_between
+
+
+@pytest.fixture
+def store_view(make_features):
+    """A 3000-event view with every per-generation index, like a published store"""
+    from store import StoreView, build_indexes, columns_from_features
+    columns = columns_from_features(make_features(3000, epoch_ms(2023), epoch_ms(2024), seed=7))
+    return StoreView(columns, build_indexes(columns))
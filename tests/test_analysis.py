@@ -0,0 +1,76 @@
+import math
+import sys
+
+import numpy as np
+import pytest
+
+from analysis import (analyze_earthquakes_iterative, analyze_earthquakes_recursive, analyze_earthquakes_vectorized,
+                      magnitude_aggregate, merge_aggregates, format_aggregate, run_divide_conquer, EMPTY_AGGREGATE,
+                      RECURSIVE_LIMIT)
+from conftest import epoch_ms, features_between
+
+SIZES = (1, 2, 10, 1200, 20000)
+
+
+def without_timing(result):
+    result = dict(result)
+    result.pop('waktu_eksekusi')
+    result.pop('kedalaman_rekursi', None)
+    return result
+
+
+def assert_same_analysis(result, expected):
+    result, expected = without_timing(result), without_timing(expected)
+    # Welford and the sum of squares may round the last digit of the deviation differently
+    assert result.pop('standar_deviasi') == pytest.approx(expected.pop('standar_deviasi'), abs=0.0015)
+    assert result == expected
+
+
+@pytest.fixture(scope='module')
+def features():
+    return features_between(max(SIZES), epoch_ms(2023), epoch_ms(2024), seed=7)
+
+
+def mags_of(features):
+    return np.array([f['properties']['mag'] for f in features])
+
+
+@pytest.mark.parametrize('n', SIZES)
+def test_vectorized_matches_iterative(features, n):
+    subset = features[:n]
+    assert_same_analysis(analyze_earthquakes_vectorized(mags_of(subset)), analyze_earthquakes_iterative(subset))
+
+
+def test_chunked_aggregates_merge_to_the_single_pass_result(features):
+    mags = mags_of(features)
+    merged = EMPTY_AGGREGATE
+    for start in range(0, len(mags), 3000):
+        merged = merge_aggregates(merged, magnitude_aggregate(mags[start:start + 3000]))
+    single = magnitude_aggregate(mags)
+    assert merged[0] == single[0] and merged[3:] == single[3:]
+    assert merged[1:3] == pytest.approx(single[1:3])
+    assert_same_analysis(format_aggregate(merged), analyze_earthquakes_iterative(features))
+
+
+def test_empty_input():
+    assert without_timing(analyze_earthquakes_vectorized(np.array([]))) == without_timing(analyze_earthquakes_iterative([]))
+
+
+@pytest.mark.parametrize('n', SIZES)
+def test_divide_and_conquer_matches_iterative(features, n):
+    subset = features[:n]
+    result = run_divide_conquer(subset)
+    assert_same_analysis(result, analyze_earthquakes_iterative(subset))
+    # Logarithmic stack depth, where linear recursion stops at RECURSIVE_LIMIT
+    assert result['kedalaman_rekursi'] == math.ceil(math.log2(n)) + 1
+
+
+def test_divide_and_conquer_matches_linear_recursion(features):
+    # Same headroom app.py gives the linear recursion
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(3000)
+    try:
+        expected = analyze_earthquakes_recursive(features[:RECURSIVE_LIMIT])
+    finally:
+        sys.setrecursionlimit(limit)
+    assert_same_analysis(run_divide_conquer(features[:RECURSIVE_LIMIT]), expected)
@@ -0,0 +1,176 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import epoch_ms
+from usgs_stub import FixtureCatalog, USGSStub
+
+CATALOG_SIZE = 3000
+
+
+@pytest.fixture(scope='module')
+def stub():
+    from conftest import features_between
+    features = (features_between(CATALOG_SIZE // 2, epoch_ms(2025), epoch_ms(2025, 12, 30), seed=1)
+                + features_between(CATALOG_SIZE // 2, epoch_ms(2024), epoch_ms(2024, 12, 30), seed=2))
+    stub = USGSStub(FixtureCatalog(features), port=0).start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture(scope='module')
+def app_module(stub, tmp_path_factory):
+    """The app in a scratch working directory (its cache paths are relative), talking to the stub"""
+    previous = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('app'))
+    try:
+        import app
+        app.usgs_client.base_url = stub.url
+        app.limiter.enabled = False
+        # No live feed layer: its first poll would otherwise start in the background
+        app.live_feed.last_success = 0
+        yield app
+    finally:
+        os.chdir(previous)
+
+
+@pytest.fixture(scope='module')
+def client(app_module):
+    return app_module.app.test_client()
+
+
+def upstream_requests(stub):
+    return {endpoint: sum(statuses.values()) for endpoint, statuses in stub.stats().items()}
+
+
+def test_small_cold_miss_is_served_without_publishing(app_module, client, stub):
+    before = upstream_requests(stub)
+    response = client.get('/earthquakes?size=10')
+    assert response.status_code == 200
+    assert response.get_json()['total'] == 10
+    # One page, no counts, and no 10-row store for larger sizes to trip over
+    after = upstream_requests(stub)
+    assert after.get('query', 0) - before.get('query', 0) == 1
+    assert after.get('count', 0) == before.get('count', 0)
+    assert app_module.current_store is None
+    assert app_module.read_current(app_module.STORE_DIR) is None
+
+
+def test_large_miss_builds_the_full_store(app_module, client):
+    response = client.get('/earthquakes?size=20000')
+    assert response.status_code == 200
+    assert response.get_json()['total'] == CATALOG_SIZE
+    assert len(app_module.current_store) == CATALOG_SIZE
+    assert app_module.store_complete(app_module.current_store)
+
+
+def test_complete_store_answers_larger_sizes(app_module, client, stub):
+    version = app_module.current_store.version
+    before = upstream_requests(stub)
+    for size in (20000, 20001, 20000):
+        response = client.get(f'/earthquakes?size={size}')
+        assert response.status_code == 200
+        assert response.get_json()['total'] == CATALOG_SIZE
+    # Served from the same generation: no rewrites, no upstream calls
+    assert app_module.current_store.version == version
+    assert upstream_requests(stub) == before
+
+
+def test_identical_rebuild_keeps_the_generation(app_module):
+    store = app_module.current_store
+    published = app_module.broadcaster._seq
+    assert app_module.save_store(store.columns).version == store.version
+    # No new generation and no event, so dashboards have nothing to reload
+    assert app_module.read_current(app_module.STORE_DIR)['generation'] == store.version
+    assert app_module.broadcaster._seq == published
+    assert app_module.rebuild_diff(store, store) == ([], [])
+
+
+def test_analysis_cache_is_keyed_by_generation(app_module):
+    from store import EarthquakeStore
+    store = app_module.current_store
+    order = np.arange(50)
+    cached = app_module.get_analysis(store, order, 50, {})
+    # Same size, different contents: a later generation must not get the cached analysis
+    columns = dict(store.columns, mag=np.asarray(store['mag']) + 1.0)
+    replaced = EarthquakeStore(columns, dict(store.meta, generation='g-replaced'))
+    analysis = app_module.get_analysis(replaced, order, 50, {})
+    assert analysis['iterative']['rata_rata_magnitudo'] != cached['iterative']['rata_rata_magnitudo']
+    assert app_module.get_analysis(store, order, 50, {}) == cached
+
+
+def test_etag_names_the_view_not_the_body(app_module, client):
+    first = client.get('/earthquakes?size=100')
+    # A body encoded again (as another worker would) still carries the same validator
+    app_module.response_cache.invalidate_prefix('')
+    second = client.get('/earthquakes?size=100')
+    assert first.headers['ETag'] == second.headers['ETag']
+    # Equivalent, not byte-identical bodies: a weak validator
+    assert first.headers['ETag'].startswith('W/')
+    assert client.get('/earthquakes?size=100', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    assert client.get('/earthquakes?size=10').headers['ETag'] != first.headers['ETag']
+
+
+def test_stub_fixture_is_kept_by_the_janitor(app_module):
+    import fnmatch
+    from usgs_stub import DEFAULT_FIXTURE
+    assert os.path.exists(DEFAULT_FIXTURE)
+    assert any(fnmatch.fnmatchcase(os.path.basename(DEFAULT_FIXTURE), pattern) for pattern in app_module.disk_cache.keep)
+
+
+def test_small_size_is_served_from_a_store_past_grace(app_module, client):
+    import time
+    from store import EarthquakeStore
+    from usgs import AdaptiveBackoff
+    store = app_module.current_store
+    old = time.time() - app_module.CACHE_DURATION - app_module.STALE_GRACE - 60
+    app_module.current_store = EarthquakeStore(store.columns, dict(store.meta, timestamp=old), store.indexes)
+    base_url, attempts = app_module.usgs_client.base_url, app_module.usgs_client.max_attempts
+    app_module.usgs_client.base_url, app_module.usgs_client.max_attempts = 'http://127.0.0.1:9', 1
+    executions = app_module.refresh_flight.stats['executions']
+    try:
+        # USGS unreachable: the old store still answers, and a store refresh starts behind it
+        response = client.get('/earthquakes?size=10')
+        assert response.status_code == 200
+        assert response.get_json()['total'] == 10
+        deadline = time.time() + 10
+        while app_module.refresh_flight.in_flight('store') and time.time() < deadline:
+            time.sleep(0.05)
+        assert app_module.refresh_flight.stats['executions'] == executions + 1
+    finally:
+        app_module.usgs_client.base_url, app_module.usgs_client.max_attempts = base_url, attempts
+        app_module.usgs_client.backoff = AdaptiveBackoff()
+        app_module.current_store = store
+
+
+def test_live_events_already_in_the_store_are_not_changes(app_module, monkeypatch):
+    store = app_module.current_store
+    feed = store.take(np.arange(50)).to_features()
+    assert app_module.events_changed_from(store, feed) == []
+    feed[3]['properties']['mag'] += 0.5
+    assert [f['id'] for f in app_module.events_changed_from(store, feed)] == [feed[3]['id']]
+
+    # First poll after a restart: every feed event looks new to the empty feed layer
+    monkeypatch.setattr(app_module.live_feed, 'refresh', lambda covered_until=None: store.take(np.arange(50)).to_features())
+    published = app_module.broadcaster._seq
+    assert app_module.refresh_live_feed() == []
+    assert app_module.current_store.version == store.version
+    assert app_module.broadcaster._seq == published
+
+
+def test_server_timing_is_opt_in(client):
+    assert 'Server-Timing' not in client.get('/earthquakes?size=25').headers
+    timing = client.get('/earthquakes?size=25&sort=magnitude', headers={'X-Profile': '1'}).headers['Server-Timing']
+    stages = [entry.split(';')[0] for entry in timing.split(', ')]
+    assert 'cache_lookup' in stages
+    assert all(entry.split(';dur=')[1].replace('.', '').isdigit() for entry in timing.split(', '))
+
+
+def test_metrics_endpoint_counts_requests(app_module, client):
+    before = app_module.metrics.total('earthquakes_requests_total', size='50')
+    client.get('/earthquakes?size=50')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert app_module.metrics.total('earthquakes_requests_total', size='50') == before + 1
+    assert '# TYPE earthquakes_stage_seconds histogram' in response.get_data(as_text=True)
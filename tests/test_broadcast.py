@@ -0,0 +1,92 @@
+import json
+import queue
+import threading
+import time
+
+from broadcast import Broadcaster, EventLog
+
+
+def drain(subscription):
+    """[(id, event, data)] queued for a subscriber"""
+    frames = []
+    while True:
+        try:
+            frame = subscription.queue.get_nowait()
+        except queue.Empty:
+            return frames
+        fields = dict(line.split(': ', 1) for line in frame.decode('utf-8').strip().split('\n'))
+        frames.append((fields['id'], fields['event'], json.loads(fields['data'])))
+
+
+def test_one_publish_reaches_every_subscriber():
+    broadcaster = Broadcaster()
+    first, second = broadcaster.subscribe(), broadcaster.subscribe()
+    broadcaster.publish('changes', {'n': 1})
+    expected = [(f"{broadcaster.boot}-1", 'changes', {'n': 1})]
+    assert drain(first) == expected and drain(second) == expected
+
+
+def test_resume_replays_missed_events():
+    broadcaster = Broadcaster()
+    for n in range(1, 6):
+        broadcaster.publish('changes', {'n': n})
+    resumed = broadcaster.subscribe(f"{broadcaster.boot}-3")
+    assert [data['n'] for _, _, data in drain(resumed)] == [4, 5]
+    # Up to date: nothing to replay
+    assert drain(broadcaster.subscribe(f"{broadcaster.boot}-5")) == []
+
+
+def test_resume_beyond_history_or_boot_is_reset():
+    broadcaster = Broadcaster(history_size=3)
+    for n in range(1, 6):
+        broadcaster.publish('changes', {'n': n})
+    for last_event_id in (f"{broadcaster.boot}-1", 'otherboot-4', f"{broadcaster.boot}-junk"):
+        assert [event for _, event, _ in drain(broadcaster.subscribe(last_event_id))] == ['reset']
+
+
+def test_lagging_client_gets_one_reset_then_resumes():
+    broadcaster = Broadcaster(max_queue=2)
+    subscription = broadcaster.subscribe()
+    for n in range(1, 5):
+        broadcaster.publish('changes', {'n': n})
+    stream = broadcaster.stream(subscription, keepalive=0.01)
+    assert next(stream).startswith(b'retry:')
+    assert b'event: reset' in next(stream)
+    # Delivery resumes once the reset has been written out
+    assert next(stream) == b': keepalive\n\n'
+    broadcaster.publish('changes', {'n': 5})
+    assert b'"n":5' in next(stream)
+    stream.close()
+    assert subscription not in broadcaster._subscribers
+
+
+def test_event_log_relays_the_same_ids_to_every_worker(tmp_path):
+    log = EventLog(str(tmp_path / 'events.jsonl'), keep=4, max_lines=6)
+    workers = [Broadcaster(), Broadcaster()]
+    for worker in workers:
+        threading.Thread(target=log.follow, args=(worker.relay,), kwargs={'interval': 0.01}, daemon=True).start()
+    subscriptions = [worker.subscribe() for worker in workers]
+
+    def append_and_wait(numbers):
+        for n in numbers:
+            log.append('changes', {'n': n})
+        deadline = time.time() + 5
+        while any(worker._seq < numbers[-1] for worker in workers) and time.time() < deadline:
+            time.sleep(0.01)
+
+    append_and_wait([1, 2, 3, 4])
+    append_and_wait([5, 6, 7, 8])  # Past max_lines: followers replay the compacted file, skipping seen ids
+    received = [drain(subscription) for subscription in subscriptions]
+    assert [data['n'] for _, _, data in received[0]] == list(range(1, 9))
+    assert received[0] == received[1]
+    # A client can resume on the other worker with the id it got from the first
+    last_id = received[0][4][0]
+    assert [data['n'] for _, _, data in drain(workers[1].subscribe(last_id))] == [6, 7, 8]
+
+
+def test_streams_beyond_the_limit_are_refused():
+    broadcaster = Broadcaster(max_subscribers=2)
+    first, second = broadcaster.subscribe(), broadcaster.subscribe()
+    assert broadcaster.subscribe() is None
+    broadcaster.unsubscribe(first)
+    assert broadcaster.subscribe() is not None
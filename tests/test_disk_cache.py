@@ -0,0 +1,70 @@
+import json
+import multiprocessing
+
+from disk_cache import MANIFEST_FILE, DiskCache
+
+PROCESSES = 4
+WRITES = 20
+
+
+def open_cache(directory):
+    return DiskCache(str(directory), 'v10', max_bytes=1 << 20)
+
+
+def write_many(directory, worker):
+    cache = open_cache(directory)
+    for i in range(WRITES):
+        cache.write(f"analysis_{worker}_{i}_v10", {'worker': worker, 'i': i})
+
+
+def manifest_keys(directory):
+    with open(directory / MANIFEST_FILE) as f:
+        return set(json.load(f)['entries'])
+
+
+def test_processes_do_not_overwrite_each_others_entries(tmp_path):
+    processes = [multiprocessing.get_context('fork').Process(target=write_many, args=(tmp_path, worker))
+                 for worker in range(PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    expected = {f"analysis_{worker}_{i}_v10" for worker in range(PROCESSES) for i in range(WRITES)}
+    assert manifest_keys(tmp_path) == expected
+
+
+def test_instances_see_each_others_changes(tmp_path):
+    first, second = open_cache(tmp_path), open_cache(tmp_path)
+    first.write('analysis_10_v10', {'n': 10})
+    second.write('analysis_20_v10', {'n': 20})
+    assert manifest_keys(tmp_path) == {'analysis_10_v10', 'analysis_20_v10'}
+    assert second.read('analysis_10_v10', max_age=60)[0] == {'n': 10}
+
+    second.remove_prefix('analysis_10')
+    assert first.read('analysis_10_v10', max_age=60) is None
+    assert first.snapshot()['entries'] == 1
+
+
+def test_janitor_leaves_recorded_datasets_alone(tmp_path):
+    cache = DiskCache(str(tmp_path), 'v10', max_bytes=1 << 20, keep=['all_*_v10.json.gz'])
+    cache.write('all_100_v10', {'features': []}, timestamp=0)
+    cache.write('analysis_100_v10', {'n': 100}, timestamp=0)
+    # Both are far older than max_age; only the cache entry goes
+    assert cache.sweep(max_age=60) == ['analysis_100_v10']
+    assert (tmp_path / 'all_100_v10.json.gz').exists()
+    assert manifest_keys(tmp_path) == set()
+
+
+def test_sweep_tolerates_temp_files_vanishing(tmp_path, monkeypatch):
+    import os
+    cache = open_cache(tmp_path)
+    (tmp_path / '.analysis_1_v10.json.gz.1.2.tmp').write_bytes(b'partial')
+    getmtime = os.path.getmtime
+
+    def renamed_meanwhile(path):
+        if path.endswith('.tmp'):
+            os.remove(path)  # Its writer renamed it into place between listdir and here
+        return getmtime(path)
+
+    monkeypatch.setattr(os.path, 'getmtime', renamed_meanwhile)
+    assert cache.sweep(max_age=60) == []
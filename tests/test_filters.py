@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from conftest import epoch_ms
+from filters import REGION_CODES, FilterError, filter_key, filter_rows, parse_filters, parse_time
+
+
+def brute_force(view, filters):
+    mag = np.asarray(view['mag'])
+    lat = np.asarray(view['lat'])
+    lon = np.asarray(view['lon'])
+    times = np.asarray(view['time'])
+    keep = np.ones(len(view), dtype=bool)
+    if 'start' in filters:
+        keep &= times >= filters['start']
+    if 'end' in filters:
+        keep &= times <= filters['end']
+    if 'minmag' in filters:
+        keep &= mag >= filters['minmag']
+    if 'maxmag' in filters:
+        keep &= mag <= filters['maxmag']
+    if 'continent' in filters:
+        keep &= np.asarray(view.indexes['region']) == REGION_CODES[filters['continent']]
+    if 'bbox' in filters:
+        min_lon, min_lat, max_lon, max_lat = filters['bbox']
+        keep &= (lat >= min_lat) & (lat <= max_lat)
+        if min_lon <= max_lon:
+            keep &= (lon >= min_lon) & (lon <= max_lon)
+        else:
+            keep &= (lon >= min_lon) | (lon <= max_lon)
+    return np.flatnonzero(keep)
+
+
+@pytest.mark.parametrize('filters', [
+    {},
+    {'minmag': 5.0},
+    {'minmag': 4.0, 'maxmag': 4.5},
+    {'continent': 'asia'},
+    {'continent': 'other', 'minmag': 6.0},
+    {'bbox': (-30.0, -10.0, 40.0, 35.0)},
+    {'bbox': (170.0, -50.0, -170.0, 10.0)},  # Crosses the antimeridian
+    {'start': epoch_ms(2023, 3), 'end': epoch_ms(2023, 6)},
+    {'start': epoch_ms(2023, 5), 'minmag': 3.0, 'continent': 'north_america', 'bbox': (-130.0, 20.0, -60.0, 60.0)},
+])
+def test_filter_rows_matches_brute_force(store_view, filters):
+    assert filter_rows(store_view, filters).tolist() == brute_force(store_view, filters).tolist()
+
+
+def test_filter_rows_without_indexes(store_view):
+    from store import StoreView
+    bare = StoreView(store_view.columns)
+    filters = {'minmag': 5.5, 'continent': 'europe'}
+    assert filter_rows(bare, filters).tolist() == brute_force(store_view, filters).tolist()
+
+
+def test_parse_filters():
+    filters = parse_filters({'continent': 'Asia', 'bbox': '-10,-5,10,5', 'minmag': '4', 'start': '2023-01-01'})
+    assert filters == {'continent': 'asia', 'bbox': (-10.0, -5.0, 10.0, 5.0), 'minmag': 4.0,
+                       'start': epoch_ms(2023)}
+    assert parse_filters({'continent': 'all'}) == {}
+
+
+@pytest.mark.parametrize('args', [
+    {'continent': 'atlantis'},
+    {'bbox': '1,2,3'},
+    {'bbox': '0,10,1,5'},
+    {'minmag': 'big'},
+    {'start': 'yesterday'},
+])
+def test_parse_filters_rejects(args):
+    with pytest.raises(FilterError):
+        parse_filters(args)
+
+
+def test_parse_time():
+    assert parse_time('1700000000000', 'start') == 1700000000000
+    assert parse_time('2023-01-01T00:00:00Z', 'start') == epoch_ms(2023)
+    assert parse_time('2023-01-01T07:00:00+07:00', 'start') == epoch_ms(2023)
+
+
+def test_filter_key_is_order_independent():
+    assert filter_key({}) == 'all'
+    assert filter_key({'minmag': 4.0, 'continent': 'asia'}) == filter_key({'continent': 'asia', 'minmag': 4.0})
+    assert filter_key({'minmag': 4.0}) != filter_key({'minmag': 4.1})
@@ -0,0 +1,52 @@
+import time
+
+from memory_cache import MemoryCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = MemoryCache(max_bytes=30, ttl=60)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, key.upper(), 10)
+    assert cache.get('a') == 'A'  # 'b' is now the least recently used
+    cache.put('d', 'D', 10)
+    assert 'b' not in cache
+    assert [cache.get(key) for key in ('a', 'c', 'd')] == ['A', 'C', 'D']
+    assert cache.current_bytes == 30
+    assert cache.stats['evictions'] == 1
+
+
+def test_replacing_a_key_frees_its_old_size():
+    cache = MemoryCache(max_bytes=30, ttl=60)
+    cache.put('a', 1, 20)
+    cache.put('a', 2, 5)
+    assert cache.current_bytes == 5
+    assert cache.get('a') == 2
+
+
+def test_oversized_value_is_not_cached():
+    cache = MemoryCache(max_bytes=10, ttl=60)
+    cache.put('small', 1, 5)
+    assert not cache.put('big', 2, 11)
+    assert 'big' not in cache
+    assert cache.get('small') == 1
+
+
+def test_entries_expire_ttl_after_their_timestamp():
+    cache = MemoryCache(max_bytes=100, ttl=60)
+    cache.put('old', 1, 10, timestamp=time.time() - 61)
+    cache.put('new', 2, 10, timestamp=time.time() - 30)
+    assert 'old' not in cache
+    assert cache.get('old') is None
+    assert cache.get('new') == 2
+    snapshot = cache.snapshot()
+    assert (snapshot['expirations'], snapshot['hits'], snapshot['misses']) == (1, 1, 1)
+    assert snapshot['entries'] == 1 and snapshot['bytes'] == 10
+
+
+def test_invalidate_prefix():
+    cache = MemoryCache(max_bytes=100, ttl=60)
+    for key in ('analysis_10', 'analysis_20', 'all_10'):
+        cache.put(key, key, 10)
+    cache.invalidate_prefix('analysis_')
+    assert len(cache) == 1 and 'all_10' in cache
+    assert cache.current_bytes == 10
@@ -0,0 +1,80 @@
+import threading
+
+from metrics import STAGE_METRIC, Metrics
+
+
+def exposition(metrics):
+    """{series: value} from the Prometheus text, skipping comments"""
+    samples = {}
+    for line in metrics.render().splitlines():
+        if line and not line.startswith('#'):
+            series, value = line.rsplit(' ', 1)
+            samples[series] = float(value)
+    return samples
+
+
+def test_counters_by_label_set():
+    metrics = Metrics()
+    metrics.counter('requests_total', 'Requests')
+    metrics.inc('requests_total', size='10', cache='store')
+    metrics.inc('requests_total', 2, cache='store', size='10')
+    metrics.inc('requests_total', size='20', cache='refresh')
+    text = metrics.render()
+    assert '# TYPE requests_total counter' in text
+    samples = exposition(metrics)
+    # Label order in the call does not matter; names are sorted in the output
+    assert samples['requests_total{cache="store",size="10"}'] == 3
+    assert samples['requests_total{cache="refresh",size="20"}'] == 1
+    assert metrics.total('requests_total', size='10') == 3
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics = Metrics()
+    metrics.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        metrics.observe('latency_seconds', value, stage='x')
+    samples = exposition(metrics)
+    assert samples['latency_seconds_bucket{stage="x",le="0.1"}'] == 2
+    assert samples['latency_seconds_bucket{stage="x",le="1.0"}'] == 3
+    assert samples['latency_seconds_bucket{stage="x",le="+Inf"}'] == 4
+    assert samples['latency_seconds_count{stage="x"}'] == 4
+    assert samples['latency_seconds_sum{stage="x"}'] == 3.65
+
+
+def test_label_values_are_escaped():
+    metrics = Metrics()
+    metrics.counter('odd_total', 'Odd labels')
+    metrics.inc('odd_total', place='a "quoted"\\path\n')
+    assert 'odd_total{place="a \\"quoted\\"\\\\path\\n"} 1' in metrics.render()
+
+
+def test_collectors_are_read_at_scrape_time():
+    metrics = Metrics()
+    state = {'bytes': 1}
+    metrics.collector('cache_bytes', 'gauge', 'Bytes', lambda: [({}, state['bytes'])])
+    state['bytes'] = 42
+    assert exposition(metrics)['cache_bytes'] == 42
+
+
+def test_stage_profile_is_per_thread():
+    metrics = Metrics()
+    metrics.start_profile(True)
+    with metrics.stage('filter'):
+        pass
+    other = []
+
+    def untraced():
+        metrics.start_profile(False)
+        with metrics.stage('sort'):
+            pass
+        other.append(metrics.profile())
+
+    thread = threading.Thread(target=untraced)
+    thread.start()
+    thread.join()
+    assert [name for name, _ in metrics.profile()] == ['filter']
+    assert other == [None]
+    # Both stages still land in the histogram
+    samples = exposition(metrics)
+    assert samples[f'{STAGE_METRIC}_count{{stage="filter"}}'] == 1
+    assert samples[f'{STAGE_METRIC}_count{{stage="sort"}}'] == 1
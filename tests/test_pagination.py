@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from pagination import (CursorError, CursorExpired, decode_cursor, encode_cursor, iter_chunks,
+                        query_fingerprint)
+
+
+def test_cursor_round_trip():
+    fingerprint = query_fingerprint(1000, 'magnitude', 'all')
+    cursor = encode_cursor('g1', fingerprint, 2500)
+    assert '=' not in cursor
+    assert decode_cursor(cursor, 'g1', fingerprint) == 2500
+
+
+def test_cursor_for_another_query():
+    cursor = encode_cursor('g1', query_fingerprint(1000, 'time', 'all'), 10)
+    with pytest.raises(CursorError):
+        decode_cursor(cursor, 'g1', query_fingerprint(1000, 'magnitude', 'all'))
+
+
+def test_cursor_for_replaced_generation():
+    fingerprint = query_fingerprint(10, 'time', 'all')
+    with pytest.raises(CursorExpired):
+        decode_cursor(encode_cursor('g1', fingerprint, 5), 'g2', fingerprint)
+
+
+@pytest.mark.parametrize('cursor', ['', 'not-base64!', encode_cursor('g1', 'x', 0)[:-3]])
+def test_malformed_cursor(cursor):
+    with pytest.raises(CursorError):
+        decode_cursor(cursor, 'g1', 'x')
+
+
+def test_iter_chunks_covers_rows_in_order():
+    rows = np.arange(2345)
+    chunks = list(iter_chunks(rows, chunk_rows=1000))
+    assert [len(c) for c in chunks] == [1000, 1000, 345]
+    assert np.concatenate(chunks).tolist() == rows.tolist()
+    assert list(iter_chunks(np.arange(0))) == []
@@ -0,0 +1,47 @@
+import multiprocessing
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+import ratelimit_storage  # noqa: F401  (registers sqlite://)
+
+PROCESSES = 4
+HITS = 50
+
+
+def hit_many(uri):
+    storage = storage_from_string(uri)
+    for _ in range(HITS):
+        storage.incr('client', 60)
+
+
+def test_counters_are_shared_by_processes(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'ratelimit.sqlite'}"
+    processes = [multiprocessing.get_context('fork').Process(target=hit_many, args=(uri,)) for _ in range(PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    # No lost updates: every increment of every process is counted once
+    assert storage_from_string(uri).get('client') == PROCESSES * HITS
+
+
+def test_fixed_window_limit(tmp_path):
+    storage = storage_from_string(f"sqlite:///{tmp_path / 'ratelimit.sqlite'}")
+    limiter = FixedWindowRateLimiter(storage)
+    limit = parse('3 per minute')
+    assert [limiter.hit(limit, 'a') for _ in range(4)] == [True, True, True, False]
+    assert limiter.hit(limit, 'b')
+    assert limiter.get_window_stats(limit, 'a').remaining == 0
+    storage.clear(limit.key_for('a'))
+    assert limiter.hit(limit, 'a')
+
+
+def test_expired_window_starts_over(tmp_path):
+    storage = storage_from_string(f"sqlite:///{tmp_path / 'ratelimit.sqlite'}")
+    assert storage.incr('k', 0) == 1
+    # Zero-second window: already expired, so the next hit opens a new one
+    assert storage.get('k') == 0
+    assert storage.incr('k', 60) == 1
+    assert storage.incr('k', 60) == 2
@@ -0,0 +1,84 @@
+import math
+
+import numpy as np
+import pytest
+
+from analysis import DANGEROUS_MAGNITUDE
+from conftest import epoch_ms
+from rollups import (BUCKET_MS, MAG_BINS, RollupError, b_value, build_rollup_indexes, has_rollups,
+                     parse_percentiles, summarize)
+
+
+@pytest.fixture
+def rollups(store_view):
+    return build_rollup_indexes(store_view.columns)
+
+
+def window_mask(view, start, end):
+    times = np.asarray(view['time'])
+    # Whole hours overlapping [start, end] are included
+    return (times >= start // BUCKET_MS * BUCKET_MS) & (times <= end // BUCKET_MS * BUCKET_MS + BUCKET_MS - 1)
+
+
+@pytest.mark.parametrize('start, end', [(epoch_ms(2023, 2), epoch_ms(2023, 4)), (epoch_ms(2023, 6, 15) + 1234567, epoch_ms(2023, 6, 20))])
+def test_summarize_matches_brute_force(store_view, rollups, start, end):
+    mask = window_mask(store_view, start, end)
+    mags = np.asarray(store_view['mag'])[mask]
+    summary = summarize(rollups, start, end, percentiles=(50, 95))
+    assert summary['count'] == len(mags)
+    assert summary['dangerous'] == int((mags >= DANGEROUS_MAGNITUDE).sum())
+    assert summary['magnitude']['mean'] == pytest.approx(mags.mean(), abs=1e-3)
+    assert summary['magnitude']['std'] == pytest.approx(mags.std(), abs=1e-3)
+    assert summary['magnitude']['min'] == round(float(mags.min()), 2)
+    assert summary['magnitude']['max'] == round(float(mags.max()), 2)
+    ordered = np.sort(mags)
+    for p in (50, 95):
+        rank = max(1, math.ceil(p / 100 * len(ordered)))
+        assert summary['magnitude']['percentiles'][f"p{p}"] == pytest.approx(ordered[rank - 1])
+    assert sum(c['count'] for c in summary['depth']['histogram']) == len(mags)
+    assert sum(count for _, count in summary['series']['counts']) == len(mags)
+
+
+def test_empty_window(rollups):
+    summary = summarize(rollups, epoch_ms(2010), epoch_ms(2011))
+    assert summary['count'] == 0
+    assert summary['magnitude']['min'] is None
+    assert summary['gutenberg_richter'] is None
+
+
+def test_hourly_series_sums_to_daily(rollups):
+    start, end = epoch_ms(2023, 8), epoch_ms(2023, 9)
+    hourly = summarize(rollups, start, end, interval='hour')['series']['counts']
+    daily = summarize(rollups, start, end, interval='day')['series']['counts']
+    assert sum(c for _, c in hourly) == sum(c for _, c in daily)
+    assert len(daily) <= len(hourly)
+
+
+def test_has_rollups(store_view, rollups):
+    assert has_rollups(rollups, len(store_view))
+    assert not has_rollups(rollups, len(store_view) + 1)
+    assert not has_rollups({}, len(store_view))
+
+
+def test_b_value_recovers_gutenberg_richter():
+    # Magnitudes above 3.0 with b = 1: exponential with rate b * ln(10), binned to 0.1
+    rng = np.random.default_rng(11)
+    mags = np.round(2.95 + rng.exponential(1 / math.log(10), 20000), 1)
+    histogram = np.bincount(np.rint((mags + 2.0) / 0.1).astype(int), minlength=MAG_BINS)[:MAG_BINS]
+    result = b_value(histogram, mc=3.0)
+    assert result['b_value'] == pytest.approx(1.0, abs=0.05)
+    assert result['events'] == len(mags)
+
+
+def test_b_value_needs_enough_events():
+    histogram = np.zeros(MAG_BINS)
+    histogram[60] = 10
+    assert b_value(histogram)['b_value'] is None
+
+
+def test_parse_percentiles():
+    assert parse_percentiles('') == (5, 25, 50, 75, 95, 99)
+    assert parse_percentiles('50,99.9') == (50.0, 99.9)
+    for value in ('50,abc', '101', '-1'):
+        with pytest.raises(RollupError):
+            parse_percentiles(value)
@@ -0,0 +1,101 @@
+import pytest
+
+import scheduler
+from scheduler import RefreshScheduler
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler.time, 'time', clock.time)
+    return clock
+
+
+def make_scheduler(age=None, budget=60, refresh=None, **kwargs):
+    """A scheduler over a fake store and upstream: each refresh costs `cost` requests"""
+    state = {'age': age, 'requests': 0, 'refreshes': 0, 'warmed': [], 'cost': 5}
+
+    def do_refresh():
+        state['refreshes'] += 1
+        state['requests'] += state['cost']
+        state['age'] = 0
+        return 'dataset'
+
+    def warm(params):
+        state['warmed'].append(params)
+        return True
+
+    sched = RefreshScheduler(refresh=do_refresh if refresh is None else refresh, warm=warm,
+                             store_age=lambda: state['age'], upstream_requests=lambda: state['requests'],
+                             budget_per_hour=budget, min_interval=300, max_interval=7200, half_life=3600,
+                             **kwargs)
+    return sched, state
+
+
+def test_demand_decays_with_half_life(clock):
+    sched, _ = make_scheduler()
+    for _ in range(4):
+        sched.record('a', 'A')
+    sched.record('b', 'B')
+    assert [(round(score, 3), key) for score, key, _ in sched.demand()] == [(4.0, 'a'), (1.0, 'b')]
+    clock.now += 3600
+    assert [round(score, 3) for score, _, _ in sched.demand()] == [2.0, 0.5]
+    # Scores below MIN_SCORE are forgotten
+    clock.now += 3600 * 5
+    assert [key for _, key, _ in sched.demand()] == ['a']
+
+
+def test_refresh_interval_shrinks_with_demand():
+    sched, _ = make_scheduler()
+    assert sched.refresh_after(0) == 7200
+    assert sched.refresh_after(3) == 1800
+    assert sched.refresh_after(1000) == 300
+
+
+def test_refreshes_a_missing_or_old_store_then_warms_by_demand(clock):
+    sched, state = make_scheduler(age=None, max_warm=2)
+    for key, count in (('a', 1), ('b', 3), ('c', 2)):
+        for _ in range(count):
+            sched.record(key, key.upper())
+    summary = sched.run_once()
+    assert summary['refreshed'] and state['refreshes'] == 1
+    assert state['warmed'] == ['B', 'C']
+    assert sched.last_refresh_cost == 5
+
+    # Fresh store: no refresh until it is older than refresh_after(demand)
+    state['warmed'] = []
+    assert not sched.run_once()['refreshed']
+    state['age'] = sched.refresh_after(sum(score for score, _, _ in sched.demand())) + 1
+    assert sched.run_once()['refreshed'] and state['refreshes'] == 2
+
+
+def test_refresh_is_deferred_past_the_hourly_budget(clock):
+    sched, state = make_scheduler(age=None, budget=12)
+    assert sched.run_once()['refreshed']
+    state['age'] = 10_000
+    clock.now += 60
+    assert sched.run_once()['refreshed']  # 10 of 12 used
+    state['age'] = 10_000
+    clock.now += 60
+    summary = sched.run_once()
+    assert summary['skipped_budget'] and not summary['refreshed'] and state['refreshes'] == 2
+    # An hour later the earlier requests no longer count
+    clock.now += 3600
+    assert sched.run_once()['refreshed'] and state['refreshes'] == 3
+
+
+def test_workers_only_warm(clock):
+    sched, state = make_scheduler(age=None)
+    sched.refresh = None
+    sched.record('a', 'A')
+    summary = sched.run_once()
+    assert not summary['refreshed'] and state['refreshes'] == 0
+    assert state['warmed'] == ['A']
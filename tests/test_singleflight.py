@@ -0,0 +1,50 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return 'data'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('key', fetch))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while flight.stats['shared'] < 7:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert sorted(results) == [('data', False)] + [('data', True)] * 7
+    assert flight.stats == {'executions': 1, 'shared': 7}
+
+
+def test_errors_reach_every_caller():
+    flight = SingleFlight()
+    with pytest.raises(RuntimeError):
+        flight.do('key', lambda: (_ for _ in ()).throw(RuntimeError('upstream down')))
+    # The key is released after a failure
+    assert flight.do('key', lambda: 1) == (1, False)
+
+
+def test_do_async_skips_keys_in_flight():
+    flight = SingleFlight()
+    release = threading.Event()
+    assert flight.do_async('key', release.wait, 5)
+    assert flight.in_flight('key')
+    assert not flight.do_async('key', release.wait, 5)
+    release.set()
+    while flight.in_flight('key'):
+        time.sleep(0.01)
+    assert flight.stats['executions'] == 1
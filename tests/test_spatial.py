@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from spatial import SphereKDTree, haversine_km
+
+
+@pytest.fixture(scope='module')
+def points():
+    rng = np.random.default_rng(3)
+    return rng.uniform(-90, 90, 4000), rng.uniform(-180, 180, 4000)
+
+
+@pytest.mark.parametrize('lat, lon, radius', [(0.0, 0.0, 800.0), (35.7, 139.7, 1500.0), (-10.0, 179.5, 1000.0),
+                                              (89.0, 0.0, 600.0), (12.0, -60.0, 1.0)])
+def test_query_radius_matches_brute_force(points, lat, lon, radius):
+    tree = SphereKDTree(*points)
+    rows, distances = tree.query_radius(lat, lon, radius)
+    all_distances = haversine_km(lat, lon, points[0], points[1])
+    expected = np.flatnonzero(all_distances <= radius)
+    assert sorted(rows.tolist()) == sorted(expected.tolist())
+    assert np.all(np.diff(distances) >= 0)
+    assert np.allclose(distances, all_distances[rows])
+
+
+@pytest.mark.parametrize('lat, lon, k', [(0.0, 0.0, 1), (-33.9, 151.2, 25), (60.0, -179.9, 100)])
+def test_query_knn_matches_brute_force(points, lat, lon, k):
+    tree = SphereKDTree(*points)
+    rows, distances = tree.query_knn(lat, lon, k)
+    all_distances = haversine_km(lat, lon, points[0], points[1])
+    assert len(rows) == k
+    assert np.allclose(distances, np.sort(all_distances)[:k])
+
+
+def test_empty_tree():
+    tree = SphereKDTree([], [])
+    assert len(tree) == 0
+    assert len(tree.query_radius(0, 0, 100)[0]) == 0
+    assert len(tree.query_knn(0, 0, 5)[0]) == 0
+
+
+def test_haversine_known_distance():
+    # A quarter of the equator
+    assert haversine_km(0.0, 0.0, 0.0, 90.0) == pytest.approx(np.pi / 2 * 6371.0088)
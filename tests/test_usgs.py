@@ -0,0 +1,125 @@
+import pytest
+
+from conftest import epoch_ms
+from usgs import AdaptiveBackoff, QUERY_PATH, USGSClient, UpstreamError
+from usgs_stub import FixtureCatalog, USGSStub
+
+YEARS = (2024, 2023, 2022, 2021)
+DATE_RANGES = [(f"{year}-01-01", f"{year}-12-31") for year in YEARS]
+
+
+class FlakyStub(USGSStub):
+    """Fails query pages at the given offsets, `failures` times each"""
+
+    def __init__(self, catalog, fail_offsets, failures, **kwargs):
+        super().__init__(catalog, **kwargs)
+        self.remaining = {offset: failures for offset in fail_offsets}
+
+    def respond(self, target, headers):
+        if target.startswith(QUERY_PATH):
+            for offset, left in self.remaining.items():
+                if f"offset={offset}&" in target + '&' and left > 0:
+                    self.remaining[offset] = left - 1
+                    return 'query', 503, b'{}', {'Retry-After': '0'}
+        return super().respond(target, headers)
+
+
+@pytest.fixture
+def catalog(make_features):
+    features = []
+    for seed, year in enumerate(YEARS):
+        features += make_features(3000, epoch_ms(year), epoch_ms(year, 12, 30), seed=seed)
+    return FixtureCatalog(features)
+
+
+def start(stub, max_attempts=3):
+    stub.start()
+    client = USGSClient(base_url=stub.url, max_workers=4, timeout=10, max_attempts=max_attempts)
+    client.backoff = AdaptiveBackoff(base_delay=0.001, max_delay=0.01)
+    return client
+
+
+def newest_ids(catalog, n):
+    return [f['id'] for f in catalog.features[:n]]
+
+
+def test_single_page_needs_no_count(catalog):
+    stub = USGSStub(catalog, port=0)
+    client = start(stub)
+    try:
+        events = client.fetch_events(DATE_RANGES, 10, 2.5, batch_size=2000)
+    finally:
+        stub.stop()
+    assert [f['id'] for f in events] == newest_ids(catalog, 10)
+    assert stub.stats() == {'query': {'200': 1}}
+
+
+def test_counts_only_planned_ranges(catalog):
+    stub = USGSStub(catalog, port=0)
+    client = start(stub)
+    try:
+        events = client.fetch_events(DATE_RANGES, 7000, 2.5, batch_size=2000)
+    finally:
+        stub.stop()
+    # Same rows, in the same order, as a serial crawl of the newest ranges
+    assert [f['id'] for f in events] == newest_ids(catalog, 7000)
+    # 2024 first, then 2023 and 2022 from the observed density; 2021 is never counted
+    assert stub.stats()['count'] == {'200': 3}
+    assert stub.stats()['query'] == {'200': 5}
+
+
+def test_failed_page_is_backfilled(catalog):
+    stub = FlakyStub(catalog, fail_offsets=[2001], failures=1, port=0)
+    client = start(stub, max_attempts=1)
+    try:
+        events = client.fetch_events(DATE_RANGES, 5000, 2.5, batch_size=2000)
+    finally:
+        stub.stop()
+    assert [f['id'] for f in events] == newest_ids(catalog, 5000)
+
+
+def test_page_that_keeps_failing_fails_the_crawl(catalog):
+    stub = FlakyStub(catalog, fail_offsets=[2001], failures=10, port=0)
+    client = start(stub, max_attempts=2)
+    try:
+        with pytest.raises(UpstreamError):
+            client.fetch_events(DATE_RANGES, 5000, 2.5, batch_size=2000)
+    finally:
+        stub.stop()
+
+
+def test_failed_count_falls_back_to_paging(catalog):
+    stub = USGSStub(catalog, port=0)
+    client = start(stub)
+    original = stub.respond
+    stub.respond = lambda target, headers: (('count', 503, b'{}', {'Retry-After': '0'})
+                                            if '/count' in target else original(target, headers))
+    try:
+        events = client.fetch_events(DATE_RANGES, 4500, 2.5, batch_size=2000)
+    finally:
+        stub.stop()
+    assert [f['id'] for f in events] == newest_ids(catalog, 4500)
+
+
+def test_fetch_updates_filters_by_updated_time(catalog):
+    stub = USGSStub(catalog, port=0)
+    client = start(stub)
+    newest = catalog.features[0]['properties']
+    try:
+        changes = client.fetch_updates(epoch_ms(2024), newest['updated'] - 1, 2.5)
+    finally:
+        stub.stop()
+    assert [f['id'] for f in changes] == [catalog.features[0]['id']]
+
+
+def test_rejected_request_is_not_retried(catalog):
+    stub = USGSStub(catalog, port=0)
+    client = start(stub)
+    try:
+        with pytest.raises(UpstreamError, match='HTTP 400'):
+            client.get(QUERY_PATH, params={'format': 'geojson', 'offset': 0})
+    finally:
+        stub.stop()
+    assert stub.stats() == {'query': {'400': 1}}
+    # A bad request says nothing about upstream load
+    assert client.backoff.delay == client.backoff.min_delay
@@ -0,0 +1,45 @@
+import json
+import struct
+
+import numpy as np
+
+from store import StoreView, TextColumn
+from wire import BINARY_ALIGN, BINARY_MAGIC, columnar_binary, columnar_columns, columnar_json, dictionary_encode
+
+
+def decode_binary(body):
+    assert body[:4] == BINARY_MAGIC
+    (header_length,) = struct.unpack('<I', body[4:8])
+    header = json.loads(body[8:8 + header_length])
+    arrays = {}
+    for column in header['columns']:
+        assert column['offset'] % BINARY_ALIGN == 0
+        arrays[column['name']] = np.frombuffer(body, dtype=column['dtype'], count=header['count'], offset=column['offset'])
+    return header, arrays
+
+
+def test_dictionary_encode():
+    codes, dictionary = dictionary_encode(['b', 'a', 'b', None, 'a'])
+    assert dictionary == ['b', 'a', None]
+    assert codes.tolist() == [0, 1, 0, 2, 1]
+
+
+def test_binary_round_trip(store_view):
+    order = store_view.sort_order('magnitude')[:500]
+    columns = columnar_columns(store_view, order)
+    header, arrays = decode_binary(columnar_binary(columns, {'total': len(order)}))
+    assert header['count'] == 500 and header['total'] == 500
+    assert arrays['magnitude'].tolist() == np.asarray(store_view['mag'])[order].tolist()
+    assert arrays['time'].astype(np.int64).tolist() == np.asarray(store_view['time'])[order].tolist()
+    places = [header['dictionaries']['location'][code] for code in arrays['location']]
+    assert places == store_view['place'].take(order)
+    # Every url follows the template, so it is rebuilt from ids instead of being sent
+    assert 'urls' not in header and 'url_template' in header
+
+
+def test_columnar_json_keeps_irregular_urls(store_view):
+    view = StoreView(dict(store_view.columns, url=TextColumn.from_strings(['https://example.org/x'] * len(store_view))))
+    document = columnar_json(columnar_columns(view, np.arange(3)), {})
+    assert document['columns']['url'] == ['https://example.org/x'] * 3
+    assert 'url_template' not in document
+    assert document['count'] == 3